@@ -1,26 +1,46 @@
 """对话API"""
 # ai_diary_backend/api/chat.py
+import json
+import math
+from typing import Any, Dict
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
 from app.schemas.chat import ChatRequest, ChatResponse
-from app.core.ai_engine import AIEngine
+from app.core.ai_engine import ai_engine
+from app.services.admission import AdmissionRejected, admission_controller
+from app.utils.logger import logger
 
 router = APIRouter()
-# 创建实例
-ai_engine = AIEngine()
+
+def _unavailable(detail: str, retry_after: float) -> HTTPException:
+    """503: 系统繁忙或豆包熔断中,客户端按Retry-After稍后重试"""
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
 
 @router.post("/send", response_model=ChatResponse)
 async def send_message(request: ChatRequest):
-    """发送消息"""
+    """发送消息(经过准入控制,繁忙时返回503)"""
     try:
         # 调用AI引擎
-        result = await ai_engine.chat(
-            child_id=request.child_id,
-            message=request.message,
-            mode=request.mode
-        )
+        async with admission_controller.admit(request.child_id):
+            result = await ai_engine.chat(
+                child_id=request.child_id,
+                message=request.message,
+                conversation_id=request.conversation_id,
+                mode=request.mode
+            )
         
         # 检查结果
         if not result.get("success", False):
+            if "retry_after" in result:
+                raise _unavailable(result["error"], result["retry_after"])
             raise HTTPException(status_code=500, detail=result.get("error", "AI对话失败"))
         
         # 返回响应
@@ -29,6 +49,86 @@ async def send_message(request: ChatRequest):
             conversation_id=result.get("conversation_id", 0)
         )
     
+    except AdmissionRejected as e:
+        raise _unavailable(str(e), e.retry_after)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/admission/stats")
+async def get_admission_stats():
+    """准入控制统计(处理中、排队、拒绝数)"""
+    return admission_controller.stats()
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """格式化为一条Server-Sent Event"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def stream_message(request: ChatRequest, format: str = "sse"):
+    """
+    流式发送消息
+    
+    format=sse(默认)按Server-Sent Events逐token推送 start/delta/end 事件,
+    format=text 以分块传输直接推送回复文本。
+    消息保存和5维信息提取在流关闭后执行。
+    准入控制在开始推送前完成(繁忙时返回503),名额在本轮保存后释放。
+    """
+    try:
+        ticket = await admission_controller.acquire(request.child_id)
+    except AdmissionRejected as e:
+        raise _unavailable(str(e), e.retry_after)
+    turn: Dict[str, Any] = {}
+
+    async def event_source():
+        try:
+            async for event in ai_engine.chat_stream(
+                child_id=request.child_id,
+                message=request.message,
+                conversation_id=request.conversation_id,
+                mode=request.mode
+            ):
+                if event["type"] == "end":
+                    turn.update(event)
+                if format == "text":
+                    if event["type"] == "delta":
+                        yield event["content"]
+                else:
+                    yield _sse(event)
+        except Exception as e:
+            logger.error("❌ 流式对话失败: %s", e, exc_info=True)
+            if format != "text":
+                yield _sse({"type": "error", "error": str(e)})
+        finally:
+            # 没有完整回复(出错或客户端断开)时不会落库,立即释放名额
+            if not turn.get("response"):
+                ticket.release()
+
+    async def complete_turn():
+        # 客户端中途断开时没有完整回复,不落库
+        if not turn.get("response"):
+            ticket.release()
+            return
+        try:
+            await ai_engine.complete_turn(
+                conversation_id=turn["conversation_id"],
+                child_id=request.child_id,
+                user_message=request.message,
+                ai_response=turn["response"]
+            )
+        except Exception as e:
+            logger.error("❌ 流式对话保存失败: %s", e, exc_info=True)
+        finally:
+            ticket.release()
+
+    media_type = "text/plain; charset=utf-8" if format == "text" else "text/event-stream"
+    return StreamingResponse(
+        event_source(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(complete_turn)
+    )
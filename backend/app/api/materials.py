@@ -1,11 +1,9 @@
 """作文素材API"""
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from fastapi import APIRouter
 
 router = APIRouter()
 
 @router.get("/recommend")
-async def recommend(child_id: int, db: AsyncSession = Depends(get_db)):
+async def recommend(child_id: int):
     """推荐素材"""
     return {"materials": []}
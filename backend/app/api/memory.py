@@ -1,11 +1,21 @@
 """Memory API"""
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from fastapi import APIRouter
+from app.services.extraction_cache import extraction_cache
+from app.services.memory_service import memory_service
 
 router = APIRouter()
 
+@router.get("/cache/stats")
+async def get_memory_cache_stats():
+    """记忆缓存命中统计"""
+    return memory_service.cache.stats()
+
+@router.get("/extraction-cache/stats")
+async def get_extraction_cache_stats():
+    """提取结果缓存命中统计(命中率、节省的豆包调用时间)"""
+    return extraction_cache.stats()
+
 @router.get("/{child_id}")
-async def get_memory(child_id: int, db: AsyncSession = Depends(get_db)):
+async def get_memory(child_id: int):
     """获取Memory"""
     return {"child_id": child_id, "memory": {}}
@@ -0,0 +1,24 @@
+"""全文检索API"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.config import settings
+from app.schemas.search import SearchResponse
+from app.services.search_service import SEARCH_TYPES, SearchError, search_service
+
+router = APIRouter()
+
+@router.get("", response_model=SearchResponse, response_model_exclude_none=True)
+def search(
+    child_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    type: str = Query("messages", description="/".join(SEARCH_TYPES)),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """检索孩子的对话消息、知识点或写作素材(查库,走线程池);翻页时传入上一页返回的 next_cursor"""
+    try:
+        return search_service.search(child_id, q, type=type, limit=limit, cursor=cursor)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,16 +1,18 @@
 """用户API"""
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from fastapi import APIRouter, BackgroundTasks
+from app.config import settings
+from app.services.memory_service import memory_service
 
 router = APIRouter()
 
 @router.post("/children")
-async def create_child(db: AsyncSession = Depends(get_db)):
+async def create_child():
     """创建孩子档案"""
     return {"child_id": 1}
 
 @router.get("/children/{child_id}")
-async def get_child(child_id: int, db: AsyncSession = Depends(get_db)):
-    """获取孩子信息"""
+async def get_child(child_id: int, background_tasks: BackgroundTasks):
+    """获取孩子信息(打开App时调用;响应发出后在线程池里预取记忆,首条消息不用现算)"""
+    if settings.MEMORY_PREFETCH_ON_OPEN:
+        background_tasks.add_task(memory_service.prefetch, child_id)
     return {"child_id": child_id, "name": "芋圆"}
@@ -15,12 +15,125 @@ class Settings(BaseSettings):
     # ✅ 修改:使用绝对路径
     DATABASE_URL: str = str(_backend_dir / "data" / "learning_ai.db")
     
+    # SQLite连接池
+    SQLITE_MAX_READERS: int = 8
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    # 单写线程每次合并提交的最大写批次数
+    SQLITE_WRITE_BATCH_MAX: int = 64
+    
     DOUBAO_API_KEY: str = ""
     DOUBAO_API_URL: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
     DOUBAO_MODEL: str = ""
     DOUBAO_MODEL_ID: str = ""
     DOUBAO_API_SECRET: str = ""
+
+    # 豆包HTTP连接池
+    DOUBAO_HTTP2: bool = True
+    DOUBAO_MAX_CONNECTIONS: int = 100
+    DOUBAO_MAX_KEEPALIVE: int = 20
+    DOUBAO_KEEPALIVE_EXPIRY: float = 60.0
+    DOUBAO_TIMEOUT: float = 30.0
+    DOUBAO_CONNECT_TIMEOUT: float = 5.0
+    DOUBAO_EXTRACTION_TIMEOUT: float = 20.0
+    # 豆包调用容错: 429/5xx/网络错误按指数退避(全抖动)重试
+    DOUBAO_RETRY_ATTEMPTS: int = 2
+    DOUBAO_RETRY_BASE_DELAY: float = 0.2
+    DOUBAO_RETRY_MAX_DELAY: float = 5.0
+    # 对冲请求: 超过最近耗时的p95仍未返回时再发一个相同请求,先返回的生效
+    DOUBAO_HEDGE_ENABLED: bool = False
+    DOUBAO_HEDGE_PERCENTILE: float = 0.95
+    DOUBAO_HEDGE_MIN_DELAY: float = 0.5
+    DOUBAO_HEDGE_MIN_SAMPLES: int = 20
+    DOUBAO_LATENCY_WINDOW: int = 200
+    # 熔断: 连续失败N次后直接失败(提取改用本地规则),冷却后放行一个探测请求
+    DOUBAO_BREAKER_FAILURES: int = 5
+    DOUBAO_BREAKER_RESET_TIMEOUT: float = 30.0
+    # 出站令牌桶限速: 平均每秒请求数(0=不限速)与突发上限
+    DOUBAO_RATE_LIMIT: float = 20.0
+    DOUBAO_RATE_BURST: int = 40
+
+    # 对话准入控制: 全局同时处理的对话数、排队上限、最长排队秒数;每个孩子同时只处理一轮
+    ADMISSION_MAX_IN_FLIGHT: int = 32
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 15.0
+
+    # 5维信息提取队列(开启后对话只入队,由 python -m app.workers.extraction 消费)
+    EXTRACTION_ASYNC: bool = True
+    EXTRACTION_WORKER_CONCURRENCY: int = 4
+    EXTRACTION_POLL_INTERVAL: float = 1.0
+    EXTRACTION_MAX_ATTEMPTS: int = 5
+    EXTRACTION_RETRY_BASE_DELAY: float = 2.0
+    EXTRACTION_RETRY_MAX_DELAY: float = 300.0
+    EXTRACTION_LEASE_SECONDS: int = 120
+    # 已完成/已放弃的任务保留时长(小时,之后由worker定期删除;任务里存着整轮对话原文)与清理间隔(秒)
+    EXTRACTION_DONE_RETENTION_HOURS: float = 24.0
+    EXTRACTION_FAILED_RETENTION_HOURS: float = 168.0
+    EXTRACTION_PURGE_INTERVAL: float = 3600.0
+    # 批量提取: 每次请求打包的对话轮数(1=逐轮提取)与凑批最长等待(秒)
+    EXTRACTION_BATCH_SIZE: int = 1
+    EXTRACTION_BATCH_MAX_WAIT: float = 0.5
+    # 本地规则提取: 闲聊或每个维度置信度都不低于阈值时直接保存,不再调用豆包提取
+    EXTRACTION_LOCAL_GATE: bool = True
+    EXTRACTION_LOCAL_CONFIDENCE: float = 0.8
+    EXTRACTION_CHITCHAT_MAX_CHARS: int = 6
+    # 提取词典(system_config.extractor_dictionaries)检查更新的间隔(秒)
+    EXTRACTOR_RELOAD_INTERVAL: float = 60.0
+    # 提取结果缓存: 进程内条数、表中最多保留条数、prompt_version 的读取间隔(秒)
+    EXTRACTION_CACHE_SIZE: int = 4096
+    EXTRACTION_CACHE_MAX_ROWS: int = 100000
+    EXTRACTION_CACHE_VERSION_TTL: float = 60.0
+
+    # 记忆缓存(按孩子和时间窗口缓存记忆摘要)
+    MEMORY_CACHE_SIZE: int = 1024
+    MEMORY_CACHE_TTL: float = 300.0
+
+    # 启动预热(后台执行,不阻塞启动): 预先建立的豆包连接数、预先打开的只读连接数、
+    # 预计算记忆摘要和加载对话历史的最近活跃孩子数
+    WARMUP_ENABLED: bool = True
+    WARMUP_HTTP_CONNECTIONS: int = 2
+    WARMUP_DB_READERS: int = 2
+    WARMUP_CHILDREN: int = 50
+
+    # 打开App(GET /api/users/children/{id})时在后台预取孩子的记忆
+    MEMORY_PREFETCH_ON_OPEN: bool = True
+
+    # 全文检索(/api/search): 默认和最大每页条数、摘要片段的词数(trigram分词下约等于字数);
+    # 不足3个字的查询走不了索引,每页最多扫描该孩子最近的N行,没凑满一页也返回游标继续往前扫
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+    SEARCH_SNIPPET_TOKENS: int = 24
+    SEARCH_SCAN_ROWS: int = 2000
+
+    # 对话历史: 按token预算截取最近的轮次;每个会话在内存里保留最近N条消息
+    HISTORY_TOKEN_BUDGET: int = 1500
+    HISTORY_MAX_MESSAGES: int = 40
+    HISTORY_CACHE_SIZE: int = 1024
+    HISTORY_CACHE_TTL: float = 1800.0
+
+    # 分层长期记忆(python -m app.workers.digests 生成)
+    DIGEST_IDLE_MINUTES: int = 30          # 会话空闲多久视为结束
+    DIGEST_MAX_CHARS: int = 120            # 每条摘要的最大字数
+    DIGEST_LOOKBACK_DAYS: int = 62         # 每次只处理最近N天内结束的会话和周期
+    DIGEST_BATCH_SIZE: int = 20            # 每轮最多压缩的会话数
+    DIGEST_CONCURRENCY: int = 4
+    DIGEST_POLL_INTERVAL: float = 300.0
+    # System Prompt 每层取的条数
+    DIGEST_RECENT_CONVERSATIONS: int = 3
+    DIGEST_RECENT_DAYS: int = 3
+    DIGEST_RECENT_WEEKS: int = 2
+    DIGEST_RECENT_MONTHS: int = 3
+
+    # 日志: 后台线程写出;格式 json/text,LOG_FILE 非空时另写按大小轮转的文件;
+    # DEBUG日志每个调用位置每N条保留1条;内存队列满时丢弃新日志
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_FILE: str = ""
+    LOG_FILE_MAX_BYTES: int = 50 * 1024 * 1024
+    LOG_FILE_BACKUPS: int = 5
+    LOG_DEBUG_SAMPLE_EVERY: int = 100
+    LOG_QUEUE_SIZE: int = 10000
     SECRET_KEY: str = ""
     
     class Config:
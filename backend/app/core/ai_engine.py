@@ -2,30 +2,80 @@
 """
 AI对话引擎核心模块 - 使用火山引擎SDK
 """
+import asyncio
 import json
-from typing import Dict, List, Optional, Any
+import re
+import time
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 
 import sqlite3  # 数据库
-import json #豆包5维信息提取
-
-# HTTP请求
-import requests
 
 from app.config import settings
-from app.database import get_db_connection
+from app.database import get_pool, get_write_actor
+from app.utils.api_client import DouBaoClient, doubao_client
 from app.utils.logger import logger
-
+from app.utils.metrics import TURN_SECONDS, traced
+from app.utils.prompt_manager import prompt_manager
+from app.utils.resilience import CircuitOpenError
+from app.utils.timing import StageTimer
+from app.core.extractor import LocalExtraction, information_extractor
+
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_queue import extraction_queue
+from app.services.history_service import conversation_history
 from app.services.memory_service import memory_service
 
 
+# 指标里的对话模式标签(请求里的mode是任意字符串,其余归为other)
+_MODE_LABELS = frozenset({"knowledge", "life", "free"})
+
+
+def _mode_label(mode: str) -> str:
+    return mode if mode in _MODE_LABELS else "other"
+
+
+def _parse_model_json(result: str, pattern: str) -> Any:
+    """
+    解析模型返回的JSON(去掉可能的markdown代码块包装)
+    
+    Args:
+        result: 模型原始返回
+        pattern: 截取JSON主体的正则(对象或数组)
+    """
+    # 清理markdown代码块标记
+    result_clean = result.strip()
+    
+    # 移除可能的 ```json 和 ``` 标记
+    if result_clean.startswith("```json"):
+        result_clean = result_clean[7:]
+    elif result_clean.startswith("```"):
+        result_clean = result_clean[3:]
+    
+    if result_clean.endswith("```"):
+        result_clean = result_clean[:-3]
+    
+    result_clean = result_clean.strip()
+    
+    # 尝试截取JSON主体
+    json_match = re.search(pattern, result_clean)
+    if json_match:
+        result_clean = json_match.group(0)
+    
+    return json.loads(result_clean)
+
+
 class AIEngine:
     """AI对话引擎"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[DouBaoClient] = None):
         self.api_url = settings.DOUBAO_API_URL
         self.api_key = settings.DOUBAO_API_KEY
         self.model = settings.DOUBAO_MODEL
+        # 所有出站调用共享同一个异步连接池
+        self.client = client or doubao_client
+        # 提取Prompt是静态文本(批量Prompt以它开头),登记后请求体复用其JSON片段
+        prompt_manager.register_prefix(self._build_extraction_prompt())
     
     async def chat(
         self, 
@@ -34,118 +84,271 @@ class AIEngine:
         conversation_id: Optional[int] = None,
         mode: str = "knowledge"
     ) -> Dict[str, Any]:
-        """核心对话方法（与之前相同）"""
+        """
+        核心对话方法
+        
+        一轮对话按依赖关系执行: 记忆和历史并发加载 → 构建Prompt → 调用豆包 →
+        保存消息(与同步提取并发);各阶段耗时记录在返回值的timings中(毫秒)
+        """
+        timer = StageTimer()
+        outcome = "error"
         try:
-            logger.info(f"🚀 开始对话 - Child:{child_id}, Mode:{mode}")
+            logger.info("🚀 开始对话 - Child:%s, Mode:%s", child_id, mode)
             
-            # 1-4步骤与之前相同
-            if conversation_id is None:
-                conversation_id = self._create_conversation(child_id, mode)
-                logger.info(f"📝 创建新对话会话: {conversation_id}")
+            # 1. 加载记忆和历史、构建System Prompt(新会话在complete_turn中与本轮消息一起写入)
+            system_prompt, history = await self._prepare_turn(child_id, conversation_id, mode, timer)
             
-            memory_context = self._load_memory_simple(child_id)
-            history = self._load_conversation_history(conversation_id)
-            system_prompt = self._build_system_prompt(child_id=child_id)
-            
-            # 5. 调用豆包API（使用新方法）
-            logger.info(f"🤖 调用豆包API...")
-            ai_response = self._call_doubao_api_with_sdk(
+            # 2. 调用豆包API
+            logger.info("🤖 调用豆包API...")
+            ai_response = await timer.run("llm", self._call_doubao_api_with_sdk(
                 system_prompt=system_prompt,
                 history=history,
                 user_message=message
-            )
-            logger.info(f"✅ AI回复成功: {ai_response[:50]}...")
+            ))
+            logger.info("✅ AI回复成功: %.50s...", ai_response)
             
-            # 6-8步骤与之前相同
-            extracted_info = self._extract_and_save_info(
-                conversation_id=conversation_id,
-                child_id=child_id,
-                user_message=message,
-                ai_response=ai_response
-            )
-            self._save_message(conversation_id, "user", message)
-            self._save_message(conversation_id, "assistant", ai_response)
-            turn_count = self._get_turn_count(conversation_id)
+            # 3. 保存消息、提取5维信息、统计轮次
+            turn = await self.complete_turn(conversation_id, child_id, message, ai_response, mode, timer)
             
-            logger.info(f"🎉 对话完成 - Conv:{conversation_id}, Turns:{turn_count}")
+            logger.info("🎉 对话完成 - Conv:%s, Turns:%s", turn['conversation_id'], turn['turn_count'])
+            logger.info("⏱️ 对话耗时 - %s", timer)
             
+            outcome = "success"
             return {
                 "success": True,  # 添加
                 "response": ai_response,  # 改字段名
+                "conversation_id": turn["conversation_id"],
                 "mode": mode,
-                "turn_count": turn_count,
-                "extracted_info": extracted_info
+                "turn_count": turn["turn_count"],
+                "extracted_info": turn["extracted_info"],
+                "timings": timer.as_dict()
             }
             
+        except CircuitOpenError as e:
+            logger.warning("⚡ 豆包API熔断中,快速失败: %s", e)
+            outcome = "circuit_open"
+            return {
+                "success": False,
+                "error": str(e),
+                "retry_after": e.retry_after
+            }
         except Exception as e:
-            logger.error(f"❌ 对话失败: {e}", exc_info=True)
+            logger.error("❌ 对话失败: %s", e, exc_info=True)
             # ✅ 添加错误返回
             return {
                 "success": False,
                 "error": str(e)
             }
+        finally:
+            TURN_SECONDS.labels(_mode_label(mode), outcome).observe(timer.total_ms / 1000)
     
-    def _call_doubao_api_with_sdk(
-        self, 
-        system_prompt: str, 
-        history: List[Dict], 
-        user_message: str
-    ) -> str:
-        """
-        调用豆包API（使用Bearer Token认证）
+    async def chat_stream(
+        self,
+        child_id: int,
+        message: str,
+        conversation_id: Optional[int] = None,
+        mode: str = "knowledge"
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        # 构建消息列表
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        messages.extend(history)
-        messages.append({"role": "user", "content": user_message})
+        流式对话: 依次产出 start / delta / end 事件
         
-        # 请求体
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
+        这里不落库也不提取,调用方在流关闭后调用 complete_turn,
+        用户感知的延迟只剩模型的首token延迟
+        """
+        logger.info("🚀 开始流式对话 - Child:%s, Mode:%s", child_id, mode)
+        timer = StageTimer()
+        outcome = "error"
+        try:
+            # 流式回复在落库前就要把会话ID告诉客户端,新会话需要先创建
+            if conversation_id is None:
+                conversation_id = await self._create_conversation(child_id, mode)
+            system_prompt, history = await self._prepare_turn(child_id, conversation_id, mode, timer)
+            yield {"type": "start", "conversation_id": conversation_id}
+            
+            parts = []
+            async for delta in self.client.chat_completion_stream(
+                self._build_messages(system_prompt, history, message),
+                temperature=0.7,
+                max_tokens=2000
+            ):
+                parts.append(delta)
+                yield {"type": "delta", "content": delta}
+            
+            ai_response = "".join(parts)
+            logger.info("✅ AI流式回复完成: %.50s...", ai_response)
+            outcome = "success"
+            yield {"type": "end", "conversation_id": conversation_id, "response": ai_response}
+        finally:
+            # 流式的总耗时只到回复推送完(落库在流关闭后)
+            TURN_SECONDS.labels(_mode_label(mode), outcome).observe(timer.total_ms / 1000)
+    
+    async def _prepare_turn(
+        self,
+        child_id: int,
+        conversation_id: Optional[int],
+        mode: str = "knowledge",
+        timer: Optional[StageTimer] = None
+    ) -> Tuple[str, List[Dict]]:
+        """
+        对话前置步骤: 并发加载记忆(含孩子档案)和对话历史,再构建System Prompt
         
-        # 设置请求头（使用Bearer Token）
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        两者都是SQLite读取,在线程池中执行;历史加载同时缓存会话的轮次数
+        """
+        timer = timer or StageTimer()
+        
+        async def no_history() -> List[Dict]:
+            return []
+        
+        (memory, memory_summary), history = await asyncio.gather(
+            timer.run("memory", asyncio.to_thread(
+                memory_service.get_memory_with_summary, child_id=child_id, days=7
+            )),
+            timer.run("history", asyncio.to_thread(self._load_conversation_history, conversation_id))
+            if conversation_id else no_history()
+        )
+        with timer.stage("prompt"):
+            system_prompt = self._render_system_prompt(memory, memory_summary, mode)
+        return system_prompt, history
+    
+    async def complete_turn(
+        self,
+        conversation_id: Optional[int],
+        child_id: int,
+        user_message: str,
+        ai_response: str,
+        mode: str = "knowledge",
+        timer: Optional[StageTimer] = None
+    ) -> Dict[str, Any]:
+        """
+        对话后置步骤: 提取5维信息、保存消息、统计轮次
+        
+        本轮的写入(新会话、提取任务或本地提取结果、两条消息)作为一个写批次
+        交给单写线程,原子提交,并与其他并发对话合并提交。
+        本地规则足以确定结果(闲聊或高置信度)时直接保存;否则
+        EXTRACTION_ASYNC开启时只把提取任务入队,由 app.workers.extraction 异步消费;
+        关闭时豆包提取与消息保存并发执行,结果随后单独提交。
+        轮次数来自对话历史缓冲里的计数,缓冲不在时才查库;查库和写入都不在事件循环上等待
+        """
+        timer = timer or StageTimer()
+        local = self._local_extraction(user_message, ai_response)
+        extraction = None
+        if local is None and not settings.EXTRACTION_ASYNC:
+            extraction = asyncio.ensure_future(
+                timer.run("extract", self._call_doubao_for_extraction(user_message, ai_response))
+            )
         
-        # 调试信息
-        logger.debug(f"API URL: {self.api_url}")
-        logger.debug(f"API Key: {self.api_key[:20]}..." if self.api_key else "API Key: EMPTY")
-        logger.debug(f"Model: {self.model}")
+        def persist(conn: sqlite3.Connection) -> Tuple[int, Optional[Dict], Optional[int]]:
+            conv_id = conversation_id
+            if conv_id is None:
+                conv_id = self._insert_conversation(conn, child_id, mode)
+            else:
+                # 空闲结束的会话又继续聊: 重新激活,结束后重新生成会话摘要
+                conn.execute(
+                    "UPDATE conversations SET is_active = 1, end_time = NULL WHERE id = ? AND is_active = 0",
+                    (conv_id,)
+                )
+            
+            extracted_info = None
+            extraction_job_id = None
+            if local is not None:
+                extracted_info = self._extract_and_save_info_simple(
+                    conv_id, child_id, user_message, ai_response, conn=conn, local=local
+                )
+            elif extraction is None:
+                extraction_job_id = extraction_queue.enqueue(
+                    conv_id, child_id, user_message, ai_response, conn=conn
+                )
+            
+            self._insert_message(conn, conv_id, "user", user_message)
+            self._insert_message(conn, conv_id, "assistant", ai_response)
+            return conv_id, extracted_info, extraction_job_id
         
-        # 发送请求
         try:
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=30
+            conv_id, extracted_info, extraction_job_id = await timer.run(
+                "persist", get_write_actor().run(persist)
             )
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"API请求失败: {e}")
-            logger.error(f"响应状态码: {response.status_code}")
-            logger.error(f"响应内容: {response.text[:200]}")
+        except BaseException:
+            if extraction is not None:
+                extraction.cancel()
             raise
+        if extracted_info is not None:
+            memory_service.invalidate(child_id)
+        if conversation_id is None:
+            conversation_history.start(conv_id)
+        turn_count = conversation_history.append_turn(conv_id, user_message, ai_response)
+        if turn_count is None:
+            # 缓冲已淘汰: 查库计数(读连接池,放到线程池里)
+            turn_count = await asyncio.to_thread(self._get_turn_count, conv_id)
+        
+        if extraction is not None:
+            extracted = await extraction
+            if extracted:
+                extracted_info = await self._save_extracted_info_async(conv_id, child_id, user_message, extracted)
+            else:
+                logger.warning("⚠️ 豆包API提取失败,使用简单规则")
+                extracted_info = await self._extract_and_save_info_simple_async(
+                    conv_id, child_id, user_message, ai_response
+                )
+        
+        return {
+            "conversation_id": conv_id,
+            "turn_count": turn_count,
+            "extracted_info": extracted_info,
+            "extraction_job_id": extraction_job_id
+        }
+    
+    def _build_messages(
+        self,
+        system_prompt: str,
+        history: List[Dict],
+        user_message: str
+    ) -> List[Dict]:
+        """构建消息列表"""
+        messages = [
+            {"role": "system", "content": system_prompt}
+        ]
+        messages.extend(history)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+    
+    async def _call_doubao_api_with_sdk(
+        self, 
+        system_prompt: str, 
+        history: List[Dict], 
+        user_message: str,
+        timeout: Optional[float] = None,
+        max_tokens: int = 2000
+    ) -> str:
+        """
+        调用豆包API（使用Bearer Token认证）
+
+        通过共享的异步连接池发送,不阻塞事件循环
+        """
+        messages = self._build_messages(system_prompt, history, user_message)
         
-        # 解析响应
-        data = response.json()
-        ai_reply = data['choices'][0]['message']['content']
-        return ai_reply
+        # 调试信息
+        logger.debug("API URL: %s", self.client.api_url)
+        logger.debug("Model: %s", self.client.model)
+        
+        return await self.client.chat_completion(
+            messages,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
     
-    def _call_doubao_for_extraction(self, user_message: str, ai_response: str) -> Dict:
+    @traced("extraction.llm")
+    async def _call_doubao_for_extraction(self, user_message: str, ai_response: str) -> Dict:
         """
         调用豆包API进行精确的信息提取
         
-        复用主对话方法,使用专门的提取Prompt
+        复用主对话方法,使用专门的提取Prompt;相同(归一化后)的对话直接复用缓存的结果
         """
+        cached = await extraction_cache.aget(user_message, ai_response)
+        if cached is not None:
+            return cached
+        
+        started = time.perf_counter()
         try:
             # 获取提取Prompt
             extraction_prompt = self._build_extraction_prompt()
@@ -159,71 +362,126 @@ class AIEngine:
     请严格按照JSON格式返回提取结果,不要添加任何markdown标记。"""
             
             # 复用主对话方法(降低temperature提高准确性)
-            original_temp = self.model  # 暂存原始配置
-            
-            # 调用API
-            result = self._call_doubao_api_with_sdk(
+            result = await self._call_doubao_api_with_sdk(
                 system_prompt=extraction_prompt,
                 history=[],
-                user_message=extraction_message
+                user_message=extraction_message,
+                timeout=settings.DOUBAO_EXTRACTION_TIMEOUT
             )
             
-            logger.info(f"📥 豆包API原始返回: {result[:200]}...")
+            logger.debug("📥 豆包API原始返回: %.200s...", result)
             
             # 解析JSON(处理可能的markdown包装)
-            import json
-            import re
-            
-            # 清理markdown代码块标记
-            result_clean = result.strip()
-            
-            # 移除可能的 ```json 和 ``` 标记
-            if result_clean.startswith("```json"):
-                result_clean = result_clean[7:]
-            elif result_clean.startswith("```"):
-                result_clean = result_clean[3:]
-            
-            if result_clean.endswith("```"):
-                result_clean = result_clean[:-3]
+            extracted = _parse_model_json(result, r'\{[\s\S]*\}')
             
-            result_clean = result_clean.strip()
-            
-            # 尝试提取JSON对象
-            json_match = re.search(r'\{[\s\S]*\}', result_clean)
-            if json_match:
-                result_clean = json_match.group(0)
-            
-            # 解析JSON
-            extracted = json.loads(result_clean)
-            
-            logger.info(f"📊 豆包API提取结果: {extracted}")
+            logger.debug("📊 豆包API提取结果: %s", extracted)
+            if isinstance(extracted, dict):
+                await extraction_cache.aput(user_message, ai_response, extracted, time.perf_counter() - started)
             return extracted
         
         except json.JSONDecodeError as e:
-            logger.error(f"❌ JSON解析失败: {e}")
-            logger.error(f"原始返回(前500字符): {result[:500] if 'result' in locals() else 'N/A'}")
+            logger.error("❌ JSON解析失败: %s", e)
+            logger.error("原始返回(前500字符): %.500s", result if 'result' in locals() else 'N/A')
             return None
         except Exception as e:
-            logger.error(f"❌ 信息提取失败: {e}", exc_info=True)
+            logger.error("❌ 信息提取失败: %s", e, exc_info=True)
         return None
 
-
-    # 其他方法保持不变
-    def _build_system_prompt(self, child_id: int) -> str:
+    @traced("extraction.llm_batch")
+    async def _call_doubao_for_extraction_batch(
+        self,
+        turns: List[Tuple[str, str]]
+    ) -> Optional[List[Optional[Dict]]]:
         """
-        构建System Prompt(v2.3 - 集成记忆系统)
+        批量提取: 把N轮对话(可来自不同孩子)打包成一次请求
+        
+        Args:
+            turns: [(用户消息, AI回复), ...]
         
-        新增功能:
-        - 注入孩子的学习历史
-        - 注入深度兴趣
-        - 注入社交和情绪状态
+        Returns:
+            与turns一一对应的提取结果,解析失败的条目为None;
+            整个请求失败时返回None
+        
+        命中提取缓存的条目不再发送
         """
-        # 获取最近7天的记忆
-        memory_summary = memory_service.generate_memory_summary(child_id=child_id, days=7)
+        results: List[Optional[Dict]] = list(await asyncio.gather(*[extraction_cache.aget(u, a) for u, a in turns]))
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        
+        started = time.perf_counter()
+        fetched = await self._request_extraction_batch([turns[i] for i in missing])
+        if fetched is None:
+            return None
+        latency = (time.perf_counter() - started) / len(missing)
+        for i, result in zip(missing, fetched):
+            if result is not None:
+                await extraction_cache.aput(*turns[i], result, latency)
+            results[i] = result
+        return results
+    
+    async def _request_extraction_batch(
+        self,
+        turns: List[Tuple[str, str]]
+    ) -> Optional[List[Optional[Dict]]]:
+        """发送一次批量提取请求(返回值同 _call_doubao_for_extraction_batch)"""
+        numbered = "\n\n".join(
+            f"【{i}】\n    用户消息: {user_message}\n    AI回复: {ai_response}"
+            for i, (user_message, ai_response) in enumerate(turns, start=1)
+        )
+        extraction_message = f"""请从以下{len(turns)}段对话中分别提取信息:
+
+    {numbered}
+
+    请严格按照JSON数组格式返回提取结果,不要添加任何markdown标记。"""
         
-        # 获取完整记忆数据(用于详细信息)
-        memory = memory_service.get_child_memory(child_id=child_id, days=7)
+        try:
+            result = await self._call_doubao_api_with_sdk(
+                system_prompt=self._build_batch_extraction_prompt(),
+                history=[],
+                user_message=extraction_message,
+                timeout=settings.DOUBAO_EXTRACTION_TIMEOUT,
+                max_tokens=max(2000, 500 * len(turns))
+            )
+        except Exception as e:
+            logger.error("❌ 批量信息提取失败: %s", e, exc_info=True)
+            return None
+        
+        logger.debug("📥 豆包API批量返回(%s条): %.200s...", len(turns), result)
         
+        results: List[Optional[Dict]] = [None] * len(turns)
+        try:
+            items = _parse_model_json(result, r'\[[\s\S]*\]')
+        except json.JSONDecodeError as e:
+            logger.error("❌ 批量JSON解析失败: %s", e)
+            return results
+        if not isinstance(items, list):
+            logger.error("❌ 批量提取返回的不是JSON数组")
+            return results
+        
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.pop("index", position + 1)
+            if isinstance(index, int) and 1 <= index <= len(turns):
+                results[index - 1] = item
+        return results
+
+
+    # 其他方法保持不变
+    def _build_system_prompt(self, child_id: int, mode: str = "knowledge") -> str:
+        """
+        构建System Prompt(v2.4 - 静态前缀 + 动态记忆块)
+        
+        说明和示例是按模式预编译的静态前缀(所有孩子共用,命中豆包前缀缓存),
+        孩子的名字、学习历史、性格特质、深度兴趣、社交和情绪状态拼在末尾
+        """
+        # 获取最近7天的记忆(摘要文本和完整记忆数据来自同一次计算,带缓存)
+        memory, memory_summary = memory_service.get_memory_with_summary(child_id=child_id, days=7)
+        return self._render_system_prompt(memory, memory_summary, mode)
+    
+    def _render_system_prompt(self, memory: Dict, memory_summary: str, mode: str = "knowledge") -> str:
+        """用已加载的记忆拼出System Prompt"""
         # 提取关键信息
         profile = memory.get("user_profile", {})
         child_name = profile.get("name", "孩子")
@@ -245,65 +503,15 @@ class AIEngine:
                 for interest in top_interests:
                     interests_text += f"- {interest['topic']} (提及{interest['inquiry_count']}次)\n"
         
-        # 组装完整Prompt
-        system_prompt = f"""你是豆豆,一个温暖、智慧的AI学习伙伴,专门陪伴{child_name}成长。
-
-    === 你的核心使命 ===
-    1. **识别学习方式**: 判断{child_name}是"主动学习"(自己研究/发现)还是"被动学习"(老师/家长教)
-    2. **给予差异化鼓励**: 
-    - 主动学习 → 热情赞美探索精神,引导深入思考
-    - 被动学习 → 温和询问理解程度,鼓励主动应用
-    3. **培养内驱力**: 用好奇心和成就感激发学习热情,而非成绩压力
-    4. **建立情感连接**: 温暖、真诚、有同理心,像朋友一样平等对话
-
-    === {child_name}的成长记忆(最近7天) ===
-    {memory_summary}
-    {personality_text}
-    {interests_text}
-
-    === 对话风格指南 ===
-    ✅ **必须做到**:
-    1. 每条回复包含1-2个emoji(😊/🌟/💡/🎯等),但不过度使用
-    2. 识别"我自己研究/发现/探索"等主动学习信号
-    3. 识别"老师教/妈妈说/课堂学"等被动学习信号
-    4. 提出1-2个开放性问题,引导深入思考
-    5. 关联{child_name}的已知兴趣(如编程/数学/篮球),让对话更个性化
-    6. 使用"你/咱们"等亲近称呼,避免"小朋友"等说教语气
-
-    ❌ **避免做到**:
-    1. 不要说教或评判
-    2. 不要提供标准答案(除非{child_name}明确求助)
-    3. 不要忽视情绪信号(开心/难过/紧张等)
-    4. 不要打断{child_name}的思路
-
-    === 典型对话示例 ===
-
-    【示例1: 主动学习场景】
-    {child_name}: "我今天自己研究了勾股定理,发现a²+b²=c²!"
-    豆豆回应: "哇!你自己发现了勾股定理,太厉害了!🌟 这可是数学中超级重要的定理呢~ 你是怎么想到要研究这个的?在研究过程中有没有遇到什么有趣的问题?"
-
-    【示例2: 被动学习场景】
-    {child_name}: "今天数学课老师教了我们圆的面积公式πr²"
-    豆豆回应: "圆的面积公式很有用呢!😊 老师讲的时候你听懂了吗?能不能给我举个例子,比如计算一个半径是5cm的圆的面积?"
+        return prompt_manager.build_system_prompt(
+            mode,
+            child_name=child_name,
+            memory_summary=memory_summary,
+            personality_text=personality_text,
+            interests_text=interests_text,
+            days=7
+        )
 
-    【示例3: 社交场景】
-    {child_name}: "今天我和小明打篮球,他不小心撞倒我了"
-    豆豆回应: "打篮球时被撞倒一定有点疼吧😅 你当时是什么感觉呀?后来你和小明怎么处理的?"
-
-    【示例4: 情绪场景】
-    {child_name}: "我今天考试考得很好,特别开心!"
-    豆豆回应: "太棒啦!为你的好成绩感到开心!🎉 这次考试你觉得哪道题最有挑战性?你是怎么解决的?"
-
-    === 记住 ===
-    - 你的目标不是"教知识",而是"点燃好奇心"
-    - 每次对话都是了解{child_name}的机会,认真倾听比给建议更重要
-    - **自信最重要** - 永远肯定{child_name}的努力和进步
-
-    现在,让我们开始温暖、智慧的对话吧!✨"""
-        
-        return system_prompt
-
-    
     def _build_extraction_prompt(self) -> str:
         """构建信息提取专用Prompt"""
         return """你是一个专业的儿童成长信息提取助手。请从对话中提取以下结构化信息,以JSON格式返回。
@@ -390,140 +598,188 @@ class AIEngine:
     - 必须返回有效的JSON格式,不要有markdown代码块标记"""
 
 
-    def _load_memory_simple(self, child_id: int) -> str:
-        return f"孩子ID: {child_id}\n这是第一次对话,暂无历史记忆。"
-    
+    def _build_batch_extraction_prompt(self) -> str:
+        """批量信息提取Prompt: 单条提取规则 + 编号数组返回约定"""
+        return self._build_extraction_prompt() + """
+
+    【批量模式】
+    - 本次会给出多段带编号的对话(【1】【2】...),每段独立提取,互不参考
+    - 返回一个JSON数组,每段对话对应一个元素,按编号顺序排列
+    - 每个元素就是上面格式的JSON对象,并额外带上 "index" 字段(对应编号)
+    示例: [{"index": 1, "knowledge": {...}, "writing": null, "social": null, "emotion": {...}}, {"index": 2, ...}]
+    - 必须返回有效的JSON数组,不要有markdown代码块标记"""
+
+
     def _load_conversation_history(self, conversation_id: int) -> List[Dict]:
-        return []
+        """最近的对话轮次(不超过 HISTORY_TOKEN_BUDGET,优先读内存缓冲)"""
+        return conversation_history.load(conversation_id)
+    
+    def _local_extraction(self, user_message: str, ai_response: str) -> Optional[LocalExtraction]:
+        """
+        本地规则提取结果,只在可以跳过豆包提取时返回(闲聊,或识别到的每个维度置信度都够高)
+        
+        EXTRACTION_LOCAL_GATE关闭时总是返回None
+        """
+        if not settings.EXTRACTION_LOCAL_GATE:
+            return None
+        local = information_extractor.extract(user_message, ai_response)
+        if not local.can_skip_model(settings.EXTRACTION_LOCAL_CONFIDENCE):
+            return None
+        logger.info("⚡ 本地规则提取(跳过豆包): 闲聊=%s 置信度=%s", local.chitchat, local.confidence)
+        return local
     
     def _extract_and_save_info_simple(
     self, 
     conversation_id: int,
     child_id: int,
     user_message: str,
-    ai_response: str
+    ai_response: str,
+    conn: Optional[sqlite3.Connection] = None,
+    local: Optional[LocalExtraction] = None
     ) -> Dict:
-        """提取并保存5维信息"""
+        """
+        用本地规则提取并保存5维信息(见 app.core.extractor)
         
-        conn = sqlite3.connect(settings.DATABASE_URL)
+        conn为空时单独作为一个写批次提交并等待(只供同步代码调用,异步代码用 _extract_and_save_info_simple_async);
+        否则写入调用方的写批次(由调用方负责失效记忆缓存)
+        local为已经算好的本地提取结果(避免重复扫描)
+        """
+        if conn is None:
+            result = get_write_actor().execute(
+                lambda c: self._extract_and_save_info_simple(
+                    conversation_id, child_id, user_message, ai_response, conn=c, local=local
+                )
+            )
+            memory_service.invalidate(child_id)
+            return result
+        
+        if local is None:
+            local = information_extractor.extract(user_message, ai_response)
         cursor = conn.cursor()
         
         result = {}
         
-        # 1. 知识维度 - 学习来源
-        source = "active"
-        if any(word in user_message for word in ["老师", "爸妈", "上课", "教了", "讲了"]):
-            source = "passive"
-        
-        # 2. 知识维度 - 学科分类
-        subject = "其他"
-        subject_keywords = {
-            "数学": ["数学", "几何", "代数", "勾股定理", "方程", "立方体", "体积", "面积", "计算"],
-            "物理": ["物理", "力", "惯性", "密度", "速度", "能量", "摩擦", "运动"],
-            "化学": ["化学", "反应", "元素", "分子", "酸碱"],
-            "生物": ["生物", "光合作用", "细胞", "DNA", "植物", "动物"],
-            "语文": ["语文", "作文", "古诗", "成语", "阅读", "写作"],
-            "英语": ["英语", "单词", "语法", "句子"],
-            "地理": ["地理", "经纬度", "地图", "气候"],
-            "历史": ["历史", "朝代", "事件"]
-        }
+        # 1. 知识维度
+        if local.knowledge:
+            cursor.execute("""
+                INSERT INTO knowledge_points 
+                (child_id, conversation_id, source, subject, content, confidence_score, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            """, (child_id, conversation_id, local.knowledge["source"], local.knowledge["subject"],
+                  user_message[:200], local.confidence["knowledge"]))
+            result["knowledge"] = local.knowledge
         
-        for subj, keywords in subject_keywords.items():
-            if any(kw in user_message or kw in ai_response for kw in keywords):
-                subject = subj
-                break
-        
-        # 存入knowledge_points
-        cursor.execute("""
-            INSERT INTO knowledge_points 
-            (child_id, conversation_id, source, subject, content, created_at)
-            VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
-        """, (child_id, conversation_id, source, subject, user_message[:200]))
-        
-        result["knowledge"] = {"source": source, "subject": subject}
-        
-        # 3. 社交维度
-        social_keywords = ["同学", "朋友", "老师", "爸妈", "打架", "吵架", "一起", "帮助", "玩"]
-        if any(kw in user_message for kw in social_keywords):
-            relationship_type = "peer"
-            if "老师" in user_message:
-                relationship_type = "teacher"
-            elif any(w in user_message for w in ["爸", "妈", "家人"]):
-                relationship_type = "family"
-            
+        # 2. 社交维度
+        if local.social:
             cursor.execute("""
                 INSERT INTO social_events 
-                (child_id, conversation_id, relationship_type, event_context, created_at)
-                VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
-            """, (child_id, conversation_id, relationship_type, user_message[:500]))
-            
-            result["social"] = {"relationship_type": relationship_type}
-        
-        # 4. 情绪维度
-        emotion_keywords = {
-            "positive": ["开心", "高兴", "快乐", "兴奋", "满意", "喜欢", "棒", "好"],
-            "negative": ["难过", "伤心", "生气", "害怕", "紧张", "担心", "疼"],
-            "neutral": ["还好", "一般", "平静"]
-        }
-        
-        detected_emotion = None
-        emotion_type = "neutral"
-        
-        for emo_type, keywords in emotion_keywords.items():
-            if any(kw in user_message for kw in keywords):
-                emotion_type = emo_type
-                detected_emotion = next((kw for kw in keywords if kw in user_message), None)
-                break
+                (child_id, conversation_id, relationship_type, event_context, behavior_pattern, created_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            """, (child_id, conversation_id, local.social["relationship_type"], user_message[:500],
+                  local.social["behavior_pattern"]))
+            result["social"] = local.social
         
-        if detected_emotion:
-            intensity = 7 if emotion_type == "positive" else 5
-            
+        # 3. 情绪维度
+        if local.emotion:
             cursor.execute("""
                 INSERT INTO emotions 
                 (child_id, conversation_id, emotion_type, intensity, trigger_event, created_at)
                 VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
-            """, (child_id, conversation_id, emotion_type, intensity, user_message[:200]))
-            
-            result["emotion"] = {"type": emotion_type, "intensity": intensity}
+            """, (child_id, conversation_id, local.emotion["type"], local.emotion["intensity"],
+                  user_message[:200]))
+            result["emotion"] = local.emotion
         
-        # 5. 表达维度 - 写作素材
-        event_indicators = ["今天", "昨天", "刚才", "下午", "放学", "在", "和"]
-        if any(ind in user_message for ind in event_indicators) and len(user_message) > 15:
+        # 4. 表达维度 - 写作素材
+        if local.writing:
             cursor.execute("""
                 INSERT INTO writing_materials 
-                (child_id, conversation_id, event_description, created_at)
-                VALUES (?, ?, ?, datetime('now', 'localtime'))
-            """, (child_id, conversation_id, user_message[:500]))
-            
+                (child_id, conversation_id, event_description, event_time, location, created_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            """, (child_id, conversation_id, local.writing["event_description"],
+                  local.writing["event_time"], local.writing["location"]))
             result["writing"] = True
         
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"📊 提取信息: {result}")
+        logger.debug("📊 提取信息: %s", result)
         return result
 
-    def _extract_and_save_info(
+    async def _extract_and_save_info_simple_async(
+        self,
+        conversation_id: int,
+        child_id: int,
+        user_message: str,
+        ai_response: str,
+        local: Optional[LocalExtraction] = None
+    ) -> Dict:
+        """_extract_and_save_info_simple 的异步版本: 单独作为一个写批次提交,等待提交时不阻塞事件循环"""
+        result = await get_write_actor().run(
+            lambda c: self._extract_and_save_info_simple(
+                conversation_id, child_id, user_message, ai_response, conn=c, local=local
+            )
+        )
+        memory_service.invalidate(child_id)
+        return result
+
+    @traced("extraction")
+    async def _extract_and_save_info(
     self, 
     conversation_id: int,
     child_id: int,
     user_message: str,
-    ai_response: str
-    ) -> Dict:
-        """提取并保存5维信息(优先使用豆包API)"""
+    ai_response: str,
+    fallback: bool = True
+    ) -> Optional[Dict]:
+        """
+        提取并保存5维信息(优先使用豆包API)
+        
+        fallback=False时API失败直接返回None,由调用方(提取队列)决定重试;
+        熔断器打开时总是降级到简单规则
+        """
+        
+        # 0. 本地规则足以确定结果时不调用豆包
+        local = self._local_extraction(user_message, ai_response)
+        if local is not None:
+            return await self._extract_and_save_info_simple_async(
+                conversation_id, child_id, user_message, ai_response, local=local
+            )
         
         # 1. 尝试调用豆包API提取
-        extracted = self._call_doubao_for_extraction(user_message, ai_response)
+        extracted = await self._call_doubao_for_extraction(user_message, ai_response)
         
-        # 2. 如果API失败,降级到简单规则
+        # 2. 如果API失败,降级到简单规则(熔断期间上游不健康,不再等待重试)
         if not extracted:
+            if not fallback and not self.client.breaker.is_open:
+                return None
             logger.warning("⚠️ 豆包API提取失败,使用简单规则")
-            return self._extract_and_save_info_simple(
+            return await self._extract_and_save_info_simple_async(
                 conversation_id, child_id, user_message, ai_response
             )
         
         # 3. 用豆包API的结果存入数据库
-        conn = sqlite3.connect(settings.DATABASE_URL)
+        return await self._save_extracted_info_async(conversation_id, child_id, user_message, extracted)
+
+    def _save_extracted_info(
+        self,
+        conversation_id: int,
+        child_id: int,
+        user_message: str,
+        extracted: Dict,
+        conn: Optional[sqlite3.Connection] = None
+    ) -> Dict:
+        """
+        把豆包API的提取结果写入4张维度表
+        
+        conn为空时单独作为一个写批次提交并等待(只供同步代码调用,异步代码用 _save_extracted_info_async);
+        否则写入调用方的写批次(由调用方负责失效记忆缓存)
+        """
+        if conn is None:
+            result = get_write_actor().execute(
+                lambda c: self._save_extracted_info(
+                    conversation_id, child_id, user_message, extracted, conn=c
+                )
+            )
+            memory_service.invalidate(child_id)
+            return result
+        
         cursor = conn.cursor()
         
         result = {}
@@ -554,7 +810,7 @@ class AIEngine:
             required_fields = ['event_time', 'location', 'people']
             missing = [f for f in required_fields if not wr.get(f)]
             if missing:
-                logger.warning(f"⚠️ 表达维度缺失必填字段: {missing}")
+                logger.warning("⚠️ 表达维度缺失必填字段: %s", missing)
                 # 补充默认值
                 if not wr.get('event_time'):
                     wr['event_time'] = '今天'
@@ -574,7 +830,7 @@ class AIEngine:
             if isinstance(sensory, dict):
                 filled = [k for k, v in sensory.items() if v and v != "null"]
                 if len(filled) < 2:
-                    logger.warning(f"⚠️ 感官细节不足(仅{len(filled)}项): {list(sensory.keys())}")
+                    logger.warning("⚠️ 感官细节不足(仅%s项): %s", len(filled), list(sensory.keys()))
             
             cursor.execute("""
                 INSERT INTO writing_materials 
@@ -640,63 +896,63 @@ class AIEngine:
             ))
             result["emotion"] = emo
         
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"📊 提取信息(豆包API): {result}")
+        logger.debug("📊 提取信息(豆包API): %s", result)
         return result
 
     
-    def _create_conversation(self, child_id: int, mode: str) -> int:
-        """创建新对话会话"""
-        import os
-        logger.info(f"当前工作目录: {os.getcwd()}")
-        logger.info(f"DATABASE_URL: {settings.DATABASE_URL}")
-        logger.info(f"数据库文件存在? {os.path.exists(settings.DATABASE_URL)}")
-        conn = sqlite3.connect(settings.DATABASE_URL)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+    async def _save_extracted_info_async(
+        self,
+        conversation_id: int,
+        child_id: int,
+        user_message: str,
+        extracted: Dict
+    ) -> Dict:
+        """_save_extracted_info 的异步版本: 单独作为一个写批次提交,等待提交时不阻塞事件循环"""
+        result = await get_write_actor().run(
+            lambda c: self._save_extracted_info(conversation_id, child_id, user_message, extracted, conn=c)
+        )
+        memory_service.invalidate(child_id)
+        return result
+
+    async def _create_conversation(self, child_id: int, mode: str) -> int:
+        """创建新对话会话(单独作为一个写批次提交,不阻塞事件循环)"""
+        conversation_id = await get_write_actor().run(
+            lambda conn: self._insert_conversation(conn, child_id, mode)
+        )
+        conversation_history.start(conversation_id)
+        return conversation_id
+    
+    def _insert_conversation(self, conn: sqlite3.Connection, child_id: int, mode: str) -> int:
+        cursor = conn.execute("""
             INSERT INTO conversations (child_id, conversation_mode, start_time, is_active)
             VALUES (?, ?, datetime('now', 'localtime'), 1)
         """, (child_id, mode))  # 改为conversation_mode
         
         conversation_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"✅ 创建对话会话 - ID:{conversation_id}, Mode:{mode}")
+        logger.info("✅ 创建对话会话 - ID:%s, Mode:%s", conversation_id, mode)
         return conversation_id
 
     
-    def _save_message(self, conversation_id: int, role: str, content: str):
+    def _insert_message(self, conn: sqlite3.Connection, conversation_id: int, role: str, content: str):
         """保存消息"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        conn.execute("""
             INSERT INTO messages (conversation_id, role, content, timestamp)
             VALUES (?, ?, ?, datetime('now', 'localtime'))
         """, (conversation_id, role, content))
-        
-        conn.commit()
-        conn.close()
 
     
-    def _get_turn_count(self, conversation_id: int) -> int:
+    def _get_turn_count(self, conversation_id: int, conn: Optional[sqlite3.Connection] = None) -> int:
         """获取对话轮次（与之前相同）"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        if conn is None:
+            with get_pool().reader() as reader:
+                return self._get_turn_count(conversation_id, conn=reader)
         
-        cursor.execute("""
+        cursor = conn.execute("""
             SELECT COUNT(*) FROM messages 
             WHERE conversation_id = ? AND role = 'user'
         """, (conversation_id,))
         
-        count = cursor.fetchone()[0]
-        conn.close()
-        
-        return count
+        return cursor.fetchone()[0]
 
 # 全局实例
 ai_engine = AIEngine()
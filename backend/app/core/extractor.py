@@ -1,5 +1,350 @@
-"""信息提取引擎"""
+"""
+信息提取引擎 - 本地规则提取(不调用模型)
+
+所有词典编译成一个多模式匹配自动机(Aho-Corasick),一条消息只扫描一遍;
+每个维度给出置信度,置信度足够高(或只是闲聊)时可以跳过豆包提取。
+词典可通过 system_config 的 extractor_dictionaries(JSON)覆盖,修改后自动重新加载。
+"""
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool
+from app.utils.logger import logger
+
+# 默认词典: 类别 -> {标签: [关键词]}
+DEFAULT_DICTIONARIES: Dict[str, Dict[str, List[str]]] = {
+    # 学习来源
+    "source": {
+        "passive": ["老师", "爸妈", "上课", "教了", "讲了", "课上", "课堂", "妈妈说", "爸爸说"],
+        "active": ["自己研究", "自己发现", "我发现", "我研究", "自学", "探索", "查了资料", "自己试"],
+    },
+    # 学科
+    "subject": {
+        "数学": ["数学", "几何", "代数", "勾股定理", "方程", "立方体", "体积", "面积", "计算", "乘法", "除法", "分数"],
+        "物理": ["物理", "惯性", "密度", "速度", "能量", "摩擦", "重力", "浮力", "电路"],
+        "化学": ["化学", "化学反应", "元素", "分子", "酸碱", "原子"],
+        "生物": ["生物", "光合作用", "细胞", "DNA", "植物", "动物", "昆虫"],
+        "语文": ["语文", "作文", "古诗", "成语", "阅读", "写作", "课文"],
+        "英语": ["英语", "单词", "语法", "English"],
+        "地理": ["地理", "经纬度", "地图", "气候", "地球"],
+        "历史": ["历史", "朝代", "皇帝", "古代"],
+        "编程": ["编程", "代码", "程序", "Python", "Scratch"],
+    },
+    # 社交关系
+    "relationship": {
+        "peer": ["同学", "朋友", "小伙伴", "同桌"],
+        "teacher": ["老师"],
+        "family": ["爸爸", "妈妈", "爸妈", "家人", "爷爷", "奶奶", "姥姥", "姥爷", "哥哥", "姐姐", "弟弟", "妹妹"],
+    },
+    # 社交行为
+    "behavior": {
+        "合作": ["一起", "合作", "组队"],
+        "冲突": ["打架", "吵架", "生气了", "欺负"],
+        "帮助": ["帮助", "帮我", "帮他", "帮她", "帮忙"],
+        "分享": ["分享", "送给", "借给"],
+        "玩耍": ["玩"],
+    },
+    # 情绪
+    "emotion": {
+        "positive": ["开心", "高兴", "快乐", "兴奋", "满意", "喜欢", "棒", "好玩", "有趣"],
+        "negative": ["难过", "伤心", "生气", "害怕", "紧张", "担心", "疼", "失望", "委屈"],
+        "neutral": ["还好", "一般", "平静"],
+    },
+    # 情绪强度修饰词(标签为强度)
+    "intensity": {
+        "9": ["特别", "超级", "非常", "太"],
+        "7": ["很", "真", "好"],
+        "4": ["有点", "有些", "略微"],
+    },
+    # 事件叙述(写作素材)的时间/地点线索
+    "event": {
+        "time": ["今天", "昨天", "刚才", "下午", "上午", "晚上", "放学", "周末", "上周"],
+        "place": ["学校", "家里", "公园", "操场", "教室", "超市", "图书馆", "外面"],
+    },
+    # 闲聊
+    "chitchat": {
+        "chitchat": ["你好", "您好", "嗯", "哈哈", "好的", "拜拜", "再见", "谢谢", "晚安", "早上好", "在吗", "知道了"],
+    },
+}
+
+_CONFIG_KEY = "extractor_dictionaries"
+
+
+class KeywordAutomaton:
+    """
+    多模式匹配自动机(Aho-Corasick)
+
+    构建后一次扫描找出文本中所有关键词(含重叠),耗时与文本长度成正比,与关键词数量无关
+    """
+
+    def __init__(self, patterns: Dict[str, List[Tuple[str, str]]]):
+        """patterns: 关键词 -> [(类别, 标签), ...]"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, str, str], ...]] = [()]
+
+        for keyword, labels in patterns.items():
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += tuple((category, label, keyword) for category, label in labels)
+
+        # BFS计算失配指针,并把后缀状态的输出合并进来
+        # (第一层的失配指针都指向根)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+        self._root = self._goto[0]
+
+    def find(self, text: str) -> List[Tuple[int, str, str, str]]:
+        """返回所有匹配: [(结束位置, 类别, 标签, 关键词), ...]"""
+        goto, fail, out, root = self._goto, self._fail, self._out, self._root
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            if state == 0:
+                state = root.get(ch, 0)
+            else:
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+            if out[state]:
+                matches.extend((i, category, label, keyword) for category, label, keyword in out[state])
+        return matches
+
+
+@dataclass
+class LocalExtraction:
+    """本地提取结果"""
+    knowledge: Optional[Dict[str, Any]] = None
+    social: Optional[Dict[str, Any]] = None
+    emotion: Optional[Dict[str, Any]] = None
+    writing: Optional[Dict[str, Any]] = None
+    # 维度 -> 置信度(0-1),只包含识别到的维度
+    confidence: Dict[str, float] = field(default_factory=dict)
+    chitchat: bool = False
+
+    def is_confident(self, threshold: float) -> bool:
+        """识别到的每个维度都足够可信(写作素材需要模型补全时间/地点/感官细节,不算可信)"""
+        if self.writing is not None:
+            return False
+        return bool(self.confidence) and min(self.confidence.values()) >= threshold
+
+    def can_skip_model(self, threshold: float) -> bool:
+        """闲聊或本地结果足够可信时,不必再调用豆包提取"""
+        return self.chitchat or self.is_confident(threshold)
+
+
 class InformationExtractor:
-    """信息提取器（待实现）"""
-    def extract(self, text: str):
-        return {}
+    """本地信息提取器"""
+
+    def __init__(self, dictionaries: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self._fixed = dictionaries is not None
+        self._lock = threading.Lock()
+        self._config_version: Optional[str] = None
+        self._checked_at = 0.0
+        self._dictionaries = dictionaries or DEFAULT_DICTIONARIES
+        # 首次使用时再编译(几十毫秒,不放在导入时,加快进程启动)
+        self._automaton: Optional[KeywordAutomaton] = None
+
+    @property
+    def automaton(self) -> KeywordAutomaton:
+        if self._automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._compile(self._dictionaries)
+        return self._automaton
+
+    def extract(self, user_message: str, ai_response: str = "") -> LocalExtraction:
+        """从一轮对话中提取5维信息(以孩子的话为主,学科也参考AI回复)"""
+        self._maybe_reload()
+        automaton = self.automaton
+
+        hits: Dict[str, Dict[str, List[str]]] = {}
+        for _, category, label, keyword in automaton.find(user_message):
+            hits.setdefault(category, {}).setdefault(label, []).append(keyword)
+        reply_subjects: Dict[str, List[str]] = {}
+        if ai_response:
+            for _, category, label, keyword in automaton.find(ai_response):
+                if category == "subject":
+                    reply_subjects.setdefault(label, []).append(keyword)
+
+        result = LocalExtraction()
+        self._extract_knowledge(result, hits, reply_subjects)
+        self._extract_social(result, hits)
+        self._extract_emotion(result, hits)
+        self._extract_writing(result, hits, user_message)
+
+        stripped = user_message.strip()
+        result.chitchat = not result.confidence and (
+            "chitchat" in hits or len(stripped) <= settings.EXTRACTION_CHITCHAT_MAX_CHARS
+        )
+        return result
+
+    def reload(self):
+        """从 system_config 重新加载词典(不存在时使用默认词典)"""
+        dictionaries, version = self._load_config()
+        self._compile(dictionaries)
+        self._config_version = version
+        logger.info("🔤 本地提取词典已加载 - 版本:%s", version or '默认')
+
+    def _extract_knowledge(self, result: LocalExtraction, hits, reply_subjects):
+        subjects = hits.get("subject", {})
+        sources = hits.get("source", {})
+        if not subjects and not sources and not reply_subjects:
+            return
+
+        if subjects:
+            # 命中关键词最多的学科;孩子的话里明确出现学科名时最可信
+            subject, keywords = max(subjects.items(), key=lambda kv: len(kv[1]))
+            confidence = 0.9 if subject in keywords or len(keywords) >= 2 else 0.8
+            if len(subjects) > 1:
+                confidence -= 0.2
+        elif reply_subjects:
+            subject, _ = max(reply_subjects.items(), key=lambda kv: len(kv[1]))
+            confidence = 0.6
+        else:
+            subject, confidence = "其他", 0.4
+
+        if "passive" in sources and "active" in sources:
+            source = "passive"
+            confidence = min(confidence, 0.5)
+        elif "passive" in sources:
+            source = "passive"
+        elif "active" in sources:
+            source = "active"
+        else:
+            source = "active"
+            confidence = min(confidence, 0.7)
+
+        result.knowledge = {"source": source, "subject": subject}
+        result.confidence["knowledge"] = round(confidence, 2)
+
+    def _extract_social(self, result: LocalExtraction, hits):
+        relationships = hits.get("relationship", {})
+        behaviors = hits.get("behavior", {})
+        if not relationships and not behaviors:
+            return
+        if not behaviors and "peer" not in relationships:
+            return  # 只提到老师/家人(如"老师讲了")是学习来源,不算社交事件
+
+        if "teacher" in relationships:
+            relationship_type = "teacher"
+        elif "family" in relationships:
+            relationship_type = "family"
+        else:
+            relationship_type = "peer"
+        behavior = max(behaviors.items(), key=lambda kv: len(kv[1]))[0] if behaviors else None
+
+        confidence = 0.8 if relationships and behaviors else 0.6
+        if len(relationships) > 1:
+            confidence -= 0.1
+        result.social = {"relationship_type": relationship_type, "behavior_pattern": behavior}
+        result.confidence["social"] = round(confidence, 2)
+
+    def _extract_emotion(self, result: LocalExtraction, hits):
+        emotions = hits.get("emotion", {})
+        if not emotions:
+            return
+
+        polar = [label for label in ("positive", "negative") if label in emotions]
+        if len(polar) == 2:
+            emotion_type, confidence = "neutral", 0.3
+        else:
+            emotion_type = polar[0] if polar else "neutral"
+            confidence = 0.7
+
+        modifiers = hits.get("intensity", {})
+        if modifiers:
+            intensity = max(int(level) for level in modifiers)
+            confidence += 0.15
+        else:
+            intensity = 7 if emotion_type == "positive" else 5
+
+        result.emotion = {"type": emotion_type, "intensity": intensity}
+        result.confidence["emotion"] = round(min(confidence, 0.95), 2)
+
+    def _extract_writing(self, result: LocalExtraction, hits, user_message: str):
+        events = hits.get("event", {})
+        if not events or len(user_message) <= 15:
+            return
+        confidence = 0.6 if len(events) == 2 else 0.4
+        result.writing = {
+            "event_description": user_message[:500],
+            "event_time": events["time"][0] if "time" in events else None,
+            "location": events["place"][0] if "place" in events else None,
+        }
+        result.confidence["writing"] = confidence
+
+    def _compile(self, dictionaries: Dict[str, Dict[str, List[str]]]):
+        patterns: Dict[str, List[Tuple[str, str]]] = {}
+        for category, labels in dictionaries.items():
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    if keyword:
+                        patterns.setdefault(keyword, []).append((category, label))
+        self._automaton = KeywordAutomaton(patterns)
+
+    def _maybe_reload(self):
+        """每 EXTRACTOR_RELOAD_INTERVAL 秒检查一次 system_config 的词典是否更新"""
+        if self._fixed:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < settings.EXTRACTOR_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked_at < settings.EXTRACTOR_RELOAD_INTERVAL:
+                return
+            self._checked_at = now
+            try:
+                with get_pool().reader() as conn:
+                    row = conn.execute(
+                        "SELECT updated_at FROM system_config WHERE key = ?", (_CONFIG_KEY,)
+                    ).fetchone()
+            except Exception as e:
+                logger.warning("⚠️ 检查提取词典失败: %s", e)
+                return
+            version = row[0] if row else None
+            if version != self._config_version:
+                self.reload()
+
+    def _load_config(self) -> Tuple[Dict[str, Dict[str, List[str]]], Optional[str]]:
+        """默认词典 + system_config 中的覆盖(按类别/标签整体替换)"""
+        dictionaries = {category: dict(labels) for category, labels in DEFAULT_DICTIONARIES.items()}
+        with get_pool().reader() as conn:
+            row = conn.execute(
+                "SELECT value, updated_at FROM system_config WHERE key = ?", (_CONFIG_KEY,)
+            ).fetchone()
+        if row is None:
+            return dictionaries, None
+        try:
+            overrides = json.loads(row[0])
+            for category, labels in overrides.items():
+                dictionaries.setdefault(category, {}).update(labels)
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.error("❌ 提取词典配置格式错误,使用默认词典: %s", e)
+        return dictionaries, row[1]
+
+
+# 全局实例
+information_extractor = InformationExtractor()
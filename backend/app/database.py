@@ -1,19 +1,34 @@
 """数据库连接"""
 import sqlite3
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 from app.config import settings
+from app.utils.metrics import QUEUE_DEPTH, Family, counter, observe_query, registry, span
 
-# 延迟初始化引擎，避免导入时的配置问题
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# SQLAlchemy只有 app.models 和 get_db 用到,导入要几百毫秒,用到时再导入;
+# 引擎也延迟初始化，避免导入时的配置问题
 _engine = None
 _AsyncSessionLocal = None
+_Base = None
 
 def get_engine():
     """获取异步引擎（延迟初始化）"""
     global _engine, _AsyncSessionLocal
     if _engine is None:
-        _engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+        url = settings.DATABASE_URL
+        if "://" not in url:
+            url = f"sqlite+aiosqlite:///{_resolve_db_path()}"
+        _engine = create_async_engine(url, echo=settings.DEBUG)
         _AsyncSessionLocal = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
     return _engine
 
@@ -23,13 +38,21 @@ def get_async_session_local():
         get_engine()
     return _AsyncSessionLocal
 
-Base = declarative_base()
+def __getattr__(name: str):
+    """Base 在第一次 from app.database import Base 时创建(模块级 __getattr__)"""
+    global _Base
+    if name == "Base":
+        if _Base is None:
+            from sqlalchemy.orm import declarative_base
+            _Base = declarative_base()
+        return _Base
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def init_db():
     """初始化数据库"""
     pass
 
-async def get_db() -> AsyncSession:
+async def get_db() -> AsyncIterator["AsyncSession"]:
     session_local = get_async_session_local()
     async with session_local() as session:
         try:
@@ -37,11 +60,8 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
-def get_db_connection():
-    """获取同步SQLite连接（用于非异步操作）"""
-    import sqlite3
-    import os
-    
+def _resolve_db_path() -> str:
+    """把DATABASE_URL转换为SQLite文件的绝对路径"""
     db_path = settings.DATABASE_URL
     
     # 如果带有 sqlite:// 前缀,去掉
@@ -52,5 +72,272 @@ def get_db_connection():
     if not os.path.isabs(db_path):
         db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", db_path))
     
-    return sqlite3.connect(db_path)
+    return db_path
+
+class _TracedCursor(sqlite3.Cursor):
+    """记录每条SQL的execute耗时(learnsmart_db_query_seconds)"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+
+class _TracedConnection(sqlite3.Connection):
+    """conn.execute / conn.cursor() 都经过 _TracedCursor"""
+    
+    def cursor(self, factory=_TracedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _configure_connection(conn: sqlite3.Connection):
+    """连接级PRAGMA(每个连接只执行一次)"""
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+
+def get_db_connection():
+    """获取同步SQLite连接（用于非异步操作）"""
+    conn = sqlite3.connect(_resolve_db_path(), factory=_TracedConnection)
+    _configure_connection(conn)
+    return conn
+
+
+class SQLitePool:
+    """
+    进程级SQLite连接池
+    
+    - 一个写连接: 串行使用,BEGIN IMMEDIATE 开启事务,退出时提交/回滚
+    - 多个只读连接: 按需创建,用完归还
+    WAL模式下读不阻塞写、写也不阻塞读。
+    """
+    
+    def __init__(self, db_path: str, max_readers: int):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._actor: Optional["WriteActor"] = None
+        self._writer = self._connect()
+        # WAL是数据库文件级的持久设置,由写连接设置一次即可
+        self._writer.execute("PRAGMA journal_mode = WAL")
+    
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        # isolation_level=None: 不让sqlite3模块隐式开启事务,事务边界由writer()控制
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False, factory=_TracedConnection
+        )
+        _configure_connection(conn)
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """借出一个只读连接"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                create = self._reader_count < self.max_readers
+                if create:
+                    self._reader_count += 1
+            conn = self._connect(readonly=True) if create else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+    
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """独占写连接,块内的写入作为一个事务提交(不可嵌套)"""
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            else:
+                self._writer.execute("COMMIT")
+    
+    @property
+    def actor(self) -> "WriteActor":
+        """该数据库的单写线程(首次使用时启动)"""
+        if self._actor is None:
+            with self._reader_lock:
+                if self._actor is None:
+                    self._actor = WriteActor(self, settings.SQLITE_WRITE_BATCH_MAX)
+        return self._actor
+    
+    def close(self):
+        if self._actor is not None:
+            self._actor.close()
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+T = TypeVar("T")
+_STOP = object()
+
+
+class WriteActor:
+    """
+    单写线程 - 独占写连接,合并提交(group commit)
+    
+    每次提交的写批次是一个函数 fn(conn),函数内的所有写入是一个原子单元;
+    线程每次从队列取出当前排队的所有批次,放进同一个事务里提交,
+    并发的对话共享一次fsync。单个批次出错只回滚它自己(SAVEPOINT),不影响同一事务里的其他批次。
+    """
+    
+    def __init__(self, pool: SQLitePool, max_batch: int):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.commits = 0
+        self.batches = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        """提交一个写批次,返回Future(提交成功后才有结果)"""
+        future: "Future[T]" = Future()
+        QUEUE_DEPTH.labels("sqlite_write").observe(self._queue.qsize())
+        self._queue.put((fn, future))
+        return future
+    
+    def execute(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """同步提交并等待结果"""
+        return self.submit(fn).result()
+    
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """异步提交并等待结果(不阻塞事件循环)"""
+        return await asyncio.wrap_future(self.submit(fn))
+    
+    def close(self):
+        """处理完已排队的批次后停止"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+    
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._commit(batch)
+            if stopping:
+                return
+    
+    def _commit(self, batch: List[Tuple[Callable, Future]]):
+        outcomes = []
+        try:
+            with span("db.commit"), self.pool.writer() as conn:
+                for fn, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT write_batch")
+                    try:
+                        result = fn(conn)
+                    except BaseException as e:
+                        conn.execute("ROLLBACK TO write_batch")
+                        conn.execute("RELEASE write_batch")
+                        outcomes.append((future, None, e))
+                    else:
+                        conn.execute("RELEASE write_batch")
+                        outcomes.append((future, result, None))
+        except BaseException as e:
+            # 提交本身失败: 整个事务回滚,所有批次都失败
+            for fn, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        
+        self.commits += 1
+        self.batches += len(outcomes)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool() -> SQLitePool:
+    """获取当前DATABASE_URL对应的连接池(进程内共享)"""
+    db_path = _resolve_db_path()
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = _pools[db_path] = SQLitePool(db_path, settings.SQLITE_MAX_READERS)
+    return pool
+
+def get_write_actor() -> WriteActor:
+    """获取当前数据库的单写线程"""
+    return get_pool().actor
+
+def close_pools():
+    """关闭所有连接池(应用退出时调用)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def _collect_pool_metrics() -> List[Family]:
+    """各连接池的写线程统计(抓取 /metrics 时读取)"""
+    with _pools_lock:
+        actors = [(path, pool._actor) for path, pool in _pools.items() if pool._actor is not None]
+    return [
+        counter("learnsmart_sqlite_commits", "写线程提交的事务数",
+                [({"db": os.path.basename(path)}, actor.commits) for path, actor in actors]),
+        counter("learnsmart_sqlite_write_batches", "写线程处理的写批次数",
+                [({"db": os.path.basename(path)}, actor.batches) for path, actor in actors]),
+        Family("learnsmart_sqlite_write_queue", "gauge", "写线程队列中等待的批次数",
+               [({"db": os.path.basename(path)}, actor._queue.qsize()) for path, actor in actors]),
+    ]
+
 
+registry.register_collector(_collect_pool_metrics)
@@ -1,13 +1,47 @@
 """FastAPI应用入口"""
-from fastapi import FastAPI
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.config import settings
-from app.api import chat, memory, materials, analysis, users
+from app.api import chat, memory, materials, analysis, users, search
+from app.core.ai_engine import ai_engine
+from app.database import close_pools, get_pool
+from app.services.warmup import Warmup
+from app.utils.api_client import doubao_client
+from app.utils.logger import logger, request_id
+from app.utils.metrics import registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动时创建进程内共享的资源(SQLite连接池、豆包连接池)并在后台预热,退出时关闭
+
+    各模块的单例在导入时只登记配置,不做I/O;这里是唯一创建它们的地方
+    """
+    get_pool()
+    doubao_client.client  # 连接池绑定当前事件循环
+    warmup = Warmup(ai_engine.client)
+    if settings.WARMUP_ENABLED:
+        warmup.start()
+    logger.info("🚀 服务启动 - 数据库:%s", settings.DATABASE_URL)
+    try:
+        yield
+    finally:
+        await warmup.stop()
+        await doubao_client.aclose()
+        close_pools()
+        logger.info("👋 服务已停止")
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    docs_url="/docs"
+    docs_url="/docs",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -18,11 +52,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    """给每个请求分配ID(沿用客户端的 X-Request-ID),日志里带上,并在响应头返回"""
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token = request_id.set(rid)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
+
 app.include_router(chat.router, prefix="/api/chat", tags=["对话"])
 app.include_router(memory.router, prefix="/api/memory", tags=["Memory"])
 app.include_router(materials.router, prefix="/api/materials", tags=["素材"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["分析"])
 app.include_router(users.router, prefix="/api/users", tags=["用户"])
+app.include_router(search.router, prefix="/api/search", tags=["搜索"])
 
 @app.get("/")
 async def root():
@@ -32,6 +79,11 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus抓取端点(采集回调里有查库,走线程池)"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
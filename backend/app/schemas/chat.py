@@ -1,10 +1,12 @@
 """对话Schema"""
+from typing import Optional
 from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
     child_id: int
     message: str
     mode: str = "knowledge"  # 添加这行,默认值为knowledge
+    conversation_id: Optional[int] = None  # 继续已有会话,为空则新建
 
 class ChatResponse(BaseModel):
     message: str
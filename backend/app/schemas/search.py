@@ -0,0 +1,17 @@
+"""全文检索Schema"""
+from typing import List, Optional
+from pydantic import BaseModel
+
+class SearchHit(BaseModel):
+    id: int
+    type: str                             # messages/knowledge/writing
+    snippet: str                          # 命中片段,命中词用 [] 标出
+    score: Optional[float] = None         # BM25(越小越相关);不足3个字的查询按时间倒序,为空
+    conversation_id: Optional[int] = None
+    role: Optional[str] = None            # 仅对话消息
+    subject: Optional[str] = None         # 仅知识点
+    created_at: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None     # 传给下一次请求的 cursor;为空表示没有更多结果
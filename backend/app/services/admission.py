@@ -0,0 +1,185 @@
+"""
+对话准入控制
+
+- 全局最多 ADMISSION_MAX_IN_FLIGHT 轮对话同时处理(豆包调用 + 写库)
+- 同一个孩子同时只处理一轮,后续的按顺序排队
+- 排队人数有上限(ADMISSION_MAX_QUEUE),按最近的处理耗时估算等待时间,
+  预计等不到 ADMISSION_QUEUE_TIMEOUT 内被处理的请求直接拒绝(503 + Retry-After),
+  不让它们排到超时再失败
+
+过载时已接纳的请求耗时保持稳定,多出来的请求尽快得到"稍后重试"的答复
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import QUEUE_DEPTH, counter, gauge, registry
+
+
+class AdmissionRejected(Exception):
+    """系统繁忙,请求被拒绝(客户端应在 retry_after 秒后重试)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"系统繁忙({reason}),请{math.ceil(retry_after)}秒后重试")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """一次准入,处理完成后释放(可重复调用 release)"""
+
+    def __init__(self, controller: "AdmissionController", child_id: int):
+        self._controller = controller
+        self.child_id = child_id
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self.child_id, time.monotonic() - self.admitted_at)
+
+
+class AdmissionController:
+    """准入控制器(一个事件循环内使用)"""
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        self.max_in_flight = max_in_flight if max_in_flight is not None else settings.ADMISSION_MAX_IN_FLIGHT
+        self.max_queue = max_queue if max_queue is not None else settings.ADMISSION_MAX_QUEUE
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.ADMISSION_QUEUE_TIMEOUT
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        # 每个孩子一把锁,引用计数为0时删除
+        self._children: Dict[int, asyncio.Lock] = {}
+        self._child_refs: Dict[int, int] = {}
+        # 一轮对话处理耗时的指数移动平均(秒),用于估算排队时间
+        self._turn_seconds: Optional[float] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def admit(self, child_id: int) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire(child_id)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    async def acquire(self, child_id: int) -> AdmissionTicket:
+        """等待准入;队列已满、预计等待超时或排队超时时抛出 AdmissionRejected"""
+        lock = self._children.get(child_id)
+        must_wait = (lock is not None and lock.locked()) or self._slots.locked()
+        if must_wait:
+            if self.waiting >= self.max_queue:
+                self._reject("排队人数已满")
+            estimate = self._estimated_wait()
+            if estimate > self.queue_timeout:
+                self._reject("预计等待超时", estimate)
+        QUEUE_DEPTH.labels("admission").observe(self.waiting)
+
+        if lock is None:
+            lock = self._children[child_id] = asyncio.Lock()
+        self._child_refs[child_id] = self._child_refs.get(child_id, 0) + 1
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        self.waiting += 1
+        try:
+            await self._acquire_before(lock, deadline)
+            try:
+                await self._acquire_before(self._slots, deadline)
+            except BaseException:
+                lock.release()
+                raise
+        except asyncio.TimeoutError:
+            self._unref(child_id)
+            self._reject("排队超时")
+        except BaseException:
+            self._unref(child_id)
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+        return AdmissionTicket(self, child_id)
+
+    @staticmethod
+    async def _acquire_before(primitive, deadline: float):
+        """
+        在截止时间前拿到锁或信号量;空闲时直接拿,不经过 wait_for
+        (超时为0时 wait_for 不会执行内部协程,空闲也会超时)
+        """
+        if not primitive.locked():
+            await primitive.acquire()
+            return
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        await asyncio.wait_for(primitive.acquire(), timeout=remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "turn_seconds": round(self._turn_seconds, 3) if self._turn_seconds is not None else None
+        }
+
+    def _estimated_wait(self) -> float:
+        """排在当前所有等待者之后的预计等待秒数(还没有耗时数据时为0)"""
+        if self._turn_seconds is None or self.max_in_flight <= 0:
+            return 0.0
+        rounds = math.ceil((self.waiting + 1) / self.max_in_flight)
+        return rounds * self._turn_seconds
+
+    def _reject(self, reason: str, estimate: Optional[float] = None):
+        self.rejected += 1
+        retry_after = max(1.0, estimate if estimate is not None else self._estimated_wait())
+        logger.warning("🚦 对话请求被拒绝: %s - 处理中:%s, 排队:%s", reason, self.in_flight, self.waiting)
+        raise AdmissionRejected(reason, retry_after)
+
+    def _release(self, child_id: int, elapsed: float):
+        self.in_flight -= 1
+        self._slots.release()
+        self._children[child_id].release()
+        self._unref(child_id)
+        self._turn_seconds = elapsed if self._turn_seconds is None else 0.8 * self._turn_seconds + 0.2 * elapsed
+
+    def _unref(self, child_id: int):
+        self._child_refs[child_id] -= 1
+        if self._child_refs[child_id] == 0:
+            del self._child_refs[child_id]
+            del self._children[child_id]
+
+
+# 单例模式(API进程的事件循环)
+admission_controller = AdmissionController()
+
+
+def _collect_admission_metrics():
+    controller = admission_controller
+    yield gauge("learnsmart_admission_in_flight", "正在处理的对话轮数", controller.in_flight)
+    yield gauge("learnsmart_admission_waiting", "排队等待准入的对话轮数", controller.waiting)
+    yield counter("learnsmart_admission_requests", "准入结果计数", [
+        ({"result": "admitted"}, controller.admitted),
+        ({"result": "rejected"}, controller.rejected),
+    ])
+
+
+registry.register_collector(_collect_admission_metrics)
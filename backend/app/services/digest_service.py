@@ -0,0 +1,253 @@
+"""
+分层长期记忆服务 - 会话 → 天 → 周 → 月 逐级压缩
+
+- 会话空闲 DIGEST_IDLE_MINUTES 分钟后视为结束,压缩为一条会话摘要
+- 已结束的一天/一周/一月,把下一层的摘要合并为一条
+- 上层记录覆盖的会话数(source_count),下层有新增/重算时自动重新合并
+
+由 python -m app.workers.digests 批量执行;读取见 MemoryService._get_long_term_memory
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool, get_write_actor
+from app.utils.api_client import DouBaoClient, doubao_client
+from app.utils.logger import logger
+from app.utils.prompt_manager import prompt_manager
+
+# 每层由哪一层合并而来
+SOURCE_LEVEL = {"day": "conversation", "week": "day", "month": "day"}
+
+# 压缩一段对话时最多读取的字数(取最近的部分)
+_MAX_TRANSCRIPT_CHARS = 4000
+
+_CONVERSATION_PROMPT = prompt_manager.register_prefix(
+    """你是儿童成长记录助手。请把孩子和AI学习伙伴"豆豆"的一段对话压缩成一句摘要,供以后回忆使用。
+
+【要求】
+- 以孩子为主语,写清楚做了什么、学了什么、和谁、心情如何
+- 只写对话中明确出现的信息,不要推测
+- 不要写豆豆说了什么,不要评价
+- 字数不超过末尾给出的上限,只返回摘要本身,不要任何前缀或引号"""
+)
+
+_MERGE_PROMPT = prompt_manager.register_prefix(
+    """你是儿童成长记录助手。下面是同一个孩子一段时间内按时间顺序排列的若干条成长摘要,请合并为一条更概括的摘要。
+
+【要求】
+- 保留最重要的学习内容、兴趣变化、社交事件和情绪变化,合并重复信息
+- 只使用给出的信息,不要推测
+- 字数不超过末尾给出的上限,只返回摘要本身,不要任何前缀或引号"""
+)
+
+
+@dataclass
+class PendingConversation:
+    """待压缩的已结束会话"""
+    id: int
+    child_id: int
+    start_time: str
+    end_time: str
+
+
+@dataclass
+class PendingPeriod:
+    """待(重新)合并的一天/一周/一月"""
+    child_id: int
+    level: str
+    key: str
+    start: str
+    end: str
+    source_count: int = 0
+    summaries: List[str] = field(default_factory=list)
+    # 下层摘要最近一次更新的时间
+    updated_at: str = ""
+
+
+def _period_of(level: str, day: str) -> Tuple[str, date, date]:
+    """某一天所属的周期: (period_key, 起始日, 结束日)"""
+    d = date.fromisoformat(day)
+    if level == "day":
+        return day, d, d
+    if level == "week":
+        monday = d - timedelta(days=d.weekday())
+        return monday.isoformat(), monday, monday + timedelta(days=6)
+    first = d.replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return first.strftime("%Y-%m"), first, next_month - timedelta(days=1)
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class DigestService:
+    """分层摘要的生成与合并"""
+
+    def __init__(self, client: Optional[DouBaoClient] = None):
+        self.client = client or doubao_client
+
+    def close_idle_conversations(self) -> int:
+        """把空闲超过 DIGEST_IDLE_MINUTES 的活跃会话标记为结束(end_time=最后一条消息的时间)"""
+        idle = f"-{int(settings.DIGEST_IDLE_MINUTES)} minutes"
+        sql = """
+            UPDATE conversations
+            SET is_active = 0,
+                end_time = COALESCE(
+                    (SELECT timestamp FROM messages WHERE conversation_id = conversations.id ORDER BY id DESC LIMIT 1),
+                    start_time
+                )
+            WHERE is_active = 1
+              AND COALESCE(
+                    (SELECT timestamp FROM messages WHERE conversation_id = conversations.id ORDER BY id DESC LIMIT 1),
+                    start_time
+                  ) < datetime('now', 'localtime', ?)
+        """
+        closed = get_write_actor().execute(lambda conn: conn.execute(sql, (idle,)).rowcount)
+        if closed:
+            logger.info("🔚 结束空闲会话: %s个", closed)
+        return closed
+
+    def pending_conversations(self, limit: int) -> List[PendingConversation]:
+        """已结束、有消息、但还没有(或有过期的)会话摘要的会话"""
+        with get_pool().reader() as conn:
+            rows = conn.execute("""
+                SELECT c.id, c.child_id, c.start_time, c.end_time
+                FROM conversations c
+                WHERE c.is_active = 0
+                  AND c.end_time >= datetime('now', 'localtime', ?)
+                  AND EXISTS (SELECT 1 FROM messages m WHERE m.conversation_id = c.id)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM memory_digests d
+                      WHERE d.child_id = c.child_id AND d.level = 'conversation'
+                        AND d.period_key = CAST(c.id AS TEXT) AND d.period_end >= c.end_time
+                  )
+                ORDER BY c.end_time
+                LIMIT ?
+            """, (f"-{int(settings.DIGEST_LOOKBACK_DAYS)} days", limit)).fetchall()
+        return [PendingConversation(*row) for row in rows]
+
+    async def digest_conversation(self, conversation: PendingConversation) -> str:
+        """压缩一个会话并保存会话摘要"""
+        rows = await asyncio.to_thread(self._messages, conversation.id)
+
+        speakers = {"user": "孩子", "assistant": "豆豆"}
+        transcript = "\n".join(f"{speakers[role]}: {content}" for role, content in rows)
+        transcript = transcript[-_MAX_TRANSCRIPT_CHARS:]
+        fallback = "；".join(content for role, content in rows if role == "user")
+
+        summary = await self._summarize(_CONVERSATION_PROMPT, transcript, fallback)
+        await self._save(conversation.child_id, "conversation", str(conversation.id),
+                   conversation.start_time, conversation.end_time, summary, 1)
+        return summary
+
+    def _messages(self, conversation_id: int) -> List[Tuple[str, str]]:
+        """会话里孩子和豆豆的消息(读连接池,同步执行)"""
+        with get_pool().reader() as conn:
+            return conn.execute("""
+                SELECT role, content FROM messages
+                WHERE conversation_id = ? AND role IN ('user', 'assistant')
+                ORDER BY id
+            """, (conversation_id,)).fetchall()
+
+    def pending_periods(self, level: str) -> List[PendingPeriod]:
+        """
+        需要(重新)合并的已结束周期
+
+        下层摘要按周期分组,覆盖的会话数与已有上层摘要记录的不一致(新增或缺失),
+        或者下层摘要在上层摘要之后被重新生成(会话结束后又继续聊),都需要合并
+        """
+        today = datetime.now().date()
+        _, lookback_start, _ = _period_of(level, (today - timedelta(days=settings.DIGEST_LOOKBACK_DAYS)).isoformat())
+
+        with get_pool().reader() as conn:
+            rows = conn.execute("""
+                SELECT child_id, period_end, summary, source_count, updated_at
+                FROM memory_digests
+                WHERE level = ? AND period_end >= ?
+                ORDER BY period_end
+            """, (SOURCE_LEVEL[level], lookback_start.isoformat())).fetchall()
+            existing = {
+                (child_id, key): (source_count, updated_at)
+                for child_id, key, source_count, updated_at in conn.execute("""
+                    SELECT child_id, period_key, source_count, updated_at
+                    FROM memory_digests
+                    WHERE level = ? AND period_end >= ?
+                """, (level, lookback_start.isoformat()))
+            }
+
+        periods: Dict[Tuple[int, str], PendingPeriod] = {}
+        for child_id, period_end, summary, source_count, updated_at in rows:
+            key, start, end = _period_of(level, period_end[:10])
+            if end >= today:
+                continue  # 周期还没结束
+            period = periods.get((child_id, key))
+            if period is None:
+                period = periods[(child_id, key)] = PendingPeriod(
+                    child_id, level, key, f"{start.isoformat()} 00:00:00", f"{end.isoformat()} 23:59:59"
+                )
+            period.source_count += source_count
+            period.summaries.append(summary)
+            period.updated_at = max(period.updated_at, updated_at)
+
+        pending = []
+        for key, period in periods.items():
+            digested = existing.get(key)
+            if digested is None or digested[0] != period.source_count or period.updated_at > digested[1]:
+                pending.append(period)
+        return pending
+
+    async def digest_period(self, period: PendingPeriod) -> str:
+        """合并一个周期的下层摘要并保存"""
+        if len(period.summaries) == 1:
+            summary = period.summaries[0]
+        else:
+            text = "\n".join(f"{i}. {s}" for i, s in enumerate(period.summaries, 1))
+            summary = await self._summarize(_MERGE_PROMPT, text, "；".join(period.summaries))
+        await self._save(period.child_id, period.level, period.key, period.start, period.end,
+                   summary, period.source_count)
+        return summary
+
+    async def _summarize(self, prompt: str, text: str, fallback: str) -> str:
+        """调用豆包生成摘要,失败时退回截断的原文"""
+        limit = settings.DIGEST_MAX_CHARS
+        try:
+            result = await self.client.chat_completion(
+                [
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": f"{text}\n\n(字数上限: {limit}字)"},
+                ],
+                temperature=0.3,
+                max_tokens=limit * 2,
+                timeout=settings.DOUBAO_EXTRACTION_TIMEOUT
+            )
+            if result and result.strip():
+                return _truncate(result.strip().strip('"“”'), limit)
+        except Exception as e:
+            logger.warning("⚠️ 豆包摘要失败,使用截断原文: %s", e)
+        return _truncate(fallback, limit)
+
+    async def _save(self, child_id: int, level: str, key: str, start: str, end: str, summary: str, source_count: int):
+        sql = """
+            INSERT INTO memory_digests
+            (child_id, level, period_key, period_start, period_end, summary, source_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(child_id, level, period_key) DO UPDATE SET
+                period_start = excluded.period_start,
+                period_end = excluded.period_end,
+                summary = excluded.summary,
+                source_count = excluded.source_count,
+                updated_at = datetime('now', 'localtime')
+        """
+        await get_write_actor().run(
+            lambda conn: conn.execute(sql, (child_id, level, key, start, end, summary, source_count))
+        )
+
+
+# 单例模式
+digest_service = DigestService()
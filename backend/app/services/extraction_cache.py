@@ -0,0 +1,232 @@
+"""
+提取结果缓存 - 按内容寻址
+
+归一化后的(用户消息, AI回复)取SHA-256作为键,命中时直接复用豆包的提取结果。
+进程内LRU + SQLite表(extraction_cache)两级,重启后仍然有效,多个进程共享;
+每条记录带上写入时的 system_config.prompt_version,提取Prompt升级后旧记录不再命中。
+异步代码用 aget/aput: 进程内命中时直接返回,需要读SQLite时放到线程池,不阻塞事件循环。
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool, get_write_actor
+from app.utils.logger import logger
+from app.utils.metrics import counter, registry
+
+# 连续重复的标点("开心!!!" 与 "开心!" 视为相同)
+_REPEATED_PUNCT = re.compile(r"([^\w\s])\1+")
+
+
+def normalize(text: str) -> str:
+    """归一化: 全角转半角、忽略大小写和空白、合并重复标点"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _REPEATED_PUNCT.sub(r"\1", "".join(text.split()))
+
+
+def content_hash(user_message: str, ai_response: str) -> str:
+    payload = f"{normalize(user_message)}\x00{normalize(ai_response)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """提取结果缓存(进程内LRU,未命中时查SQLite表)"""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or settings.EXTRACTION_CACHE_SIZE
+        # 键 -> (prompt版本, 结果JSON, 豆包耗时ms)
+        self._entries: "OrderedDict[str, Tuple[str, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._version_expires_at = 0.0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.saved_ms = 0
+
+    async def aget(self, user_message: str, ai_response: str) -> Optional[Dict[str, Any]]:
+        """get 的异步版本: 进程内命中时直接返回,需要查SQLite时在线程池里执行"""
+        version = self._cached_version()
+        if version is not None:
+            key = content_hash(user_message, ai_response)
+            entry = self._memory_entry(key, version)
+            if entry is not None:
+                return self._hit(key, entry)
+        return await asyncio.to_thread(self.get, user_message, ai_response)
+
+    async def aput(self, user_message: str, ai_response: str, result: Dict[str, Any], latency: float):
+        """put 的异步版本: 需要读 prompt_version 时在线程池里执行(写表本身不等待)"""
+        if self._cached_version() is not None:
+            self.put(user_message, ai_response, result, latency)
+        else:
+            await asyncio.to_thread(self.put, user_message, ai_response, result, latency)
+
+    def get(self, user_message: str, ai_response: str) -> Optional[Dict[str, Any]]:
+        """命中返回提取结果(每次返回新的副本),未命中返回None;可能查SQLite,异步代码用 aget"""
+        key = content_hash(user_message, ai_response)
+        version = self.prompt_version()
+        entry = self._memory_entry(key, version)
+
+        if entry is None:
+            with get_pool().reader() as conn:
+                row = conn.execute("""
+                    SELECT result, latency_ms FROM extraction_cache
+                    WHERE content_hash = ? AND prompt_version = ?
+                """, (key, version)).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry = (version, row[0], row[1])
+            with self._lock:
+                self.db_hits += 1
+            self._remember(key, entry)
+        return self._hit(key, entry)
+
+    def put(self, user_message: str, ai_response: str, result: Dict[str, Any], latency: float):
+        """保存一次豆包提取的结果(latency为这次调用的耗时,秒)"""
+        key = content_hash(user_message, ai_response)
+        entry = (self.prompt_version(), json.dumps(result, ensure_ascii=False), int(latency * 1000))
+        self._remember(key, entry)
+        sql = """
+            INSERT INTO extraction_cache (content_hash, prompt_version, result, latency_ms)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                prompt_version = excluded.prompt_version,
+                result = excluded.result,
+                latency_ms = excluded.latency_ms,
+                hits = 0,
+                created_at = datetime('now', 'localtime'),
+                last_used_at = datetime('now', 'localtime')
+        """
+        get_write_actor().submit(lambda conn: conn.execute(sql, (key, *entry)))
+
+    def _cached_version(self) -> Optional[str]:
+        """未过期的 prompt_version(需要重新读表时返回None)"""
+        if self._version is not None and time.monotonic() < self._version_expires_at:
+            return self._version
+        return None
+
+    def prompt_version(self) -> str:
+        """当前提取Prompt版本(system_config.prompt_version,每 EXTRACTION_CACHE_VERSION_TTL 秒读一次)"""
+        now = time.monotonic()
+        if self._version is not None and now < self._version_expires_at:
+            return self._version
+        with get_pool().reader() as conn:
+            row = conn.execute("SELECT value FROM system_config WHERE key = 'prompt_version'").fetchone()
+        version = row[0] if row else ""
+        if self._version is not None and version != self._version:
+            logger.info("🔄 提取Prompt版本变化 %s -> %s,旧缓存失效", self._version, version)
+        self._version = version
+        self._version_expires_at = now + settings.EXTRACTION_CACHE_VERSION_TTL
+        return version
+
+    def prune(self, max_rows: Optional[int] = None) -> int:
+        """删除其他Prompt版本的记录,并按最近使用时间只保留 max_rows 条,返回删除的条数"""
+        max_rows = settings.EXTRACTION_CACHE_MAX_ROWS if max_rows is None else max_rows
+        version = self.prompt_version()
+        sql = """
+            DELETE FROM extraction_cache
+            WHERE prompt_version != ?
+               OR content_hash IN (
+                   SELECT content_hash FROM extraction_cache
+                   ORDER BY last_used_at DESC
+                   LIMIT -1 OFFSET ?
+               )
+        """
+        deleted = get_write_actor().execute(lambda conn: conn.execute(sql, (version, max_rows)).rowcount)
+        if deleted:
+            logger.info("🧹 清理提取缓存: %s条", deleted)
+        return deleted
+
+    def clear(self):
+        """清空进程内缓存和统计(不影响SQLite表)"""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.memory_hits = self.db_hits = self.misses = self.saved_ms = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        命中统计
+
+        hits/misses/saved_seconds 为本进程的统计;stored_* 为表中当前Prompt版本的累计
+        (包括提取worker等其他进程的命中)
+        """
+        version = self.prompt_version()
+        with get_pool().reader() as conn:
+            stored, stored_hits, stored_saved_ms = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * latency_ms), 0)
+                FROM extraction_cache
+                WHERE prompt_version = ?
+            """, (version,)).fetchone()
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            total = hits + self.misses
+            return {
+                "prompt_version": version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "saved_seconds": round(self.saved_ms / 1000, 3),
+                "stored": stored,
+                "stored_hits": stored_hits,
+                "stored_saved_seconds": round(stored_saved_ms / 1000, 3)
+            }
+
+    def _memory_entry(self, key: str, version: str) -> Optional[Tuple[str, str, int]]:
+        """进程内LRU里当前版本的记录"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+
+    def _hit(self, key: str, entry: Tuple[str, str, int]) -> Dict[str, Any]:
+        """记一次命中(表里的命中计数交给写线程,不等待)并返回结果副本"""
+        with self._lock:
+            self.saved_ms += entry[2]
+        sql = """
+            UPDATE extraction_cache
+            SET hits = hits + 1, last_used_at = datetime('now', 'localtime')
+            WHERE content_hash = ?
+        """
+        get_write_actor().submit(lambda conn: conn.execute(sql, (key,)))
+        logger.info("♻️ 提取缓存命中 - 节省%sms", entry[2])
+        return json.loads(entry[1])
+
+    def _remember(self, key: str, entry: Tuple[str, str, int]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+# 单例模式
+extraction_cache = ExtractionCache()
+
+
+def _collect_cache_metrics():
+    yield counter("learnsmart_cache_requests", "缓存查询次数(命中率 = hit / (hit + miss))", [
+        ({"cache": "extraction", "result": "hit"}, extraction_cache.memory_hits),
+        ({"cache": "extraction", "result": "db_hit"}, extraction_cache.db_hits),
+        ({"cache": "extraction", "result": "miss"}, extraction_cache.misses),
+    ])
+
+
+registry.register_collector(_collect_cache_metrics)
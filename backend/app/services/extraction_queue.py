@@ -0,0 +1,202 @@
+"""
+提取任务队列 - 基于SQLite表的持久化队列
+对话入队后立即返回,由独立的worker进程消费(至少一次语义)
+"""
+
+import random
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool, get_write_actor
+from app.utils.logger import logger
+from app.utils.metrics import gauge, registry
+
+
+@dataclass
+class ExtractionJob:
+    """一条待提取的对话轮次"""
+    id: int
+    conversation_id: int
+    child_id: int
+    user_message: str
+    ai_response: str
+    attempts: int
+
+
+class ExtractionQueue:
+    """提取任务队列"""
+
+    def enqueue(
+        self,
+        conversation_id: int,
+        child_id: int,
+        user_message: str,
+        ai_response: str,
+        conn: Optional[sqlite3.Connection] = None
+    ) -> int:
+        """
+        入队一条提取任务,返回任务ID
+
+        传入conn时写入调用方的写批次(与本轮消息一起提交),否则单独提交
+        """
+        if conn is None:
+            return get_write_actor().execute(
+                lambda c: self.enqueue(conversation_id, child_id, user_message, ai_response, conn=c)
+            )
+        cursor = conn.execute("""
+            INSERT INTO extraction_jobs
+            (conversation_id, child_id, user_message, ai_response)
+            VALUES (?, ?, ?, ?)
+        """, (conversation_id, child_id, user_message, ai_response))
+        return cursor.lastrowid
+
+    def claim(self, worker_id: str, limit: int) -> List[ExtractionJob]:
+        """
+        领取最多limit条任务
+
+        可领取: 到期的pending任务,以及租约已过期的running任务(worker崩溃后回收)
+        """
+        return self._jobs(get_write_actor().execute(self._claim_batch(worker_id, limit)))
+
+    async def aclaim(self, worker_id: str, limit: int) -> List[ExtractionJob]:
+        """claim 的异步版本(等待写线程时不阻塞事件循环)"""
+        return self._jobs(await get_write_actor().run(self._claim_batch(worker_id, limit)))
+
+    def complete(self, job_id: int):
+        """标记任务完成"""
+        self._update(job_id, "done", None, 0)
+
+    async def acomplete(self, job_id: int):
+        """complete 的异步版本"""
+        await get_write_actor().run(self._update_batch(job_id, "done", None, 0))
+
+    def retry(self, job: ExtractionJob, error: str) -> bool:
+        """
+        任务失败: 未超过最大次数则按指数退避(带抖动)重新入队,否则标记为failed
+
+        Returns:
+            是否会再次重试
+        """
+        status, delay = self._retry_state(job, error)
+        self._update(job.id, status, error, delay)
+        return status == "pending"
+
+    async def aretry(self, job: ExtractionJob, error: str) -> bool:
+        """retry 的异步版本"""
+        status, delay = self._retry_state(job, error)
+        await get_write_actor().run(self._update_batch(job.id, status, error, delay))
+        return status == "pending"
+
+    def _claim_batch(self, worker_id: str, limit: int) -> Callable[[sqlite3.Connection], list]:
+        lease = f"-{int(settings.EXTRACTION_LEASE_SECONDS)} seconds"
+        sql = """
+            UPDATE extraction_jobs
+            SET status = 'running',
+                attempts = attempts + 1,
+                locked_by = ?,
+                locked_at = datetime('now', 'localtime'),
+                updated_at = datetime('now', 'localtime')
+            WHERE id IN (
+                SELECT id FROM extraction_jobs
+                WHERE (status = 'pending' AND available_at <= datetime('now', 'localtime'))
+                   OR (status = 'running' AND locked_at <= datetime('now', 'localtime', ?))
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, conversation_id, child_id, user_message, ai_response, attempts
+        """
+        return lambda conn: conn.execute(sql, (worker_id, lease, limit)).fetchall()
+
+    @staticmethod
+    def _jobs(rows: list) -> List[ExtractionJob]:
+        jobs = [ExtractionJob(*row) for row in rows]
+        jobs.sort(key=lambda job: job.id)
+        return jobs
+
+    def _retry_state(self, job: ExtractionJob, error: str) -> Tuple[str, float]:
+        """失败后的(状态, 延迟秒数)"""
+        if job.attempts >= settings.EXTRACTION_MAX_ATTEMPTS:
+            logger.error("❌ 提取任务%s重试%s次后放弃: %s", job.id, job.attempts, error)
+            return "failed", 0
+
+        delay = min(
+            settings.EXTRACTION_RETRY_MAX_DELAY,
+            settings.EXTRACTION_RETRY_BASE_DELAY * (2 ** (job.attempts - 1))
+        )
+        delay *= random.uniform(0.5, 1.0)
+        logger.warning("⚠️ 提取任务%s第%s次失败,%.1f秒后重试: %s", job.id, job.attempts, delay, error)
+        return "pending", delay
+
+    def _update(self, job_id: int, status: str, error: Optional[str], delay: float):
+        get_write_actor().execute(self._update_batch(job_id, status, error, delay))
+
+    def _update_batch(
+        self, job_id: int, status: str, error: Optional[str], delay: float
+    ) -> Callable[[sqlite3.Connection], Any]:
+        sql = """
+            UPDATE extraction_jobs
+            SET status = ?,
+                last_error = ?,
+                locked_by = NULL,
+                locked_at = NULL,
+                available_at = datetime('now', 'localtime', ?),
+                updated_at = datetime('now', 'localtime')
+            WHERE id = ?
+        """
+        return lambda conn: conn.execute(sql, (status, error, f"+{delay:.3f} seconds", job_id))
+
+    def purge(
+        self,
+        done_hours: Optional[float] = None,
+        failed_hours: Optional[float] = None,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        删除超过保留时长的已完成(done)和已放弃(failed)任务,返回删除的条数
+
+        终态任务的 available_at 就是完成时间,按 (status, available_at) 索引定位;
+        每个写批次最多删 batch_size 条,不长时间占用写线程
+        """
+        done_hours = settings.EXTRACTION_DONE_RETENTION_HOURS if done_hours is None else done_hours
+        failed_hours = settings.EXTRACTION_FAILED_RETENTION_HOURS if failed_hours is None else failed_hours
+        sql = """
+            DELETE FROM extraction_jobs
+            WHERE id IN (
+                SELECT id FROM extraction_jobs
+                WHERE status = ? AND available_at < datetime('now', 'localtime', ?)
+                LIMIT ?
+            )
+        """
+        deleted = 0
+        for status, hours in (("done", done_hours), ("failed", failed_hours)):
+            cutoff = f"-{hours * 3600:.0f} seconds"
+            while True:
+                count = get_write_actor().execute(
+                    lambda conn: conn.execute(sql, (status, cutoff, batch_size)).rowcount
+                )
+                deleted += count
+                if count < batch_size:
+                    break
+        if deleted:
+            logger.info("🧹 清理提取任务 - 删除%s条", deleted)
+        return deleted
+
+    def pending_count(self) -> int:
+        """待处理(含重试中)的任务数"""
+        with get_pool().reader() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM extraction_jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+
+
+# 单例模式
+extraction_queue = ExtractionQueue()
+
+
+def _collect_queue_metrics():
+    yield gauge("learnsmart_extraction_jobs_pending", "待处理(含重试中)的提取任务数", extraction_queue.pending_count())
+
+
+registry.register_collector(_collect_queue_metrics)
@@ -0,0 +1,163 @@
+"""
+对话历史服务 - 按token预算为模型提供最近的对话轮次
+
+每个会话在内存里保留最近 HISTORY_MAX_MESSAGES 条消息(环形缓冲),
+未命中时用一条索引查询从SQLite加载;发给模型的历史不超过 HISTORY_TOKEN_BUDGET,
+对话再长,prompt大小和模型延迟也保持稳定。缓冲同时记录会话的轮次数,
+每轮结束时递增,不必再 COUNT 消息表。
+
+多进程部署时,同一会话的请求应路由到同一进程(或依赖 HISTORY_CACHE_TTL 过期后重新加载)。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool
+from app.utils.metrics import counter, registry, traced
+from app.utils.tokenizer import estimate_message_tokens
+
+# (角色, 内容, token数)
+_Message = Tuple[str, str, int]
+
+
+class _Entry:
+    """一个会话的缓冲"""
+    __slots__ = ("expires_at", "messages", "turns")
+
+    def __init__(self, expires_at: float, messages: Deque[_Message], turns: int):
+        self.expires_at = expires_at
+        self.messages = messages
+        self.turns = turns
+
+
+class ConversationHistory:
+    """对话历史(每个会话一个环形缓冲,会话之间LRU + TTL淘汰)"""
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_conversations: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        self.max_messages = max_messages or settings.HISTORY_MAX_MESSAGES
+        self.max_conversations = max_conversations or settings.HISTORY_CACHE_SIZE
+        self.ttl = settings.HISTORY_CACHE_TTL if ttl is None else ttl
+        self._buffers: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, conversation_id: int, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        获取发给模型的历史消息(OpenAI格式,按时间正序)
+
+        从最新的一轮往前取整轮(用户+回复),直到再加一轮就超出token预算
+        """
+        budget = settings.HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+        buffer = self._get_buffer(conversation_id)
+
+        selected: List[_Message] = []
+        used = 0
+        turn: List[_Message] = []
+        turn_tokens = 0
+        for message in reversed(buffer):
+            turn.append(message)
+            turn_tokens += message[2]
+            if message[0] != "user":
+                continue
+            # 遇到用户消息,一轮完整
+            if used + turn_tokens > budget:
+                break
+            selected.extend(turn)
+            used += turn_tokens
+            turn, turn_tokens = [], 0
+
+        return [{"role": role, "content": content} for role, content, _ in reversed(selected)]
+
+    def append_turn(self, conversation_id: int, user_message: str, ai_response: str) -> Optional[int]:
+        """
+        本轮消息落库后追加到缓冲,返回会话的轮次数
+
+        缓冲不存在(或已过期)时不加载,返回None,由调用方查库
+        """
+        with self._lock:
+            entry = self._buffers.get(conversation_id)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            entry.messages.append(("user", user_message, estimate_message_tokens(user_message)))
+            entry.messages.append(("assistant", ai_response, estimate_message_tokens(ai_response)))
+            entry.turns += 1
+            return entry.turns
+
+    def start(self, conversation_id: int):
+        """新建会话时登记一个空缓冲(新会话没有历史,不必查库)"""
+        self._put(conversation_id, _Entry(0.0, deque(maxlen=self.max_messages), 0))
+
+    def invalidate(self, conversation_id: int):
+        with self._lock:
+            self._buffers.pop(conversation_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+
+    def _get_buffer(self, conversation_id: int) -> List[_Message]:
+        with self._lock:
+            entry = self._buffers.get(conversation_id)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._buffers.move_to_end(conversation_id)
+                self.hits += 1
+                return list(entry.messages)
+            self.misses += 1
+
+        messages, turns = self._fetch(conversation_id)
+        buffer = deque(messages, maxlen=self.max_messages)
+        self._put(conversation_id, _Entry(0.0, buffer, turns))
+        return list(buffer)
+
+    def _put(self, conversation_id: int, entry: _Entry):
+        with self._lock:
+            entry.expires_at = time.monotonic() + self.ttl
+            self._buffers[conversation_id] = entry
+            self._buffers.move_to_end(conversation_id)
+            while len(self._buffers) > self.max_conversations:
+                self._buffers.popitem(last=False)
+
+    @traced("history.fetch")
+    def _fetch(self, conversation_id: int) -> Tuple[List[_Message], int]:
+        """
+        从数据库读取会话最近的消息(按时间正序)和轮次数
+
+        分别走 messages(conversation_id, id) 和 messages(conversation_id, role) 索引
+        """
+        with get_pool().reader() as conn:
+            rows = conn.execute("""
+                SELECT role, content
+                FROM messages
+                WHERE conversation_id = ? AND role IN ('user', 'assistant')
+                ORDER BY id DESC
+                LIMIT ?
+            """, (conversation_id, self.max_messages)).fetchall()
+            turns = conn.execute("""
+                SELECT COUNT(*) FROM messages
+                WHERE conversation_id = ? AND role = 'user'
+            """, (conversation_id,)).fetchone()[0]
+        messages = [(role, content, estimate_message_tokens(content)) for role, content in reversed(rows)]
+        return messages, turns
+
+
+# 单例模式
+conversation_history = ConversationHistory()
+
+
+def _collect_cache_metrics():
+    yield counter("learnsmart_cache_requests", "缓存查询次数(命中率 = hit / (hit + miss))", [
+        ({"cache": "history", "result": "hit"}, conversation_history.hits),
+        ({"cache": "history", "result": "miss"}, conversation_history.misses),
+    ])
+
+
+registry.register_collector(_collect_cache_metrics)
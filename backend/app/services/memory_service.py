@@ -5,23 +5,193 @@
 
 import sqlite3
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from app.config import settings
+from app.database import get_pool
+from app.utils.metrics import counter, registry, traced
 import logging
 
 logger = logging.getLogger("LearnSmart")
 
 
+def _cutoff_date(days: Optional[int]) -> str:
+    """时间窗口的起始日期(None=全部,返回空串,任何created_at都不小于它)"""
+    if not days:
+        return ""
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _window_sums(expr: str, n: int, column: str = "created_at") -> str:
+    """为n个时间窗口各生成一列 SUM(...),窗口起始日期作为参数依次绑定"""
+    return ",\n                ".join(
+        [f"SUM(CASE WHEN {column} >= ? THEN {expr} END)"] * n
+    )
+
+
+def _window_rollups(
+    cursor: sqlite3.Cursor,
+    child_id: int,
+    dimension: str,
+    cutoffs: List[str]
+) -> List[tuple]:
+    """
+    从按天汇总表读取一个维度各窗口的分组统计
+    
+    每行: (key1, key2, 各窗口条数..., 各窗口数值之和..., 各窗口数值非空条数...)
+    只读取窗口内的天数行,代价与历史数据量无关
+    """
+    n = len(cutoffs)
+    cursor.execute(f"""
+        SELECT 
+            key1,
+            key2,
+            {_window_sums("count", n, "day")},
+            {_window_sums("value_sum", n, "day")},
+            {_window_sums("value_count", n, "day")}
+        FROM memory_daily_rollups
+        WHERE child_id = ? AND dimension = ? AND day >= ?
+        GROUP BY key1, key2
+    """, (*cutoffs * 3, child_id, dimension, min(cutoffs)))
+    return cursor.fetchall()
+
+
+class MemoryCache:
+    """
+    记忆缓存 - 按(child_id, days)缓存记忆字典和摘要文本
+    
+    LRU + TTL淘汰,容量有上限;每条缓存记录写入时孩子的记忆版本号,
+    版本号变化(有新的维度数据写入)即视为失效
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, Optional[int]], Tuple[float, int, Dict, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, child_id: int, days: Optional[int], version: int) -> Optional[Tuple[Dict, str]]:
+        """命中返回(记忆字典, 摘要文本),未命中/过期/版本不符返回None"""
+        key = (child_id, days)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, cached_version, memory, summary = entry
+            if expires_at <= time.monotonic() or cached_version != version:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return memory, summary
+    
+    def put(self, child_id: int, days: Optional[int], version: int, memory: Dict, summary: str):
+        key = (child_id, days)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, memory, summary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, child_id: int):
+        """删除该孩子所有时间窗口的缓存"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == child_id]:
+                del self._entries[key]
+                self.invalidations += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """命中统计(用于评估缓存容量)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
 class MemoryService:
     """记忆服务 - 管理孩子的成长记忆"""
     
     def __init__(self):
-        self.db_path = settings.DATABASE_URL
+        self.cache = MemoryCache(settings.MEMORY_CACHE_SIZE, settings.MEMORY_CACHE_TTL)
+        # 正在预取的孩子,避免同一个孩子重复预取
+        self._prefetching: set = set()
+        self._prefetch_lock = threading.Lock()
+    
+    @traced("memory.get_with_summary")
+    def get_memory_with_summary(
+        self,
+        child_id: int,
+        days: Optional[int] = 7
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        获取记忆字典和摘要文本(一次计算,带缓存)
+        
+        Returns:
+            (记忆字典, 摘要文本);返回的字典是缓存共享的,调用方不要修改
+        """
+        version = self._get_memory_version(child_id)
+        cached = self.cache.get(child_id, days, version)
+        if cached is not None:
+            return cached
+        
+        memory = self.get_child_memory(child_id, days)
+        summary = self._render_summary(memory, days)
+        self.cache.put(child_id, days, version, memory, summary)
+        return memory, summary
+    
+    def prefetch(self, child_id: int, days: Optional[int] = 7) -> bool:
+        """
+        提前计算并缓存孩子的记忆(打开App、启动预热时调用),首条消息直接命中缓存
+
+        同一个孩子已在预取中时直接返回False;出错只记日志(预取失败不影响之后的对话)
+        """
+        with self._prefetch_lock:
+            if child_id in self._prefetching:
+                return False
+            self._prefetching.add(child_id)
+        try:
+            self.get_memory_with_summary(child_id, days)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ 预取记忆失败 Child:%s: %s", child_id, e)
+            return False
+        finally:
+            with self._prefetch_lock:
+                self._prefetching.discard(child_id)
+    
+    def invalidate(self, child_id: int):
+        """孩子有新的维度数据写入时调用"""
+        self.cache.invalidate(child_id)
     
-    def _get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+    def _get_memory_version(self, child_id: int) -> int:
+        """孩子的记忆版本号(由数据库触发器维护)"""
+        with get_pool().reader() as conn:
+            row = conn.execute(
+                "SELECT version FROM memory_versions WHERE child_id = ?", (child_id,)
+            ).fetchone()
+        return row[0] if row else 0
     
     def get_child_memory(
         self, 
@@ -38,104 +208,131 @@ class MemoryService:
         Returns:
             包含5维度数据的记忆字典
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        return self.get_child_memory_windows(child_id, (days,))[days]
+    
+    @traced("memory.windows")
+    def get_child_memory_windows(
+        self,
+        child_id: int,
+        windows: Sequence[Optional[int]] = (7, 30, 90, None)
+    ) -> Dict[Optional[int], Dict[str, Any]]:
+        """
+        一次扫描同时计算多个时间窗口的记忆
         
-        # 计算时间过滤条件
-        time_filter = ""
-        if days:
-            cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            time_filter = f"AND created_at >= '{cutoff_date}'"
+        每张维度表只有一条分组统计查询(按窗口条件聚合)和一条最近记录查询,
+        均为参数化SQL
         
-        memory = {
-            "knowledge": self._get_knowledge_memory(cursor, child_id, time_filter),
-            "writing": self._get_writing_memory(cursor, child_id, time_filter),
-            "social": self._get_social_memory(cursor, child_id, time_filter),
-            "emotion": self._get_emotion_memory(cursor, child_id, time_filter),
-            "personality": self._get_personality_traits(cursor, child_id),
-            "user_profile": self._get_user_profile(cursor, child_id),
-            "deep_interests": self._get_deep_interests(cursor, child_id),
-        }
+        Args:
+            child_id: 孩子ID
+            windows: 时间窗口列表(天数, None=全部)
+        
+        Returns:
+            {窗口: 与get_child_memory结构相同的记忆字典}
+        """
+        cutoffs = [_cutoff_date(days) for days in windows]
         
-        conn.close()
-        return memory
+        with get_pool().reader() as conn:
+            cursor = conn.cursor()
+            
+            knowledge = self._get_knowledge_memory(cursor, child_id, cutoffs)
+            writing = self._get_writing_memory(cursor, child_id, cutoffs)
+            social = self._get_social_memory(cursor, child_id, cutoffs)
+            emotion = self._get_emotion_memory(cursor, child_id, cutoffs)
+            personality = self._get_personality_traits(cursor, child_id)
+            user_profile = self._get_user_profile(cursor, child_id)
+            deep_interests = self._get_deep_interests(cursor, child_id)
+            long_term = self._get_long_term_memory(cursor, child_id)
+        
+        return {
+            days: {
+                "knowledge": knowledge[i],
+                "writing": writing[i],
+                "social": social[i],
+                "emotion": emotion[i],
+                "personality": personality,
+                "user_profile": user_profile,
+                "deep_interests": deep_interests,
+                "long_term": long_term,
+            }
+            for i, days in enumerate(windows)
+        }
     
     def _get_knowledge_memory(
         self, 
         cursor: sqlite3.Cursor, 
         child_id: int, 
-        time_filter: str
-    ) -> Dict[str, Any]:
-        """获取知识维度记忆"""
-        # 统计主动/被动学习
-        cursor.execute(f"""
-            SELECT 
-                source,
-                COUNT(*) as count
-            FROM knowledge_points
-            WHERE child_id = ? {time_filter}
-            GROUP BY source
-        """, (child_id,))
-        learning_stats = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # 学科分布
-        cursor.execute(f"""
-            SELECT 
-                subject,
-                COUNT(*) as count,
-                AVG(confidence_score) as avg_confidence
-            FROM knowledge_points
-            WHERE child_id = ? {time_filter}
-            GROUP BY subject
-            ORDER BY count DESC
-            LIMIT 5
-        """, (child_id,))
-        subjects = [
-            {
-                "subject": row[0],
-                "count": row[1],
-                "avg_confidence": round(row[2], 2) if row[2] else 0
-            }
-            for row in cursor.fetchall()
-        ]
+        cutoffs: List[str]
+    ) -> List[Dict[str, Any]]:
+        """获取知识维度记忆(每个窗口一份)"""
+        n = len(cutoffs)
+        # 按(来源, 学科)分组,各窗口的条数、置信度之和、置信度非空条数
+        groups = _window_rollups(cursor, child_id, "knowledge", cutoffs)
         
         # 最近学习内容(最近3条)
-        cursor.execute(f"""
+        cursor.execute("""
             SELECT 
                 subject,
                 content,
                 source,
                 created_at
             FROM knowledge_points
-            WHERE child_id = ? {time_filter}
+            WHERE child_id = ? AND created_at >= ?
             ORDER BY created_at DESC
             LIMIT 3
-        """, (child_id,))
-        recent_learning = [
-            {
-                "subject": row[0],
-                "content": row[1],
-                "source": row[2],
-                "date": row[3][:10]  # 只取日期部分
-            }
-            for row in cursor.fetchall()
-        ]
+        """, (child_id, min(cutoffs)))
+        recent_rows = cursor.fetchall()
         
-        return {
-            "learning_stats": learning_stats,
-            "subjects": subjects,
-            "recent_learning": recent_learning
-        }
+        results = []
+        for i, cutoff in enumerate(cutoffs):
+            # 统计主动/被动学习
+            learning_stats: Dict[str, int] = {}
+            # 学科分布: 学科 -> [条数, 置信度之和, 置信度非空条数]
+            subject_totals: Dict[str, List[float]] = {}
+            for row in groups:
+                count = row[2 + i] or 0
+                if not count:
+                    continue
+                learning_stats[row[0]] = learning_stats.get(row[0], 0) + count
+                totals = subject_totals.setdefault(row[1], [0, 0.0, 0])
+                totals[0] += count
+                totals[1] += row[2 + n + i] or 0.0
+                totals[2] += row[2 + 2 * n + i] or 0
+            
+            subjects = [
+                {
+                    "subject": subject,
+                    "count": totals[0],
+                    "avg_confidence": round(totals[1] / totals[2], 2) if totals[2] and totals[1] else 0
+                }
+                for subject, totals in sorted(subject_totals.items(), key=lambda kv: (kv[1][0], kv[0]), reverse=True)[:5]
+            ]
+            
+            recent_learning = [
+                {
+                    "subject": row[0],
+                    "content": row[1],
+                    "source": row[2],
+                    "date": row[3][:10]  # 只取日期部分
+                }
+                for row in recent_rows if row[3] >= cutoff
+            ]
+            
+            results.append({
+                "learning_stats": dict(sorted(learning_stats.items())),
+                "subjects": subjects,
+                "recent_learning": recent_learning
+            })
+        return results
     
     def _get_writing_memory(
         self, 
         cursor: sqlite3.Cursor, 
         child_id: int, 
-        time_filter: str
-    ) -> Dict[str, Any]:
-        """获取表达维度记忆"""
+        cutoffs: List[str]
+    ) -> List[Dict[str, Any]]:
+        """获取表达维度记忆(每个窗口一份)"""
         # 最近的写作素材
-        cursor.execute(f"""
+        cursor.execute("""
             SELECT 
                 event_description,
                 event_time,
@@ -143,10 +340,10 @@ class MemoryService:
                 people,
                 created_at
             FROM writing_materials
-            WHERE child_id = ? {time_filter}
+            WHERE child_id = ? AND created_at >= ?
             ORDER BY created_at DESC
             LIMIT 5
-        """, (child_id,))
+        """, (child_id, min(cutoffs)))
         
         materials = []
         for row in cursor.fetchall():
@@ -155,145 +352,150 @@ class MemoryService:
             except:
                 people = []
             
-            materials.append({
+            materials.append((row[4], {
                 "description": row[0][:50] + "..." if len(row[0]) > 50 else row[0],
                 "event_time": row[1],
                 "location": row[2],
                 "people_count": len(people),
                 "date": row[4][:10]
-            })
+            }))
         
         # 常去地点统计
-        cursor.execute(f"""
-            SELECT 
-                location,
-                COUNT(*) as count
-            FROM writing_materials
-            WHERE child_id = ? AND location IS NOT NULL {time_filter}
-            GROUP BY location
-            ORDER BY count DESC
-            LIMIT 3
-        """, (child_id,))
+        location_rows = _window_rollups(cursor, child_id, "writing", cutoffs)
         
-        locations = [{"location": row[0], "count": row[1]} for row in cursor.fetchall()]
-        
-        return {
-            "recent_materials": materials,
-            "frequent_locations": locations
-        }
+        results = []
+        for i, cutoff in enumerate(cutoffs):
+            locations = sorted(
+                (
+                    {"location": row[0], "count": row[2 + i]}
+                    for row in location_rows if row[2 + i]
+                ),
+                key=lambda item: (item["count"], item["location"]),
+                reverse=True
+            )[:3]
+            results.append({
+                "recent_materials": [item for created_at, item in materials if created_at >= cutoff],
+                "frequent_locations": locations
+            })
+        return results
     
     def _get_social_memory(
         self, 
         cursor: sqlite3.Cursor, 
         child_id: int, 
-        time_filter: str
-    ) -> Dict[str, Any]:
-        """获取社交维度记忆"""
-        # 关系类型统计
-        cursor.execute(f"""
-            SELECT 
-                relationship_type,
-                COUNT(*) as count
-            FROM social_events
-            WHERE child_id = ? {time_filter}
-            GROUP BY relationship_type
-        """, (child_id,))
-        relationships = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # 行为模式统计
-        cursor.execute(f"""
-            SELECT 
-                behavior_pattern,
-                COUNT(*) as count
-            FROM social_events
-            WHERE child_id = ? AND behavior_pattern IS NOT NULL {time_filter}
-            GROUP BY behavior_pattern
-            ORDER BY count DESC
-        """, (child_id,))
-        behaviors = [{"pattern": row[0], "count": row[1]} for row in cursor.fetchall()]
+        cutoffs: List[str]
+    ) -> List[Dict[str, Any]]:
+        """获取社交维度记忆(每个窗口一份)"""
+        # 按(关系类型, 行为模式)分组统计(行为模式为空时key2为'')
+        groups = _window_rollups(cursor, child_id, "social", cutoffs)
         
         # 最近社交事件
-        cursor.execute(f"""
+        cursor.execute("""
             SELECT 
                 relationship_type,
                 behavior_pattern,
                 substr(event_context, 1, 50) as context,
                 created_at
             FROM social_events
-            WHERE child_id = ? {time_filter}
+            WHERE child_id = ? AND created_at >= ?
             ORDER BY created_at DESC
             LIMIT 3
-        """, (child_id,))
-        recent_events = [
-            {
-                "relationship": row[0],
-                "behavior": row[1],
-                "context": row[2],
-                "date": row[3][:10]
-            }
-            for row in cursor.fetchall()
-        ]
+        """, (child_id, min(cutoffs)))
+        recent_rows = cursor.fetchall()
         
-        return {
-            "relationships": relationships,
-            "behaviors": behaviors,
-            "recent_events": recent_events
-        }
+        results = []
+        for i, cutoff in enumerate(cutoffs):
+            # 关系类型统计 / 行为模式统计
+            relationships: Dict[str, int] = {}
+            behavior_counts: Dict[str, int] = {}
+            for row in groups:
+                count = row[2 + i] or 0
+                if not count:
+                    continue
+                relationships[row[0]] = relationships.get(row[0], 0) + count
+                if row[1]:
+                    behavior_counts[row[1]] = behavior_counts.get(row[1], 0) + count
+            
+            behaviors = [
+                {"pattern": pattern, "count": count}
+                for pattern, count in sorted(behavior_counts.items(), key=lambda kv: (kv[1], kv[0]), reverse=True)
+            ]
+            recent_events = [
+                {
+                    "relationship": row[0],
+                    "behavior": row[1],
+                    "context": row[2],
+                    "date": row[3][:10]
+                }
+                for row in recent_rows if row[3] >= cutoff
+            ]
+            
+            results.append({
+                "relationships": dict(sorted(relationships.items())),
+                "behaviors": behaviors,
+                "recent_events": recent_events
+            })
+        return results
     
     def _get_emotion_memory(
         self, 
         cursor: sqlite3.Cursor, 
         child_id: int, 
-        time_filter: str
-    ) -> Dict[str, Any]:
-        """获取情绪维度记忆"""
-        # 情绪类型统计
-        cursor.execute(f"""
-            SELECT 
-                emotion_type,
-                COUNT(*) as count,
-                AVG(intensity) as avg_intensity
-            FROM emotions
-            WHERE child_id = ? {time_filter}
-            GROUP BY emotion_type
-        """, (child_id,))
-        emotion_stats = [
-            {
-                "type": row[0],
-                "count": row[1],
-                "avg_intensity": round(row[2], 1) if row[2] else 0
-            }
-            for row in cursor.fetchall()
-        ]
+        cutoffs: List[str]
+    ) -> List[Dict[str, Any]]:
+        """获取情绪维度记忆(每个窗口一份)"""
+        n = len(cutoffs)
+        # 情绪类型统计(条数、强度之和、强度非空条数)
+        groups = _window_rollups(cursor, child_id, "emotion", cutoffs)
         
         # 最近情绪记录
-        cursor.execute(f"""
+        cursor.execute("""
             SELECT 
                 emotion_type,
                 intensity,
                 substr(trigger_event, 1, 50) as trigger,
                 created_at
             FROM emotions
-            WHERE child_id = ? {time_filter}
+            WHERE child_id = ? AND created_at >= ?
             ORDER BY created_at DESC
             LIMIT 5
-        """, (child_id,))
-        recent_emotions = [
-            {
-                "type": row[0],
-                "intensity": row[1],
-                "trigger": row[2],
-                "date": row[3][:10]
-            }
-            for row in cursor.fetchall()
-        ]
+        """, (child_id, min(cutoffs)))
+        recent_rows = cursor.fetchall()
         
-        return {
-            "emotion_stats": emotion_stats,
-            "recent_emotions": recent_emotions
-        }
+        results = []
+        for i, cutoff in enumerate(cutoffs):
+            emotion_stats = []
+            for row in groups:
+                count = row[2 + i] or 0
+                if not count:
+                    continue
+                intensity_sum = row[2 + n + i]
+                intensity_count = row[2 + 2 * n + i]
+                emotion_stats.append({
+                    "type": row[0],
+                    "count": count,
+                    "avg_intensity": (
+                        round(intensity_sum / intensity_count, 1)
+                        if intensity_count and intensity_sum else 0
+                    )
+                })
+            
+            recent_emotions = [
+                {
+                    "type": row[0],
+                    "intensity": row[1],
+                    "trigger": row[2],
+                    "date": row[3][:10]
+                }
+                for row in recent_rows if row[3] >= cutoff
+            ]
+            
+            results.append({
+                "emotion_stats": emotion_stats,
+                "recent_emotions": recent_emotions
+            })
+        return results
     
-   
     def _get_personality_traits(
     self, 
     cursor: sqlite3.Cursor, 
@@ -320,7 +522,7 @@ class MemoryService:
                 for row in cursor.fetchall()
             ]
         except Exception as e:
-            logger.error(f"获取性格特质失败: {e}")
+            logger.error("获取性格特质失败: %s", e)
             return []
 
     def _get_user_profile(
@@ -362,7 +564,7 @@ class MemoryService:
             
             return profile
         except Exception as e:
-            logger.error(f"获取用户画像失败: {e}")
+            logger.error("获取用户画像失败: %s", e)
             return {}
 
     def _get_deep_interests(
@@ -394,7 +596,7 @@ class MemoryService:
                 for row in cursor.fetchall()
             ]
         except Exception as e:
-            logger.error(f"获取深度兴趣失败: {e}")
+            logger.error("获取深度兴趣失败: %s", e)
             return []
 
     
@@ -409,8 +611,41 @@ class MemoryService:
         Returns:
             格式化的记忆摘要文本
         """
-        memory = self.get_child_memory(child_id, days)
-        
+        return self.get_memory_with_summary(child_id, days)[1]
+    
+    def _get_long_term_memory(
+        self,
+        cursor: sqlite3.Cursor,
+        child_id: int
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """获取分层长期记忆(每层最近的固定条数,新的在前)"""
+        slices = (
+            ("conversation", settings.DIGEST_RECENT_CONVERSATIONS),
+            ("day", settings.DIGEST_RECENT_DAYS),
+            ("week", settings.DIGEST_RECENT_WEEKS),
+            ("month", settings.DIGEST_RECENT_MONTHS),
+        )
+        long_term = {}
+        for level, limit in slices:
+            cursor.execute("""
+                SELECT 
+                    period_key,
+                    period_end,
+                    summary
+                FROM memory_digests
+                WHERE child_id = ? AND level = ?
+                ORDER BY period_end DESC
+                LIMIT ?
+            """, (child_id, level, limit))
+            long_term[level] = [
+                {"period": row[0], "date": row[1][:10], "summary": row[2]}
+                for row in cursor.fetchall()
+            ]
+        return long_term
+    
+    @traced("memory.render_summary")
+    def _render_summary(self, memory: Dict[str, Any], days: Optional[int]) -> str:
+        """把记忆字典渲染为摘要文本"""
         summary_parts = []
         
         # 1. 用户基础信息
@@ -463,8 +698,28 @@ class MemoryService:
             interests = ", ".join([i["topic"] for i in memory["deep_interests"][:3]])
             summary_parts.append(interests)
         
+        # 7. 长期记忆(由远及近: 月 → 周 → 天 → 最近的会话)
+        long_term = memory["long_term"]
+        if any(long_term.values()):
+            summary_parts.append(f"\n【长期记忆】")
+            for level, label in (("month", "月"), ("week", "周"), ("day", "天"), ("conversation", "最近对话")):
+                for item in reversed(long_term[level]):
+                    period = item["period"] if level != "conversation" else item["date"]
+                    summary_parts.append(f"- [{label} {period}] {item['summary']}")
+        
         return "\n".join(summary_parts)
 
 
 # 单例模式
 memory_service = MemoryService()
+
+
+def _collect_cache_metrics():
+    cache = memory_service.cache
+    yield counter("learnsmart_cache_requests", "缓存查询次数(命中率 = hit / (hit + miss))", [
+        ({"cache": "memory", "result": "hit"}, cache.hits),
+        ({"cache": "memory", "result": "miss"}, cache.misses),
+    ])
+
+
+registry.register_collector(_collect_cache_metrics)
@@ -0,0 +1,215 @@
+"""
+全文检索服务 - 按孩子检索对话消息、知识点和写作素材
+
+索引见 database/migrations/010_search_fts.sql(FTS5 + trigram分词,触发器同步):
+
+- 查询按空白切成若干词,每个词作为短语,全部命中才算匹配;按 BM25 排序(越小越相关)
+- child_key 把孩子ID编码成一个trigram,MATCH 里先限定孩子,只在该孩子的行里求交集
+- 分页用游标(上一页最后一条的 (score, id)),翻到第N页也不需要 OFFSET
+- trigram 至少3个字才能建索引,有词不足3个字(如“篮球”)时改为沿索引从该孩子最新的行往前逐行匹配,
+  按时间倒序返回(对话消息按会话倒序、会话内按消息倒序);每页最多扫描 SEARCH_SCAN_ROWS 行,
+  游标为扫到的最后一行的排序键(没凑满一页也可能还有下一页,以 next_cursor 是否为空为准)
+"""
+
+import base64
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.database import get_pool
+from app.utils.metrics import traced
+
+# 检索范围: FTS表、原表、正文列、随结果返回的列(结果字段名, 原表列),
+# 以及逐行匹配时只按孩子过滤的 FROM/WHERE 和倒序扫描的排序键(与索引顺序一致,不需要排序)
+_SOURCES: Dict[str, Dict[str, Any]] = {
+    "messages": {
+        "fts": "messages_fts",
+        "table": "messages",
+        "body": "content",
+        "columns": (("conversation_id", "conversation_id"), ("role", "role"), ("created_at", "timestamp")),
+        "scope": "conversations c JOIN messages t ON t.conversation_id = c.id WHERE c.child_id = ?",
+        "order": ("c.id", "t.id"),
+    },
+    "knowledge": {
+        "fts": "knowledge_fts",
+        "table": "knowledge_points",
+        "body": "content",
+        "columns": (("conversation_id", "conversation_id"), ("subject", "subject"), ("created_at", "created_at")),
+        "scope": "knowledge_points t WHERE t.child_id = ?",
+        "order": ("t.created_at", "t.id"),
+    },
+    "writing": {
+        "fts": "writing_fts",
+        "table": "writing_materials",
+        "body": "event_description",
+        "columns": (("conversation_id", "conversation_id"), ("created_at", "created_at")),
+        "scope": "writing_materials t WHERE t.child_id = ?",
+        "order": ("t.created_at", "t.id"),
+    },
+}
+
+SEARCH_TYPES: Tuple[str, ...] = tuple(_SOURCES)
+
+# trigram分词能建索引的最短词长
+_MIN_TERM_CHARS = 3
+
+
+class SearchError(ValueError):
+    """查询参数有误(空查询、未知类型、游标无效)"""
+
+
+def child_key(child_id: int) -> str:
+    """孩子ID编码成3个私用区字符(与 010_search_fts.sql 视图里的 char(...) 表达式一致)"""
+    return "".join(
+        chr(0xE000 + digit)
+        for digit in (child_id // 40960000 % 6400, child_id // 6400 % 6400, child_id % 6400)
+    )
+
+
+def _phrase(text: str) -> str:
+    """FTS5 短语(双引号包裹,内部引号转义),用户输入里的运算符都按普通文字处理"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def encode_cursor(position: Sequence[Any]) -> str:
+    raw = json.dumps(list(position), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise SearchError("游标无效")
+    if (
+        not isinstance(position, list)
+        or len(position) != size
+        or not all(isinstance(v, (int, float, str)) and not isinstance(v, bool) for v in position)
+    ):
+        raise SearchError("游标无效")
+    return position
+
+
+def _snippet(text: str, terms: Sequence[str], width: int) -> str:
+    """逐行匹配时在Python里截取片段(与FTS5的 snippet() 格式一致): 第一个命中词前后约 width 个字,命中词用 [] 标出"""
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - width // 2) if first else 0
+    end = min(len(text), start + width + (first.end() - first.start() if first else 0))
+    window = pattern.sub(lambda m: f"[{m.group(0)}]", text[start:end])
+    return ("…" if start > 0 else "") + window + ("…" if end < len(text) else "")
+
+
+class SearchService:
+    """全文检索(读连接池,同步执行;接口层放在线程池里调用)"""
+
+    @traced("search")
+    def search(
+        self,
+        child_id: int,
+        query: str,
+        type: str = "messages",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        检索一个孩子的记录
+
+        Returns:
+            {"items": [{id, type, snippet, score, conversation_id, created_at, ...}],
+             "next_cursor": 下一页游标(没有更多结果时为None)}
+        """
+        source = _SOURCES.get(type)
+        if source is None:
+            raise SearchError(f"未知的检索类型: {type}")
+        terms = query.split()
+        if not terms:
+            raise SearchError("查询不能为空")
+        limit = max(1, min(limit or settings.SEARCH_PAGE_SIZE, settings.SEARCH_MAX_PAGE_SIZE))
+
+        with get_pool().reader() as conn:
+            if all(len(t) >= _MIN_TERM_CHARS for t in terms):
+                rows, position = self._match(conn, source, child_id, terms, limit, cursor)
+            else:
+                rows, position = self._scan(conn, source, child_id, terms, limit, cursor)
+
+        return {
+            "items": [dict(row, type=type) for row in rows],
+            "next_cursor": encode_cursor(position) if position is not None else None,
+        }
+
+    def _match(self, conn, source, child_id, terms, limit, cursor):
+        """FTS5检索: 先取一页 (id, score),再只为这一页的行生成片段、读原表的列"""
+        fts = source["fts"]
+        expression = f"child_key:{_phrase(child_key(child_id))} AND " + " AND ".join(
+            f"body:{_phrase(t)}" for t in terms
+        )
+        ranked = f"SELECT rowid AS id, bm25({fts}, 0, 1) AS score FROM {fts} WHERE {fts} MATCH ?"
+        if cursor is None:
+            page = conn.execute(f"{ranked} ORDER BY score, id LIMIT ?", (expression, limit)).fetchall()
+        else:
+            score, last_id = decode_cursor(cursor, 2)
+            page = conn.execute(
+                f"SELECT id, score FROM ({ranked}) WHERE (score, id) > (?, ?) ORDER BY score, id LIMIT ?",
+                (expression, score, last_id, limit)
+            ).fetchall()
+        if not page:
+            return [], None
+
+        ids = [row[0] for row in page]
+        names = [name for name, _ in source["columns"]]
+        details = conn.execute(
+            f"""
+            SELECT {fts}.rowid, snippet({fts}, 1, '[', ']', '…', ?),
+                   {', '.join(f't.{column}' for _, column in source['columns'])}
+            FROM {fts}
+            JOIN {source['table']} t ON t.id = {fts}.rowid
+            WHERE {fts} MATCH ? AND {fts}.rowid IN ({','.join('?' * len(ids))})
+            """,
+            (settings.SEARCH_SNIPPET_TOKENS, expression, *ids)
+        ).fetchall()
+        by_id = {row[0]: {"id": row[0], "snippet": row[1], **dict(zip(names, row[2:]))} for row in details}
+        rows = [dict(by_id[i], score=score) for i, score in page if i in by_id]
+        last_id, last_score = page[-1]
+        return rows, [last_score, last_id] if len(page) == limit else None
+
+    def _scan(self, conn, source, child_id, terms, limit, cursor):
+        """逐行匹配: 沿索引倒序读该孩子最多 SEARCH_SCAN_ROWS 行,在Python里比较,凑满一页即停"""
+        first, second = source["order"]
+        scope = source["scope"]
+        params: List[Any] = [child_id]
+        if cursor is not None:
+            scope += f" AND ({first}, {second}) < (?, ?)"
+            params += decode_cursor(cursor, 2)
+        names = [name for name, _ in source["columns"]]
+        found = conn.execute(
+            f"""
+            SELECT {first}, {second}, t.{source['body']},
+                   {', '.join(f't.{column}' for _, column in source['columns'])}
+            FROM {scope}
+            ORDER BY {first} DESC, {second} DESC
+            LIMIT ?
+            """,
+            (*params, settings.SEARCH_SCAN_ROWS)
+        )
+        needles = [t.casefold() for t in terms]
+        rows: List[Dict[str, Any]] = []
+        scanned, last = 0, None
+        try:
+            for row in found:
+                scanned += 1
+                last = [row[0], row[1]]
+                if all(n in row[2].casefold() for n in needles):
+                    rows.append({"id": row[1], "snippet": _snippet(row[2], terms, settings.SEARCH_SNIPPET_TOKENS),
+                                 **dict(zip(names, row[3:])), "score": None})
+                    if len(rows) == limit:
+                        break
+        finally:
+            found.close()  # 提前结束时释放读事务
+        more = len(rows) == limit or scanned == settings.SEARCH_SCAN_ROWS
+        return rows, last if more else None
+
+
+# 全局实例
+search_service = SearchService()
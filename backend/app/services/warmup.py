@@ -0,0 +1,121 @@
+"""
+启动预热
+
+部署后的第一批请求不必再为这些付出延迟:
+- 到豆包的TCP/TLS握手: 预先建立连接池里的连接
+- SQLite: 预先打开只读连接(执行连接级PRAGMA),读一遍热点索引的最新一端
+- 空的进程内缓存: 为最近活跃的孩子(按 conversations.start_time)预计算记忆摘要、加载最新会话的历史
+
+在lifespan里作为后台任务执行,不阻塞启动;任何一步失败只记日志
+"""
+import asyncio
+import threading
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import get_pool
+from app.services.history_service import conversation_history
+from app.services.memory_service import memory_service
+from app.utils.api_client import DouBaoClient
+from app.utils.logger import logger
+from app.utils.metrics import span
+
+# 热点索引的最新一端(按时间/自增ID增长的索引,新数据都在右侧)
+_TOUCH_QUERIES = (
+    "SELECT MAX(id) FROM messages",
+    "SELECT conversation_id, id FROM messages ORDER BY conversation_id DESC, id DESC LIMIT 1",
+    "SELECT MAX(start_time) FROM conversations",
+    "SELECT MAX(child_id) FROM memory_versions",
+)
+
+
+def warm_database(readers: int) -> int:
+    """打开最多 readers 个只读连接并读一遍热点索引,返回打开的连接数"""
+    pool = get_pool()
+    with ExitStack() as stack:
+        conns = [stack.enter_context(pool.reader()) for _ in range(max(1, min(readers, pool.max_readers)))]
+        for sql in _TOUCH_QUERIES:
+            conns[0].execute(sql).fetchall()
+    return len(conns)
+
+
+def recent_children(limit: int) -> List[Tuple[int, int]]:
+    """
+    最近活跃的孩子及各自最新的会话ID: [(child_id, conversation_id)],最近的在前
+
+    倒序遍历 idx_conversations_start_time,凑够 limit 个孩子即停;
+    最多看 limit * 100 个会话,少数孩子特别活跃时返回的可能不足 limit 个
+    """
+    found: Dict[int, int] = {}
+    with get_pool().reader() as conn:
+        cursor = conn.execute(
+            "SELECT child_id, id FROM conversations ORDER BY start_time DESC LIMIT ?", (limit * 100,)
+        )
+        try:
+            for child_id, conversation_id in cursor:
+                found.setdefault(child_id, conversation_id)
+                if len(found) >= limit:
+                    break
+        finally:
+            cursor.close()  # 提前结束时释放读事务
+    return list(found.items())
+
+
+def warm_memory(limit: int, stop: Optional[threading.Event] = None) -> int:
+    """为最近活跃的孩子预计算记忆摘要并加载最新会话的历史,返回预热的孩子数"""
+    warmed = 0
+    for child_id, conversation_id in recent_children(limit):
+        if stop is not None and stop.is_set():
+            break
+        if memory_service.prefetch(child_id):
+            conversation_history.load(conversation_id)
+            warmed += 1
+    return warmed
+
+
+class Warmup:
+    """一次启动预热(lifespan里 start,退出时 stop)"""
+
+    def __init__(self, client: DouBaoClient):
+        self.client = client
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """退出时取消预热;线程里正在执行的一步做完后停止"""
+        self._stop.set()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self) -> Dict[str, int]:
+        started = time.perf_counter()
+        connections, readers = await asyncio.gather(
+            self._step("http", self.client.warm_up(settings.WARMUP_HTTP_CONNECTIONS)),
+            self._step("db", asyncio.to_thread(warm_database, settings.WARMUP_DB_READERS)),
+        )
+        children = await self._step(
+            "memory", asyncio.to_thread(warm_memory, settings.WARMUP_CHILDREN, self._stop)
+        )
+        result = {"connections": connections, "readers": readers, "children": children}
+        logger.info(
+            "🔥 预热完成 - 豆包连接:%s, 只读连接:%s, 孩子:%s, 耗时:%.0fms",
+            connections, readers, children, (time.perf_counter() - started) * 1000
+        )
+        return result
+
+    async def _step(self, name: str, awaitable) -> int:
+        with span(f"warmup.{name}"):
+            try:
+                return await awaitable
+            except Exception as e:
+                logger.warning("⚠️ 预热失败(%s): %s", name, e)
+                return 0
@@ -1,11 +1,341 @@
 """豆包API客户端"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
 import httpx
+
 from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import HTTP_REQUEST_SECONDS, LLM_TOKENS, gauge, registry
+from app.utils.prompt_manager import prompt_manager
+from app.utils.resilience import CircuitBreaker, LatencyTracker, TokenBucket, backoff_delay, is_retryable
+from app.utils.tokenizer import estimate_message_tokens, estimate_tokens
+
+
+def _http2_available() -> bool:
+    """HTTP/2 需要 h2 包(httpx[http2]),缺失时退回 HTTP/1.1"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
 
 class DouBaoClient:
-    """豆包API客户端（待实现）"""
-    def __init__(self):
-        self.api_key = settings.DOUBAO_API_KEY
-    
-    async def chat(self, message: str):
-        return "AI回复"
+    """
+    豆包API异步客户端
+
+    进程内共享一个长连接的 httpx.AsyncClient(keep-alive + HTTP/2 + 连接池),
+    请求不会阻塞事件循环,吞吐量随并发请求数增长。
+    每次调用经过限速、重试、对冲和熔断(见 app.utils.resilience)。
+    """
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_url = api_url or settings.DOUBAO_API_URL
+        self.api_key = api_key if api_key is not None else settings.DOUBAO_API_KEY
+        self.model = model if model is not None else settings.DOUBAO_MODEL
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.latency = LatencyTracker(settings.DOUBAO_LATENCY_WINDOW)
+        self.breaker = CircuitBreaker(
+            settings.DOUBAO_BREAKER_FAILURES, settings.DOUBAO_BREAKER_RESET_TIMEOUT
+        )
+        # 出站限速(含重试和对冲请求),避免突发流量触发上游429
+        self.rate_limiter = TokenBucket(settings.DOUBAO_RATE_LIMIT, settings.DOUBAO_RATE_BURST)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """按配置创建连接池"""
+        http2 = settings.DOUBAO_HTTP2 and _http2_available()
+        if settings.DOUBAO_HTTP2 and not http2:
+            logger.warning("⚠️ 未安装h2,豆包客户端使用HTTP/1.1")
+
+        return httpx.AsyncClient(
+            http2=http2,
+            transport=self._transport,
+            limits=httpx.Limits(
+                max_connections=settings.DOUBAO_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DOUBAO_MAX_KEEPALIVE,
+                keepalive_expiry=settings.DOUBAO_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.DOUBAO_TIMEOUT,
+                connect=settings.DOUBAO_CONNECT_TIMEOUT,
+            ),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        获取共享的 AsyncClient(延迟创建)
+
+        连接池绑定在创建它的事件循环上,换了事件循环(如测试中多次 asyncio.run)时重建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._build_client()
+            self._loop = loop
+        return self._client
+
+    def build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        """构建chat/completions请求体(发送时由 prompt_manager.encode_request 序列化)"""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        payload.update(extra)
+        return payload
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        调用chat/completions并返回回复文本
+
+        429/5xx/网络错误按退避重试;开启 DOUBAO_HEDGE_ENABLED 时,慢请求会发出对冲请求;
+        熔断器打开时直接抛出 CircuitOpenError
+
+        Args:
+            messages: OpenAI格式的消息列表
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+            timeout: 本次调用的超时(秒),None使用全局配置
+        """
+        payload = self.build_payload(messages, temperature, max_tokens)
+        content = prompt_manager.encode_request(payload)
+        request_timeout = httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+        prompt_tokens = _prompt_tokens(messages)
+
+        probe = self.breaker.before_call()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = await self._hedged(lambda: self._post(content, request_timeout, prompt_tokens))
+                except Exception as e:
+                    await asyncio.sleep(self._on_error(e, attempt))
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                return result
+        finally:
+            self.breaker.release(probe)
+
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        以 stream=true 调用chat/completions,逐个产出增量文本
+
+        上游返回 Server-Sent Events: 每行 "data: {...}",以 "data: [DONE]" 结束。
+        收到第一段文本之前的失败按退避重试,之后的失败直接抛出(已推送的内容无法撤回)
+        """
+        payload = self.build_payload(messages, temperature, max_tokens, stream=True)
+        content = prompt_manager.encode_request(payload)
+        request_timeout = httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+        probe = self.breaker.before_call()
+        attempt = 0
+        try:
+            while True:
+                started = False
+                completion_tokens = 0
+                try:
+                    await self.rate_limiter.acquire()
+                    sent_at = time.monotonic()
+                    async with self.client.stream(
+                        "POST", self.api_url, content=content, timeout=request_timeout
+                    ) as response:
+                        HTTP_REQUEST_SECONDS.labels("doubao_stream", str(response.status_code)).observe(
+                            time.monotonic() - sent_at
+                        )
+                        if response.is_error:
+                            await response.aread()
+                            logger.error("流式API请求失败: %s", response.status_code)
+                            logger.error("响应内容: %s", response.text[:200])
+                            response.raise_for_status()
+
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            choices = chunk.get("choices") or []
+                            if not choices:
+                                continue
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                started = True
+                                completion_tokens += estimate_tokens(delta)
+                                yield delta
+                except Exception as e:
+                    if started:
+                        if is_retryable(e):
+                            self.breaker.record_failure()
+                        raise
+                    await asyncio.sleep(self._on_error(e, attempt))
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                # 流式响应不带usage,按推送的文本估算
+                LLM_TOKENS.labels("prompt").observe(_prompt_tokens(messages))
+                LLM_TOKENS.labels("completion").observe(completion_tokens)
+                return
+        finally:
+            self.breaker.release(probe)
+
+    async def _post(self, content: bytes, timeout: Any, prompt_tokens: int = 0) -> str:
+        """发送一次请求并返回回复文本(成功时记录耗时,不含限速等待)"""
+        await self.rate_limiter.acquire()
+        started = time.monotonic()
+        status = "error"
+        try:
+            response = await self.client.post(self.api_url, content=content, timeout=timeout)
+            status = str(response.status_code)
+        except asyncio.CancelledError:
+            status = "cancelled"  # 对冲请求中落后的一个
+            raise
+        finally:
+            HTTP_REQUEST_SECONDS.labels("doubao", status).observe(time.monotonic() - started)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.error("API请求失败: %s", e)
+            logger.error("响应状态码: %s", response.status_code)
+            logger.error("响应内容: %s", response.text[:200])
+            raise
+
+        data = response.json()
+        text = data["choices"][0]["message"]["content"]
+        self.latency.record(time.monotonic() - started)
+        usage = data.get("usage") or {}
+        LLM_TOKENS.labels("prompt").observe(usage.get("prompt_tokens") or prompt_tokens)
+        LLM_TOKENS.labels("completion").observe(usage.get("completion_tokens") or estimate_tokens(text))
+        return text
+
+    async def _hedged(self, send: Callable[[], Awaitable[str]]) -> str:
+        """
+        对冲请求: 超过对冲延迟仍未返回时再发一个相同请求,取先成功的结果,取消另一个
+
+        对冲延迟为最近成功调用耗时的 DOUBAO_HEDGE_PERCENTILE 分位(不低于 DOUBAO_HEDGE_MIN_DELAY),
+        样本不足 DOUBAO_HEDGE_MIN_SAMPLES 时不对冲
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return await send()
+
+        tasks = {asyncio.ensure_future(send())}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info("🔀 豆包API %.2f秒未返回,发送对冲请求", delay)
+                tasks.add(asyncio.ensure_future(send()))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not settings.DOUBAO_HEDGE_ENABLED or len(self.latency) < settings.DOUBAO_HEDGE_MIN_SAMPLES:
+            return None
+        p = self.latency.percentile(settings.DOUBAO_HEDGE_PERCENTILE) or 0.0
+        return max(settings.DOUBAO_HEDGE_MIN_DELAY, p)
+
+    def _on_error(self, error: Exception, attempt: int) -> float:
+        """
+        一次调用失败后: 可重试时返回重试前的等待秒数;
+        不可重试或重试次数用完时抛出原异常(后者计入熔断器)
+        """
+        if not is_retryable(error):
+            raise error
+        if attempt >= settings.DOUBAO_RETRY_ATTEMPTS:
+            self.breaker.record_failure()
+            raise error
+        retry_after = None
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = error.response.headers.get("Retry-After")
+        delay = backoff_delay(
+            attempt, settings.DOUBAO_RETRY_BASE_DELAY, settings.DOUBAO_RETRY_MAX_DELAY, retry_after
+        )
+        logger.warning("⚠️ 豆包API调用失败(%r),%.2f秒后第%s次重试", error, delay, attempt + 1)
+        return delay
+
+    async def warm_up(self, connections: int = 1) -> int:
+        """
+        预先建立到豆包的连接(DNS、TCP、TLS握手),返回成功建立的数量
+
+        发送并发的HEAD请求,任何HTTP响应都说明连接已建立并留在连接池里;
+        不经过限速和熔断,也不计入调用耗时
+        """
+        async def open_connection() -> None:
+            await self.client.request("HEAD", self.api_url, timeout=settings.DOUBAO_CONNECT_TIMEOUT)
+
+        results = await asyncio.gather(
+            *(open_connection() for _ in range(connections)), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            logger.warning("⚠️ 豆包连接预热失败%s个: %r", len(failures), failures[0])
+        return len(results) - len(failures)
+
+    async def aclose(self):
+        """关闭连接池(应用退出时调用)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """请求的prompt token数(本地估算,上游返回usage时以上游为准)"""
+    return sum(estimate_message_tokens(message.get("content") or "") for message in messages)
+
+
+# 全局实例
+doubao_client = DouBaoClient()
+
+
+def _collect_client_metrics():
+    yield gauge("learnsmart_doubao_breaker_open", "豆包API熔断器是否打开(half_open计为打开)",
+                0 if doubao_client.breaker.state == "closed" else 1)
+
+
+registry.register_collector(_collect_client_metrics)
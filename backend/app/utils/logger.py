@@ -1,22 +1,182 @@
-"""日志工具"""
+"""
+日志工具
+
+调用方线程只把日志记录放进内存队列(QueueHandler),由后台线程(QueueListener)
+格式化并写到stdout和轮转文件,请求路径上的日志调用不做任何I/O:
+
+- 每行一个JSON对象(LOG_FORMAT=text 时为可读文本),带上当前请求的 request_id
+- 消息用 %s 占位符惰性格式化,级别被过滤掉的日志不会拼接字符串
+- DEBUG日志按调用位置采样,每 LOG_DEBUG_SAMPLE_EVERY 条保留1条
+- 设置 LOG_FILE 时同时写入按大小轮转的文件
+- 队列满(LOG_QUEUE_SIZE)时丢弃新日志并计数,不阻塞调用方
+"""
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+from typing import Dict, Optional, TextIO, Tuple
+
 from app.config import settings
 
-# 配置日志格式
-log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# 当前请求的ID(由 app.main 的中间件设置;线程池任务会复制上下文)
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+text_format = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
 date_format = "%Y-%m-%d %H:%M:%S"
 
+
+class JsonFormatter(logging.Formatter):
+    """一条日志一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": f"{self.formatTime(record, date_format)}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """在调用方线程里记下 request_id(后台线程看不到调用方的上下文)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class _DebugSampler(logging.Filter):
+    """DEBUG日志按调用位置每N条保留1条(第1条总是保留);计数不加锁,并发时略有偏差无妨"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃而不是报错(handleError会同步写stderr)"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        在调用方线程只把消息转成字符串(参数对象之后可能被修改);
+        异常堆栈原样带给后台线程,由格式化器在那里展开(队列在进程内,不需要序列化)
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT.lower() == "text":
+        return logging.Formatter(text_format, date_format)
+    return JsonFormatter()
+
+
+def _build_sinks(stream: TextIO) -> list:
+    formatter = _build_formatter()
+    console_handler = logging.StreamHandler(stream)
+    console_handler.setFormatter(formatter)
+    sinks = [console_handler]
+    if settings.LOG_FILE:
+        log_file = settings.LOG_FILE
+        if not os.path.isabs(log_file):
+            log_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", log_file))
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=settings.LOG_FILE_MAX_BYTES,
+            backupCount=settings.LOG_FILE_BACKUPS,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        sinks.append(file_handler)
+    return sinks
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(stream: TextIO = sys.stdout):
+    """
+    (重新)启动后台写日志线程
+
+    模块导入时以stdout调用一次;基准脚本等需要把日志改到stderr时再次调用
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()  # 先把队列里剩下的日志写完
+            for sink in _listener.handlers:
+                sink.close()
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *_build_sinks(stream), respect_handler_level=True
+        )
+        _listener.start()
+
+
+def dropped_logs() -> int:
+    """队列满被丢弃的日志条数"""
+    return _queue_handler.dropped
+
+
+def flush_logs():
+    """等后台线程写完已入队的日志(进程退出时调用)"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for sink in _listener.handlers:
+                sink.close()
+            _listener = None
+
+
 # 创建logger
 logger = logging.getLogger("LearnSmart")
-logger.setLevel(getattr(logging, settings.LOG_LEVEL, logging.INFO))
+logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+
+_queue_handler = _QueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+_queue_handler.addFilter(_DebugSampler(settings.LOG_DEBUG_SAMPLE_EVERY))
+_queue_handler.addFilter(_ContextFilter())
 
 # 如果还没有handler，添加一个
 if not logger.handlers:
-    # 控制台输出
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    formatter = logging.Formatter(log_format, date_format)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
+    logger.addHandler(_queue_handler)
+    configure_logging()
+    atexit.register(flush_logs)
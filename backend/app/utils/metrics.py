@@ -0,0 +1,258 @@
+"""
+进程内指标和耗时追踪,按Prometheus文本格式导出(GET /metrics),不依赖 prometheus_client
+
+- Histogram: 代码里直接记录;一次记录是二分查找桶 + 一次加锁累加,约1微秒
+- span / traced: 计时块和装饰器,耗时记入 learnsmart_span_seconds{span=...}
+- 采集回调(register_collector): 抓取 /metrics 时才读取各模块已有的统计
+  (缓存命中、准入排队、熔断状态等),平时零开销
+
+每个进程一份(提取worker等独立进程的指标不在API进程的 /metrics 里)
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.utils.logger import dropped_logs, logger
+
+# 延迟桶(秒): 覆盖单条SQL(亚毫秒)到一次大模型调用(数十秒)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+class Family(NamedTuple):
+    """采集回调返回的一组指标"""
+    name: str
+    kind: str  # counter / gauge
+    help: str
+    samples: List[Sample]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """取一组标签值对应的子指标(热路径上可以缓存返回值)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_dict(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, *values: str):
+        self.labels(*values).observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            labels = self._label_dict(values)
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """指标注册表: 直接记录的指标 + 抓取时执行的采集回调"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus文本格式(version 0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        # 不同模块可以上报同名指标(标签不同),同名的合并成一组输出
+        merged: Dict[str, Family] = {}
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:  # 一个采集回调出错不影响其他指标
+                logger.warning("⚠️ 指标采集失败(%s): %s", getattr(collector, '__name__', collector), e)
+                continue
+            for family in families:
+                if family.name in merged:
+                    merged[family.name].samples.extend(family.samples)
+                else:
+                    merged[family.name] = family._replace(samples=list(family.samples))
+        for family in merged.values():
+            name = f"{family.name}_total" if family.kind == "counter" else family.name
+            lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}"
+                         for labels, value in family.samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram(
+    "learnsmart_span_seconds", "代码块耗时(秒)", ("span",))
+TURN_STAGE_SECONDS = registry.histogram(
+    "learnsmart_turn_stage_seconds", "一轮对话各阶段耗时(秒)", ("stage",))
+TURN_SECONDS = registry.histogram(
+    "learnsmart_turn_seconds", "一轮对话总耗时(秒)", ("mode", "outcome"))
+DB_QUERY_SECONDS = registry.histogram(
+    "learnsmart_db_query_seconds", "单条SQL的execute耗时(秒)", ("op",))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "learnsmart_http_request_seconds", "出站HTTP请求耗时(秒,流式为收到响应头的时间)", ("target", "status"))
+LLM_TOKENS = registry.histogram(
+    "learnsmart_llm_tokens", "每次大模型调用的token数(上游未返回usage时为本地估算)", ("kind",), TOKEN_BUCKETS)
+QUEUE_DEPTH = registry.histogram(
+    "learnsmart_queue_depth", "入队时队列中已有的任务数", ("queue",), DEPTH_BUCKETS)
+
+
+class span:
+    """
+    计时块,耗时记入 learnsmart_span_seconds{span=name}
+
+        with span("memory.windows"):
+            ...
+    """
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, name: str):
+        self._child = SPAN_SECONDS.labels(name)
+
+    def __enter__(self) -> "span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+def traced(name: str):
+    """装饰器版的 span,支持同步和异步函数"""
+    def decorator(fn):
+        child = SPAN_SECONDS.labels(name)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=1024)
+def sql_operation(sql: str) -> str:
+    """SQL语句的操作类型(SELECT/INSERT/...),作为低基数标签;SQL文本基本是常量,结果缓存"""
+    head = sql.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else "EMPTY"
+
+
+def observe_query(sql: str, seconds: float):
+    DB_QUERY_SECONDS.labels(sql_operation(sql)).observe(seconds)
+
+
+def gauge(name: str, help: str, value: float, labels: Optional[Dict[str, str]] = None) -> Family:
+    return Family(name, "gauge", help, [(labels or {}, value)])
+
+
+def counter(name: str, help: str, samples: List[Sample]) -> Family:
+    return Family(name, "counter", help, samples)
+
+
+def _collect_log_metrics():
+    yield counter("learnsmart_log_dropped", "日志队列满被丢弃的条数", [({}, dropped_logs())])
+
+
+registry.register_collector(_collect_log_metrics)
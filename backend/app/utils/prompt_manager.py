@@ -1,5 +1,178 @@
-"""Prompt管理器"""
+"""
+Prompt管理器
+
+System Prompt = 按模式预编译的静态前缀 + 末尾的孩子专属动态块。
+静态前缀对所有孩子、所有轮次逐字节相同,豆包的上下文(前缀)缓存才能命中;
+前缀和请求体里不变部分的JSON序列化结果也只计算一次。
+"""
+import json
+import threading
+from typing import Any, Dict, Tuple
+
+from app.core.mode_manager import ConversationMode
+
+# 对所有模式通用的静态说明和示例(不含孩子名字、记忆等动态内容,上文统一称"孩子")
+_COMPANION_PROMPT = """你是豆豆,一个温暖、智慧的AI学习伙伴,专门陪伴孩子成长。孩子的名字和成长记忆附在本说明末尾。
+
+=== 你的核心使命 ===
+1. **识别学习方式**: 判断孩子是"主动学习"(自己研究/发现)还是"被动学习"(老师/家长教)
+2. **给予差异化鼓励**:
+- 主动学习 → 热情赞美探索精神,引导深入思考
+- 被动学习 → 温和询问理解程度,鼓励主动应用
+3. **培养内驱力**: 用好奇心和成就感激发学习热情,而非成绩压力
+4. **建立情感连接**: 温暖、真诚、有同理心,像朋友一样平等对话
+
+=== 对话风格指南 ===
+✅ **必须做到**:
+1. 每条回复包含1-2个emoji(😊/🌟/💡/🎯等),但不过度使用
+2. 识别"我自己研究/发现/探索"等主动学习信号
+3. 识别"老师教/妈妈说/课堂学"等被动学习信号
+4. 提出1-2个开放性问题,引导深入思考
+5. 关联孩子的已知兴趣(如编程/数学/篮球),让对话更个性化
+6. 使用"你/咱们"等亲近称呼,避免"小朋友"等说教语气
+
+❌ **避免做到**:
+1. 不要说教或评判
+2. 不要提供标准答案(除非孩子明确求助)
+3. 不要忽视情绪信号(开心/难过/紧张等)
+4. 不要打断孩子的思路
+
+=== 典型对话示例 ===
+
+【示例1: 主动学习场景】
+孩子: "我今天自己研究了勾股定理,发现a²+b²=c²!"
+豆豆回应: "哇!你自己发现了勾股定理,太厉害了!🌟 这可是数学中超级重要的定理呢~ 你是怎么想到要研究这个的?在研究过程中有没有遇到什么有趣的问题?"
+
+【示例2: 被动学习场景】
+孩子: "今天数学课老师教了我们圆的面积公式πr²"
+豆豆回应: "圆的面积公式很有用呢!😊 老师讲的时候你听懂了吗?能不能给我举个例子,比如计算一个半径是5cm的圆的面积?"
+
+【示例3: 社交场景】
+孩子: "今天我和小明打篮球,他不小心撞倒我了"
+豆豆回应: "打篮球时被撞倒一定有点疼吧😅 你当时是什么感觉呀?后来你和小明怎么处理的?"
+
+【示例4: 情绪场景】
+孩子: "我今天考试考得很好,特别开心!"
+豆豆回应: "太棒啦!为你的好成绩感到开心!🎉 这次考试你觉得哪道题最有挑战性?你是怎么解决的?"
+
+=== 记住 ===
+- 你的目标不是"教知识",而是"点燃好奇心"
+- 每次对话都是了解孩子的机会,认真倾听比给建议更重要
+- **自信最重要** - 永远肯定孩子的努力和进步
+
+现在,让我们开始温暖、智慧的对话吧!✨
+"""
+
+# 各模式的静态前缀(目前两种模式共用同一套说明)
+_MODE_TEMPLATES: Dict[str, str] = {
+    ConversationMode.KNOWLEDGE.value: _COMPANION_PROMPT,
+    ConversationMode.FREE.value: _COMPANION_PROMPT,
+}
+
+# 末尾动态块: 孩子名字 + 记忆
+_CHILD_BLOCK = """
+=== 正在对话的孩子: {child_name} ===
+(上文中的"孩子"都指{child_name})
+
+=== {child_name}的成长记忆(最近{days}天) ===
+{memory_summary}
+{personality_text}
+{interests_text}"""
+
+
 class PromptManager:
-    """Prompt管理器（待实现）"""
-    def get_system_prompt(self, mode: str):
-        return "系统Prompt"
+    """
+    Prompt管理器
+
+    - 每种模式的静态前缀在初始化时编译一次
+    - build_system_prompt 只拼接末尾的动态块
+    - encode_request 把请求体序列化为JSON,已注册前缀的JSON片段直接复用
+    """
+
+    def __init__(self, default_mode: str = ConversationMode.KNOWLEDGE.value):
+        self.default_mode = default_mode
+        self._prefixes: Dict[str, str] = {}
+        # (静态文本, 去掉结尾引号的UTF-8 JSON字符串片段),登记时整体替换,读取无需加锁
+        self._fragments: Tuple[Tuple[str, bytes], ...] = ()
+        # 请求体中除messages外的字段 -> UTF-8 JSON片段
+        self._heads: Dict[Tuple, bytes] = {}
+        self._lock = threading.Lock()
+        for mode, template in _MODE_TEMPLATES.items():
+            self._prefixes[mode] = template
+            self.register_prefix(template)
+
+    def get_system_prompt(self, mode: str) -> str:
+        """模式的静态前缀(所有孩子共用)"""
+        return self._prefixes.get(mode) or self._prefixes[self.default_mode]
+
+    def build_system_prompt(
+        self,
+        mode: str,
+        child_name: str,
+        memory_summary: str,
+        personality_text: str = "",
+        interests_text: str = "",
+        days: int = 7
+    ) -> str:
+        """静态前缀 + 孩子专属动态块"""
+        return self.get_system_prompt(mode) + _CHILD_BLOCK.format(
+            child_name=child_name,
+            days=days,
+            memory_summary=memory_summary,
+            personality_text=personality_text,
+            interests_text=interests_text
+        )
+
+    def register_prefix(self, text: str) -> str:
+        """登记一段静态文本,以它开头的消息序列化时复用其JSON片段"""
+        with self._lock:
+            if all(prefix != text for prefix, _ in self._fragments):
+                # JSON字符串的转义是逐字符的,去掉结尾引号后可以直接接上后续内容的JSON
+                fragment = _encode(text)[:-1]
+                # 长前缀优先匹配
+                self._fragments = tuple(sorted(
+                    self._fragments + ((text, fragment),), key=lambda item: len(item[0]), reverse=True
+                ))
+        return text
+
+    def encode_content(self, content: str) -> bytes:
+        """把消息内容序列化为UTF-8 JSON字符串,已登记的前缀部分直接复用"""
+        for prefix, fragment in self._fragments:
+            if content.startswith(prefix):
+                return fragment + _encode(content[len(prefix):])[1:]
+        return _encode(content)
+
+    def encode_request(self, payload: Dict[str, Any]) -> bytes:
+        """
+        序列化chat/completions请求体(与json.dumps(payload)等价的JSON)
+
+        messages之外的字段(model/temperature/max_tokens/stream)组合很少,序列化结果按值缓存
+        """
+        head_items = tuple((k, v) for k, v in payload.items() if k != "messages")
+        head = self._heads.get(head_items)
+        if head is None:
+            head = _encode(dict(head_items))[1:-1]
+            with self._lock:
+                self._heads[head_items] = head
+
+        messages = b",".join(self._encode_message(message) for message in payload.get("messages", []))
+        return b"".join((b"{", head, b"," if head else b"", b'"messages":[', messages, b"]}"))
+
+    def _encode_message(self, message: Dict[str, str]) -> bytes:
+        if message.keys() != {"role", "content"}:
+            return _encode(message)
+        return b"".join((
+            b'{"role":', _encode(message["role"]), b',"content":', self.encode_content(message["content"]), b"}"
+        ))
+
+
+# 复用同一个编码器(json.dumps带参数时每次都会新建JSONEncoder)
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _encode(value: Any) -> bytes:
+    return _ENCODER.encode(value).encode("utf-8")
+
+
+# 全局实例
+prompt_manager = PromptManager()
@@ -0,0 +1,164 @@
+"""
+出站调用的容错组件: 重试退避、延迟统计(对冲请求)、熔断器、令牌桶限速
+
+DouBaoClient 用它们包住每次豆包调用
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+import httpx
+
+# 可重试的HTTP状态码: 限流和服务端错误
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开,上游不健康,直接失败不再请求"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"豆包API暂时不可用,{retry_after:.0f}秒后重试")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """网络错误、超时、429和5xx可重试;其他4xx是请求本身的问题,重试无用"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[str] = None) -> float:
+    """
+    第attempt次重试(从0开始)前的等待秒数: 指数退避 + 全抖动
+
+    429/503带Retry-After(秒)时至少等待这么久(不超过cap)
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(cap, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+class LatencyTracker:
+    """最近N次成功调用的耗时,用于计算对冲请求的延迟(如p95)"""
+
+    def __init__(self, window: int):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - closed: 正常请求,连续失败 failure_threshold 次后打开
+    - open: 直接抛出 CircuitOpenError,reset_timeout 秒后进入半开
+    - half_open: 只放行一个探测请求,成功则关闭,失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """上游是否被判定为不健康(打开且还没到探测时间)"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def before_call(self) -> bool:
+        """
+        请求前检查,不允许请求时抛出 CircuitOpenError
+
+        Returns:
+            本次调用是否占用了半开状态的探测名额(调用结束时原样传给 release)
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            raise CircuitOpenError(max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self, probe: bool):
+        """
+        调用结束时释放探测名额(被取消或请求本身有误时,下一个请求可以继续探测);
+        只有探测请求本身才释放,熔断前放行、晚结束的请求不影响正在进行的探测
+        """
+        if not probe:
+            return
+        with self._lock:
+            self._probing = False
+
+
+class TokenBucket:
+    """
+    令牌桶限速: 平均每秒 rate 个请求,允许 burst 个突发
+
+    令牌不足时预支并等待(按到达顺序排队),rate <= 0 表示不限速
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取一个令牌,返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
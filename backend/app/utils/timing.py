@@ -0,0 +1,45 @@
+"""一轮对话各阶段耗时记录"""
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Iterator, TypeVar
+
+from app.utils.metrics import TURN_STAGE_SECONDS
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    记录各阶段耗时(毫秒),同时记入 learnsmart_turn_stage_seconds{stage}
+
+    并发执行的阶段各自计时,所以各阶段之和可能大于总耗时
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = round(elapsed * 1000, 2)
+            TURN_STAGE_SECONDS.labels(name).observe(elapsed)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """等待一个阶段完成并计时(可与其他阶段一起 gather)"""
+        with self.stage(name):
+            return await awaitable
+
+    @property
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._started) * 1000, 2)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {**self.stages, "total": self.total_ms}
+
+    def __str__(self) -> str:
+        return " ".join(f"{name}={ms}ms" for name, ms in self.as_dict().items())
@@ -0,0 +1,27 @@
+"""本地token数估算(不调用模型分词器)"""
+import math
+import re
+
+# 中日韩文字、全角标点、emoji等非ASCII字符大致一个字符一个token;
+# ASCII按单词/数字/符号切分,每段约4个字符一个token
+_ASCII_RUN = re.compile(r"[\x00-\x7f]+")
+
+# 每条消息的角色标记等固定开销
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """估算一段文本的token数(偏保守,宁多勿少)"""
+    if not text:
+        return 0
+    ascii_chars = 0
+    ascii_tokens = 0
+    for run in _ASCII_RUN.findall(text):
+        ascii_chars += len(run)
+        ascii_tokens += sum(math.ceil(len(word) / 4) for word in run.split())
+    return (len(text) - ascii_chars) + ascii_tokens
+
+
+def estimate_message_tokens(content: str) -> int:
+    """一条对话消息的token数(含固定开销)"""
+    return estimate_tokens(content) + MESSAGE_OVERHEAD
@@ -0,0 +1,102 @@
+"""
+分层长期记忆worker
+
+独立进程定期执行:
+    python -m app.workers.digests [--once]
+
+1. 结束空闲会话
+2. 压缩已结束的会话(有界并发)
+3. 依次合并已结束的天 → 周 → 月
+"""
+
+import argparse
+import asyncio
+import signal
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from app.config import settings
+from app.services.digest_service import DigestService, digest_service
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class DigestWorker:
+    """分层摘要批处理"""
+
+    def __init__(self, service: DigestService = digest_service, concurrency: Optional[int] = None):
+        self.service = service
+        self.concurrency = concurrency or settings.DIGEST_CONCURRENCY
+        self._stopping = asyncio.Event()
+
+    async def run_once(self) -> int:
+        """执行一轮,返回写入的摘要数"""
+        # 同步的查库和写入放到线程池里,不阻塞正在并发生成的摘要
+        await asyncio.to_thread(self.service.close_idle_conversations)
+
+        written = 0
+        conversations = await asyncio.to_thread(self.service.pending_conversations, settings.DIGEST_BATCH_SIZE)
+        written += await self._gather(self.service.digest_conversation, conversations)
+
+        for level in ("day", "week", "month"):
+            periods = await asyncio.to_thread(self.service.pending_periods, level)
+            written += await self._gather(self.service.digest_period, periods)
+
+        if written:
+            logger.info("🗂️ 长期记忆更新: %s条摘要", written)
+        return written
+
+    async def _gather(self, fn: Callable[[T], Awaitable[str]], items: List[T]) -> int:
+        """有界并发执行,单条失败不影响其他条目(下一轮会重试)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(item: T) -> bool:
+            async with semaphore:
+                try:
+                    await fn(item)
+                    return True
+                except Exception as e:
+                    logger.error("❌ 生成摘要失败 %s: %s", item, e, exc_info=True)
+                    return False
+
+        results = await asyncio.gather(*[run(item) for item in items])
+        return sum(results)
+
+    async def run_forever(self):
+        logger.info("👷 长期记忆worker启动 - 间隔:%s秒", settings.DIGEST_POLL_INTERVAL)
+        while not self._stopping.is_set():
+            await self.run_once()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.DIGEST_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("👋 长期记忆worker已停止")
+
+    def stop(self):
+        self._stopping.set()
+
+
+async def _main(once: bool):
+    worker = DigestWorker()
+    try:
+        if once:
+            await worker.run_once()
+            return
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run_forever()
+    finally:
+        await worker.service.client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分层长期记忆worker")
+    parser.add_argument("--once", action="store_true", help="执行一轮后退出")
+    args = parser.parse_args()
+    asyncio.run(_main(args.once))
+
+
+if __name__ == "__main__":
+    main()
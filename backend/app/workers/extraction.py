@@ -0,0 +1,217 @@
+"""
+5维信息提取worker
+
+独立进程消费 extraction_jobs 队列:
+    python -m app.workers.extraction [--concurrency 4] [--once]
+
+- 有界并发: 每轮最多领取 concurrency 条任务并发提取
+- 至少一次: 提取结果写入后才标记完成,进程崩溃时租约过期的任务会被重新领取
+- 重试: 豆包API失败按指数退避重试,最后一次失败或熔断期间降级到简单规则
+- 批量: EXTRACTION_BATCH_SIZE > 1 时把多轮对话打包成一次请求,
+  解析失败的单条降级到简单规则
+- 本地规则: 闲聊或高置信度的任务直接用本地规则保存,不占用豆包请求
+- 清理: 每 EXTRACTION_PURGE_INTERVAL 秒删除超过保留时长的已完成/已放弃任务
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+from typing import List, Optional
+
+from app.config import settings
+from app.core.ai_engine import AIEngine, ai_engine
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_queue import ExtractionJob, ExtractionQueue, extraction_queue
+from app.utils.logger import logger
+
+
+class ExtractionWorker:
+    """提取队列消费者"""
+
+    def __init__(
+        self,
+        queue: ExtractionQueue = extraction_queue,
+        engine: AIEngine = ai_engine,
+        concurrency: Optional[int] = None,
+        worker_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        batch_max_wait: Optional[float] = None
+    ):
+        self.queue = queue
+        self.engine = engine
+        self.concurrency = concurrency or settings.EXTRACTION_WORKER_CONCURRENCY
+        self.batch_size = max(1, batch_size or settings.EXTRACTION_BATCH_SIZE)
+        self.batch_max_wait = (
+            settings.EXTRACTION_BATCH_MAX_WAIT if batch_max_wait is None else batch_max_wait
+        )
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+
+    async def run_once(self) -> int:
+        """领取一批任务并发处理,返回处理的任务数"""
+        if self.batch_size == 1:
+            jobs = await self.queue.aclaim(self.worker_id, self.concurrency)
+            if jobs:
+                await asyncio.gather(*[self._process(job) for job in jobs])
+            return len(jobs)
+
+        jobs = await self._claim_batches()
+        batches = [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+        if batches:
+            await asyncio.gather(*[self._process_batch(batch) for batch in batches])
+        return len(jobs)
+
+    async def _claim_batches(self) -> List[ExtractionJob]:
+        """领取最多 concurrency 个批次的任务,不满时最多等待 batch_max_wait 秒凑批"""
+        limit = self.concurrency * self.batch_size
+        jobs = await self.queue.aclaim(self.worker_id, limit)
+        if not jobs:
+            return jobs
+
+        deadline = time.monotonic() + self.batch_max_wait
+        while len(jobs) < limit and time.monotonic() < deadline:
+            await asyncio.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+            jobs.extend(await self.queue.aclaim(self.worker_id, limit - len(jobs)))
+        return jobs
+
+    async def run_forever(self):
+        """持续消费,直到收到停止信号(处理中的任务会先完成)"""
+        logger.info("👷 提取worker启动 - ID:%s, 并发:%s", self.worker_id, self.concurrency)
+        await asyncio.to_thread(extraction_cache.prune)
+        next_purge = 0.0
+        while not self._stopping.is_set():
+            if time.monotonic() >= next_purge:
+                await self._purge()
+                next_purge = time.monotonic() + settings.EXTRACTION_PURGE_INTERVAL
+            processed = await self.run_once()
+            if processed == 0:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.EXTRACTION_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("👋 提取worker已停止")
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _purge(self):
+        """删除过期的终态任务(在线程池里执行,不阻塞正在处理的任务)"""
+        try:
+            await asyncio.to_thread(self.queue.purge)
+        except Exception as e:
+            logger.error("❌ 清理提取任务失败: %s", e, exc_info=True)
+
+    async def _process(self, job: ExtractionJob):
+        """处理单条任务"""
+        last_attempt = job.attempts >= settings.EXTRACTION_MAX_ATTEMPTS
+        try:
+            result = await self.engine._extract_and_save_info(
+                conversation_id=job.conversation_id,
+                child_id=job.child_id,
+                user_message=job.user_message,
+                ai_response=job.ai_response,
+                fallback=last_attempt
+            )
+        except Exception as e:
+            logger.error("❌ 提取任务%s异常: %s", job.id, e, exc_info=True)
+            await self.queue.aretry(job, str(e))
+            return
+
+        if result is None:
+            await self.queue.aretry(job, "豆包API提取失败")
+            return
+
+        await self.queue.acomplete(job.id)
+        logger.info("✅ 提取任务%s完成 - Conv:%s", job.id, job.conversation_id)
+
+    async def _process_batch(self, jobs: List[ExtractionJob]):
+        """一次请求提取一批任务,再把结果分发回各自的孩子和会话"""
+        jobs = await self._process_local(jobs)
+        if not jobs:
+            return
+        if len(jobs) == 1:
+            await self._process(jobs[0])
+            return
+
+        results = await self.engine._call_doubao_for_extraction_batch(
+            [(job.user_message, job.ai_response) for job in jobs]
+        )
+
+        for index, job in enumerate(jobs):
+            try:
+                if results is None:
+                    # 整个请求失败: 按单条任务重试,最后一次(或熔断期间)降级到简单规则
+                    if job.attempts < settings.EXTRACTION_MAX_ATTEMPTS and not self.engine.client.breaker.is_open:
+                        await self.queue.aretry(job, "豆包API批量提取失败")
+                        continue
+                    await self.engine._extract_and_save_info_simple_async(
+                        job.conversation_id, job.child_id, job.user_message, job.ai_response
+                    )
+                elif results[index] is None:
+                    logger.warning("⚠️ 提取任务%s批量结果解析失败,使用简单规则", job.id)
+                    await self.engine._extract_and_save_info_simple_async(
+                        job.conversation_id, job.child_id, job.user_message, job.ai_response
+                    )
+                else:
+                    await self.engine._save_extracted_info_async(
+                        job.conversation_id, job.child_id, job.user_message, results[index]
+                    )
+            except Exception as e:
+                logger.error("❌ 提取任务%s异常: %s", job.id, e, exc_info=True)
+                await self.queue.aretry(job, str(e))
+                continue
+
+            await self.queue.acomplete(job.id)
+
+        logger.info("✅ 批量提取完成 - %s条", len(jobs))
+
+    async def _process_local(self, jobs: List[ExtractionJob]) -> List[ExtractionJob]:
+        """本地规则足以确定结果的任务直接保存并完成,返回仍需豆包提取的任务"""
+        remaining = []
+        for job in jobs:
+            local = self.engine._local_extraction(job.user_message, job.ai_response)
+            if local is None:
+                remaining.append(job)
+                continue
+            try:
+                await self.engine._extract_and_save_info_simple_async(
+                    job.conversation_id, job.child_id, job.user_message, job.ai_response, local=local
+                )
+            except Exception as e:
+                logger.error("❌ 提取任务%s异常: %s", job.id, e, exc_info=True)
+                await self.queue.aretry(job, str(e))
+                continue
+            await self.queue.acomplete(job.id)
+        return remaining
+
+
+async def _main(concurrency: Optional[int], batch_size: Optional[int], once: bool):
+    worker = ExtractionWorker(concurrency=concurrency, batch_size=batch_size)
+    if once:
+        while await worker.run_once():
+            pass
+        return
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.engine.client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="5维信息提取worker")
+    parser.add_argument("--concurrency", type=int, default=None, help="并发提取数")
+    parser.add_argument("--batch-size", type=int, default=None, help="每次请求打包的对话轮数")
+    parser.add_argument("--once", action="store_true", help="清空当前队列后退出")
+    args = parser.parse_args()
+    asyncio.run(_main(args.concurrency, args.batch_size, args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+端到端基准: 本地豆包桩服务 + 按迁移脚本建的临时数据库
+
+- chat_send: 在进程内(httpx ASGITransport)并发调用 POST /api/chat/send,
+  包含准入控制、记忆加载、豆包调用(桩服务)和落库
+- memory_7d / memory_all: 线程池并发调用 MemoryService.get_child_memory(不走缓存)
+
+每个场景在每个数据库规模(平均每个孩子的历史消息数,由 benchmarks.datagen 生成)和并发数下运行,输出可比较的JSON:
+p50/p95/p99 延迟、每秒请求数、每轮(每次调用)的数据库查询数。
+
+    cd backend && python -m benchmarks.bench_chat --output bench.json
+    python -m benchmarks.bench_chat --sizes 0,5000 --concurrency 1,16,64 --latency lognormal:0.3,0.5
+    python -m benchmarks.bench_chat --baseline bench.json   # 与之前提交的结果对比
+
+不访问真实豆包API,也不修改 data/ 下的数据库
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.datagen import generate
+from tests.doubao_stub import DoubaoStub, LatencyModel, bench_stub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_MESSAGES = [
+    "我今天学了勾股定理,老师说直角三角形两条直角边的平方和等于斜边的平方",
+    "为什么天空是蓝色的呀?",
+    "今天下午我和同学在公园放风筝,风筝飞得特别高",
+    "考试没考好有点难过",
+    "我自己研究了魔方,现在一分钟能拼好",
+    "妈妈说光合作用需要阳光",
+    "我和同桌吵架了,他抢我的橡皮",
+    "你好",
+]
+
+# 不计入查询数的语句: 连接设置和事务控制
+_NON_QUERY_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "--")
+
+
+class QueryCounter:
+    """通过 set_trace_callback 统计所有应用连接上执行的SQL语句数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_kind: Counter = Counter()
+
+    def trace(self, statement: str):
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if not kind or kind.startswith(_NON_QUERY_PREFIXES):
+            return
+        with self._lock:
+            self.by_kind[kind] += 1
+
+    def reset(self):
+        with self._lock:
+            self.by_kind.clear()
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.by_kind.values())
+
+
+def _percentile(samples: Sequence[float], p: float) -> Optional[float]:
+    """最近秩百分位(samples已排序)"""
+    if not samples:
+        return None
+    index = max(0, min(len(samples) - 1, math.ceil(p * len(samples)) - 1))
+    return samples[index]
+
+
+def _summary(latencies: List[float], wall: float, completed: int, queries: int) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": len(latencies),
+        "p50_ms": ms(_percentile(latencies, 0.50)),
+        "p95_ms": ms(_percentile(latencies, 0.95)),
+        "p99_ms": ms(_percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "rps": round(completed / wall, 2) if wall > 0 else None,
+        "db_queries_per_turn": round(queries / completed, 2) if completed else None,
+    }
+
+
+async def bench_chat_send(app, stub: DoubaoStub, counter: QueryCounter, child_ids: Sequence[int],
+                          concurrency: int, requests: int, warmup: int) -> Dict[str, Any]:
+    """并发调用 /api/chat/send;每个孩子沿用自己的会话,同一时刻每个孩子最多一个请求"""
+    import httpx
+
+    conversations: Dict[int, Optional[int]] = {}
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+
+    async def worker(http: "httpx.AsyncClient", slot: int, record: bool, count: int):
+        for i in range(count):
+            child_id = child_ids[(slot + i * concurrency) % len(child_ids)]
+            payload = {
+                "child_id": child_id,
+                "message": _MESSAGES[(slot + i) % len(_MESSAGES)],
+                "conversation_id": conversations.get(child_id),
+            }
+            started = time.perf_counter()
+            response = await http.post("/api/chat/send", json=payload)
+            elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                conversations[child_id] = response.json()["conversation_id"]
+            if record:
+                statuses[response.status_code] += 1
+                latencies.append(elapsed)
+
+    def split(total: int) -> List[int]:
+        return [total // concurrency + (1 if slot < total % concurrency else 0) for slot in range(concurrency)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        await asyncio.gather(*(worker(http, slot, False, n) for slot, n in enumerate(split(warmup))))
+        counter.reset()
+        stub.reset()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(http, slot, True, n) for slot, n in enumerate(split(requests))))
+        wall = time.perf_counter() - started
+
+    completed = statuses.get(200, 0)
+    result = _summary(latencies, wall, completed, counter.total)
+    result.update({
+        "errors": sum(n for status, n in statuses.items() if status != 200),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "upstream_requests": stub.requests,
+        "upstream_statuses": {str(status): n for status, n in sorted(stub.statuses.items())},
+        "db_queries_by_kind": dict(counter.by_kind),
+    })
+    return result
+
+
+def bench_memory(memory_service, counter: QueryCounter, child_ids: Sequence[int], days: Optional[int],
+                 concurrency: int, requests: int) -> Dict[str, Any]:
+    """并发调用 get_child_memory(不经过记忆缓存)"""
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def call(i: int):
+        started = time.perf_counter()
+        memory_service.get_child_memory(child_ids[i % len(child_ids)], days=days)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(min(requests, 10))))  # 预热连接池
+        counter.reset()
+        latencies.clear()
+        started = time.perf_counter()
+        list(pool.map(call, range(requests)))
+        wall = time.perf_counter() - started
+
+    result = _summary(latencies, wall, len(latencies), counter.total)
+    result["db_queries_by_kind"] = dict(counter.by_kind)
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_app(stub_url: str, counter: QueryCounter):
+    """
+    配置环境变量后再导入应用(settings和豆包客户端在导入时读取配置),
+    并让每个新建的SQLite连接都上报执行的语句
+    """
+    os.environ.update({
+        "DOUBAO_API_URL": stub_url,
+        "DOUBAO_API_KEY": "bench",
+        "DOUBAO_MODEL": "bench",
+        "DOUBAO_RATE_LIMIT": "0",  # 测的是本服务的开销,不让出站限速成为瓶颈
+        "LOG_LEVEL": "WARNING",
+    })
+    from app import database
+    from app.main import app
+    from app.utils.logger import configure_logging
+
+    # 结果JSON可能输出到stdout,日志改到stderr
+    configure_logging(sys.stderr)
+
+    configure = database._configure_connection
+
+    def configure_and_trace(conn: sqlite3.Connection):
+        configure(conn)
+        conn.set_trace_callback(counter.trace)
+
+    database._configure_connection = configure_and_trace
+    return app
+
+
+def _compare(baseline: Dict[str, Any], report: Dict[str, Any]):
+    """打印与基线结果的对比(p95延迟和吞吐的变化)到stderr"""
+    def key(row: Dict[str, Any]):
+        return row["scenario"], row["db_messages_per_child"], row["concurrency"]
+
+    old = {key(row): row for row in baseline.get("results", [])}
+    print(f"\n对比基线 {baseline.get('commit')} -> {report.get('commit')}", file=sys.stderr)
+    print(f"{'场景':<12}{'规模':>8}{'并发':>6}{'p95(ms)':>22}{'rps':>22}", file=sys.stderr)
+    for row in report["results"]:
+        before = old.get(key(row))
+        if not before:
+            continue
+
+        def delta(field: str) -> str:
+            a, b = before.get(field), row.get(field)
+            if not a or b is None:
+                return f"{b}"
+            return f"{a:g}->{b:g} ({(b - a) / a:+.0%})"
+
+        print(f"{row['scenario']:<12}{row['db_messages_per_child']:>8}{row['concurrency']:>6}"
+              f"{delta('p95_ms'):>22}{delta('rps'):>22}", file=sys.stderr)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准(本地豆包桩服务)")
+    parser.add_argument("--sizes", type=_int_list, default=[0, 1000], help="平均每个孩子的历史消息数,逗号分隔")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="并发数,逗号分隔")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="每个场景开始前的预热请求数(不计入结果)")
+    parser.add_argument("--children", type=int, default=64, help="孩子数(对话请求轮流分配给各个孩子)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="生成数据时孩子活跃度的Zipf指数(0=均匀)")
+    parser.add_argument("--latency", type=LatencyModel.parse, default=LatencyModel.parse("lognormal:0.05,0.3"),
+                        help="豆包延迟分布,如 fixed:0.2 / uniform:0.1,0.4 / lognormal:0.3,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入429/5xx错误的比例(0~1)")
+    parser.add_argument("--scenarios", default="chat_send,memory_7d,memory_all", help="要运行的场景,逗号分隔")
+    parser.add_argument("--output", help="结果JSON写入的文件(默认输出到stdout)")
+    parser.add_argument("--baseline", help="之前的结果JSON,打印对比")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    counter = QueryCounter()
+    stub = bench_stub(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    with stub, tempfile.TemporaryDirectory(prefix="learnsmart-bench-") as workdir:
+        app = _load_app(stub.url, counter)
+        from app.config import settings
+        from app.database import close_pools
+        from app.services.extraction_cache import extraction_cache
+        from app.services.history_service import conversation_history
+        from app.services.memory_service import memory_service
+
+        async def run() -> List[Dict[str, Any]]:
+            results = []
+            for size in args.sizes:
+                db_path = Path(workdir) / f"bench_{size}.db"
+                seeded = generate(str(db_path), args.children, size * args.children, seed=args.seed,
+                                  workers=1, zipf=args.zipf)
+                first = seeded["first_child_id"]
+                child_ids = list(range(first, first + args.children))
+                settings.DATABASE_URL = str(db_path)
+                memory_service.cache.clear()
+                conversation_history.clear()
+                extraction_cache.clear()
+
+                for concurrency in args.concurrency:
+                    for scenario in scenarios:
+                        if scenario == "chat_send":
+                            result = await bench_chat_send(app, stub, counter, child_ids,
+                                                           concurrency, args.requests, args.warmup)
+                        elif scenario in ("memory_7d", "memory_all"):
+                            days = 7 if scenario == "memory_7d" else None
+                            result = await asyncio.to_thread(bench_memory, memory_service, counter,
+                                                             child_ids, days, concurrency, args.requests)
+                        else:
+                            raise SystemExit(f"未知场景: {scenario}")
+                        row = {"scenario": scenario, "db_messages_per_child": size, "concurrency": concurrency}
+                        row.update(result)
+                        results.append(row)
+                        print(f"{scenario:<12} 规模{size:>6} 并发{concurrency:>4}  "
+                              f"p50 {row['p50_ms']}ms  p95 {row['p95_ms']}ms  p99 {row['p99_ms']}ms  "
+                              f"{row['rps']} req/s  {row['db_queries_per_turn']} 查询/次",
+                              file=sys.stderr)
+                close_pools()
+            return results
+
+        results = asyncio.run(run())
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "config": {
+            "children": args.children,
+            "zipf": args.zipf,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "latency": str(args.latency),
+            "error_rate": args.error_rate,
+            "extraction_async": settings.EXTRACTION_ASYNC,
+            "extraction_local_gate": settings.EXTRACTION_LOCAL_GATE,
+            "admission_max_in_flight": settings.ADMISSION_MAX_IN_FLIGHT,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        _compare(json.loads(Path(args.baseline).read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""
+合成成长数据生成器(规模测试用)
+
+按迁移脚本建库,生成任意规模的孩子、对话、消息和5维记录:
+
+- 每个孩子的活跃度服从Zipf分布(少数孩子聊得很多,大多数孩子聊得少)
+- 时间偏向近期,一天之内集中在早上、午休和放学后
+- 中文内容由模板和词表组合,对话主题和提取出的维度记录一致
+- 种子和截止时刻(--now)相同时生成的数据完全相同(与分片数、进程数无关)
+
+写入方式: 按孩子分片,每个分片在独立进程里写自己的临时库(关闭日志、去掉索引和触发器,
+大批量 executemany + 大事务),主进程按顺序 ATTACH 合并(id 加偏移)。合并期间暂时去掉触发器
+和索引,合并后重建按天汇总表、记忆版本号和全文检索索引,再按去掉前记下的定义恢复索引和触发器。
+
+    cd backend && python -m benchmarks.datagen --db data/learning_ai_scale.db --children 100000 --messages 100000000
+    ./database/db_manager.sh generate --children 1000 --messages 200000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MIGRATIONS_DIR = BACKEND_DIR / "database" / "migrations"
+ROLLUP_SCRIPT = BACKEND_DIR / "database" / "maintenance" / "rebuild_rollups.sql"
+SEARCH_SCRIPT = BACKEND_DIR / "database" / "maintenance" / "rebuild_search.sql"
+
+# ===========================================
+# 表结构: 生成和合并时的列顺序;ref 为需要加会话id偏移的列
+# ===========================================
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "children": ("id", "name", "birth_date", "gender", "grade_level", "parent_relation",
+                 "health_notes", "created_at", "updated_at"),
+    "conversations": ("id", "child_id", "conversation_mode", "start_time", "end_time", "topic",
+                      "is_active", "created_at"),
+    "messages": ("id", "conversation_id", "role", "content", "timestamp"),
+    "knowledge_points": ("id", "child_id", "conversation_id", "source", "subject", "content",
+                         "confidence_score", "keywords", "created_at"),
+    "writing_materials": ("id", "child_id", "conversation_id", "event_description", "event_time",
+                          "location", "people", "sensory_details", "suitable_genres", "created_at"),
+    "social_events": ("id", "child_id", "conversation_id", "relationship_type", "event_context",
+                      "behavior_pattern", "conflict_resolution", "created_at"),
+    "emotions": ("id", "child_id", "conversation_id", "emotion_type", "intensity", "trigger_event",
+                 "coping_strategy", "created_at"),
+    "user_memory": ("id", "child_id", "info_type", "content", "source_conversations",
+                    "created_at", "updated_at"),
+    "personality_traits": ("id", "child_id", "trait_category", "trait_description",
+                           "evidence_examples", "created_at", "updated_at"),
+    "value_insights": ("id", "child_id", "value_dimension", "decision_context", "choice_pattern",
+                       "priority_analysis", "created_at"),
+    "interest_intensity": ("id", "child_id", "topic", "inquiry_count", "last_mentioned_at",
+                           "is_deep_interest", "related_conversations"),
+}
+_CONVERSATION_REF = {"messages": "conversation_id", "knowledge_points": "conversation_id",
+                     "writing_materials": "conversation_id", "social_events": "conversation_id",
+                     "emotions": "conversation_id"}
+
+# ===========================================
+# 词表
+# ===========================================
+_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董潘袁蔡蒋余于杜叶程"
+_GIVEN = ["子涵", "欣怡", "梓萱", "一诺", "浩宇", "宇轩", "子墨", "若汐", "思远", "雨桐", "俊熙", "可馨",
+          "沐阳", "芊芊", "嘉懿", "奕辰", "语嫣", "天佑", "书瑶", "明哲", "乐乐", "果果", "朵朵", "豆豆"]
+_GRADES = ["一年级", "二年级", "三年级", "四年级", "五年级", "六年级"]
+_RELATIONS = ["母子关系", "母女关系", "父子关系", "父女关系", "祖孙关系"]
+_HEALTH = ["过敏性鼻炎", "轻度近视", "对花生过敏", "偶尔哮喘"]
+
+_TOPICS: Dict[str, List[str]] = {
+    "数学": ["勾股定理", "分数加减法", "鸡兔同笼", "圆的面积", "质数和合数", "小数乘法", "找规律", "时钟问题"],
+    "语文": ["古诗《静夜思》", "比喻句", "成语接龙", "作文开头", "《西游记》", "拼音声调", "修辞手法"],
+    "英语": ["自然拼读", "动物单词", "现在进行时", "英文儿歌", "情景对话"],
+    "科学": ["光合作用", "磁铁", "浮力", "月相变化", "简单电路", "水的三态", "彩虹的形成"],
+    "物理": ["惯性", "声音的传播", "杠杆原理", "摩擦力", "影子的形成"],
+    "化学": ["醋和小苏打", "铁生锈", "溶解"],
+    "生物": ["恐龙", "细胞", "蚂蚁的分工", "候鸟迁徙", "植物发芽"],
+    "历史": ["秦始皇", "丝绸之路", "四大发明", "三国故事", "长城"],
+    "地理": ["长江", "火山", "季风", "地球自转", "沙漠"],
+}
+_SUBJECTS = list(_TOPICS)
+_TEACHERS = ["数学老师", "语文老师", "英语老师", "科学老师", "班主任"]
+_PEERS = ["同桌", "好朋友", "班长", "小明", "乐乐", "表哥", "邻居家的妹妹", "新同学"]
+_FAMILY = ["妈妈", "爸爸", "奶奶", "爷爷", "姐姐", "外婆"]
+_PLACES = ["学校操场", "公园", "图书馆", "奶奶家", "科技馆", "小区楼下", "游泳馆", "动物园", "教室", "博物馆"]
+_ACTIVITIES = ["放风筝", "踢足球", "下围棋", "拼乐高", "跳绳比赛", "做手工", "骑自行车", "上编程课",
+               "画画", "弹钢琴", "做实验", "打羽毛球"]
+_TIMES = ["早上", "中午", "下午", "放学后", "晚上", "周末"]
+_POSITIVE = [("比赛得了第一名", "开心"), ("被老师表扬了", "自豪"), ("交到了新朋友", "高兴"),
+             ("终于学会了骑车", "兴奋"), ("考试考了满分", "特别开心")]
+_NEGATIVE = [("考试没考好", "难过"), ("和同学吵架了", "生气"), ("作业太多写不完", "烦躁"),
+             ("上台发言忘词了", "紧张"), ("心爱的玩具弄丢了", "伤心")]
+_COPING = ["深呼吸冷静下来", "和妈妈聊了聊", "画了一幅画", "去跑了几圈", "写进了日记", None]
+_BEHAVIORS = ["主动分享", "轮流合作", "互相帮助", "发生争执", "主动道歉", "一起讨论"]
+_RESOLUTIONS = ["互相道歉", "老师调解", "各退一步", "一起想办法", None]
+_SENSES = ["阳光暖暖的", "风吹在脸上凉凉的", "闻到了桂花香", "听到了鸟叫", "草地软软的"]
+_GENRES = ["记叙文", "日记", "看图写话", "观察日记", "童话"]
+_CHITCHAT = ["你好", "嗯嗯", "好的,知道了", "哈哈", "晚安", "我回来啦"]
+
+# 一天中各小时的活跃权重(早上、午休、放学后到睡前)
+_HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 1, 4, 3, 1, 1, 2, 4, 3, 1, 2, 5, 8, 9, 10, 9, 6, 2, 0]
+_HOURS = list(range(24))
+
+_TS = "%Y-%m-%d %H:%M:%S"
+
+
+def _child_rng(seed: int, child_id: int) -> random.Random:
+    """每个孩子独立的随机数序列: 结果与分片方式无关"""
+    return random.Random(seed * 1_000_003 + child_id)
+
+
+def zipf_message_counts(children: int, messages: int, exponent: float, seed: int) -> List[int]:
+    """按Zipf分布把总消息数分给各个孩子(活跃度排名随机打乱,exponent=0 为均分)"""
+    if children <= 0:
+        return []
+    ranks = list(range(1, children + 1))
+    random.Random(seed).shuffle(ranks)
+    weights = [rank ** -exponent for rank in ranks]
+    total = sum(weights)
+    return [int(messages * w / total + 0.5) for w in weights]
+
+
+class _ChildGenerator:
+    """生成一个孩子的全部数据(会话、消息、5维记录),写入按表分组的行缓冲"""
+
+    def __init__(self, rng: random.Random, now: datetime, days: int):
+        self.rng = rng
+        self.now = now
+        self.days = days
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _date(ordinal: int) -> str:
+        return date.fromordinal(ordinal).isoformat()
+
+    def _moment(self, joined: datetime) -> datetime:
+        """加入以来的某个时刻: 越近越密集,按小时权重落在一天中的活跃时段"""
+        rng = self.rng
+        span = (self.now - joined).total_seconds()
+        day = joined + timedelta(seconds=span * rng.betavariate(2.0, 1.0))
+        hour = rng.choices(_HOURS, _HOUR_WEIGHTS)[0]
+        moment = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        return moment if moment <= self.now else moment - timedelta(days=1)
+
+    def child(self, child_id: int, message_budget: int, ids: Dict[str, int], out: Dict[str, List[tuple]]):
+        rng = self.rng
+        joined = self.now - timedelta(days=self.days * rng.random())
+        joined_at = joined.strftime(_TS)
+        birth = datetime(rng.randint(2012, 2019), rng.randint(1, 12), rng.randint(1, 28))
+        grade = _GRADES[min(5, max(0, self.now.year - birth.year - 7))]
+        out["children"].append((
+            child_id, rng.choice(_SURNAMES) + rng.choice(_GIVEN), birth.strftime("%Y-%m-%d"),
+            rng.choice(["男", "女"]), grade, rng.choice(_RELATIONS),
+            rng.choice(_HEALTH) if rng.random() < 0.15 else None, joined_at, joined_at
+        ))
+
+        # 每个孩子有自己偏好的学科和话题
+        favorites = rng.sample(_SUBJECTS, k=len(_SUBJECTS))
+        subject_weights = [1.0 / (i + 1) for i in range(len(favorites))]
+        interests: Dict[str, List[Any]] = {}
+
+        moments = []
+        remaining = message_budget
+        while remaining > 0:
+            turns = min(rng.randint(1, 10), (remaining + 1) // 2)
+            moments.append((self._moment(joined), turns))
+            remaining -= turns * 2
+        moments.sort()
+
+        for index, (started, turns) in enumerate(moments):
+            ids["conversations"] += 1
+            conversation_id = ids["conversations"]
+            kind = rng.choices(("knowledge", "life", "chitchat"), (0.55, 0.35, 0.10))[0]
+            subject = rng.choices(favorites, subject_weights)[0]
+            topic = rng.choice(_TOPICS[subject])
+            pairs = self._dialogue(kind, subject, topic, turns)
+            # 消息时间逐条递增8~90秒;按"天序号+当天秒数"拼字符串,比逐条strftime快很多
+            ordinal = started.toordinal()
+            seconds = started.hour * 3600 + started.minute * 60 + started.second
+            start_at = end_at = started.strftime(_TS)
+            for user_message, ai_message in pairs:
+                for role, content in (("user", user_message), ("assistant", ai_message)):
+                    days, of_day = divmod(seconds, 86400)
+                    end_at = f"{self._date(ordinal + days)} {of_day // 3600:02d}:{of_day // 60 % 60:02d}:{of_day % 60:02d}"
+                    ids["messages"] += 1
+                    out["messages"].append((ids["messages"], conversation_id, role, content, end_at))
+                    seconds += 8 + int(rng.random() * 83)
+            last = index == len(moments) - 1
+            out["conversations"].append((
+                conversation_id, child_id, "life" if kind == "life" else "knowledge", start_at,
+                None if last else end_at, topic if kind == "knowledge" else None,
+                1 if last else 0, start_at
+            ))
+            self._dimensions(kind, child_id, conversation_id, subject, topic, end_at, ids, out)
+            if kind == "knowledge":
+                entry = interests.setdefault(topic, [0, end_at])
+                entry[0] += 1
+                entry[1] = end_at
+
+        self._profile(child_id, favorites, joined_at, interests, ids, out)
+
+    def _dialogue(self, kind: str, subject: str, topic: str, turns: int) -> List[Tuple[str, str]]:
+        rng = self.rng
+        pairs = []
+        for turn in range(turns):
+            if kind == "chitchat":
+                user = rng.choice(_CHITCHAT)
+                ai = rng.choice(["你好呀!今天过得怎么样?", "嗯,我在听呢~", "好的,有问题随时问我!"])
+            elif kind == "knowledge":
+                user = rng.choice([
+                    f"今天{rng.choice(_TEACHERS)}讲了{topic},我觉得特别有意思",
+                    f"我自己查了{topic}的资料,原来是这样的",
+                    f"为什么{topic}会这样呀?",
+                    f"{topic}我还是有点不明白",
+                    f"我给{rng.choice(_FAMILY)}讲了{topic},她都听懂了",
+                ]) if turn == 0 else rng.choice([
+                    "那为什么会这样呢?", "我明白了!", "还有别的例子吗?", f"{topic}和生活有什么关系?",
+                    "我想再试一道题", "原来如此",
+                ])
+                ai = rng.choice([
+                    f"你观察得真仔细!{topic}是{subject}里很有意思的内容,你觉得关键在哪里?",
+                    f"说得对!我们换个例子想一想{topic}。",
+                    "这个问题问得好,你先猜一猜答案?",
+                    "没关系,我们一步一步来,先看第一步。",
+                ])
+            else:
+                peer, place, activity = rng.choice(_PEERS), rng.choice(_PLACES), rng.choice(_ACTIVITIES)
+                trigger, feeling = rng.choice(_POSITIVE if rng.random() < 0.7 else _NEGATIVE)
+                user = rng.choice([
+                    f"今天{rng.choice(_TIMES)}我和{peer}在{place}{activity},{rng.choice(_SENSES)}",
+                    f"我{trigger},{feeling}",
+                    f"{rng.choice(_FAMILY)}带我去{place}了",
+                    f"我和{peer}{rng.choice(_BEHAVIORS)},后来{rng.choice(['和好了', '一起玩', '还有点不开心'])}",
+                ])
+                ai = rng.choice([
+                    "听起来真不错!当时你是什么感受?",
+                    "哇,能跟我多讲讲吗?",
+                    "嗯,我能理解你的心情。后来怎么样了?",
+                    "这个经历可以写成一篇日记哦!",
+                ])
+            pairs.append((user, ai))
+        return pairs
+
+    def _dimensions(self, kind: str, child_id: int, conversation_id: int, subject: str, topic: str,
+                    at: str, ids: Dict[str, int], out: Dict[str, List[tuple]]):
+        """从一次对话里"提取"出的维度记录"""
+        rng = self.rng
+        if kind == "knowledge":
+            if rng.random() < 0.7:
+                ids["knowledge_points"] += 1
+                out["knowledge_points"].append((
+                    ids["knowledge_points"], child_id, conversation_id,
+                    "active" if rng.random() < 0.45 else "passive", subject, f"学习了{topic}",
+                    round(rng.uniform(0.3, 1.0), 2), json.dumps([topic], ensure_ascii=False), at
+                ))
+            if rng.random() < 0.25:
+                self._emotion(child_id, conversation_id, at, ids, out)
+        elif kind == "life":
+            peer, place, activity = rng.choice(_PEERS), rng.choice(_PLACES), rng.choice(_ACTIVITIES)
+            if rng.random() < 0.5:
+                ids["writing_materials"] += 1
+                out["writing_materials"].append((
+                    ids["writing_materials"], child_id, conversation_id, f"和{peer}在{place}{activity}",
+                    rng.choice(_TIMES), place, json.dumps([peer], ensure_ascii=False),
+                    json.dumps({"感受": rng.choice(_SENSES)}, ensure_ascii=False),
+                    json.dumps(rng.sample(_GENRES, 2), ensure_ascii=False), at
+                ))
+            if rng.random() < 0.45:
+                relationship = rng.choices(("peer", "teacher", "family"), (0.7, 0.1, 0.2))[0]
+                ids["social_events"] += 1
+                out["social_events"].append((
+                    ids["social_events"], child_id, conversation_id, relationship, f"在{place}{activity}",
+                    rng.choice(_BEHAVIORS), rng.choice(_RESOLUTIONS), at
+                ))
+            if rng.random() < 0.6:
+                self._emotion(child_id, conversation_id, at, ids, out)
+
+    def _emotion(self, child_id: int, conversation_id: int, at: str, ids: Dict[str, int],
+                 out: Dict[str, List[tuple]]):
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.6:
+            emotion_type, (trigger, _) = "positive", rng.choice(_POSITIVE)
+        elif roll < 0.9:
+            emotion_type, (trigger, _) = "negative", rng.choice(_NEGATIVE)
+        else:
+            emotion_type, trigger = "neutral", "平常的一天"
+        ids["emotions"] += 1
+        out["emotions"].append((
+            ids["emotions"], child_id, conversation_id, emotion_type, rng.randint(3, 10), trigger,
+            rng.choice(_COPING) if emotion_type == "negative" else None, at
+        ))
+
+    def _profile(self, child_id: int, favorites: List[str], joined_at: str, interests: Dict[str, List[Any]],
+                 ids: Dict[str, int], out: Dict[str, List[tuple]]):
+        """画像类数据: 跨对话记忆、性格、价值观、兴趣"""
+        rng = self.rng
+        for info_type, content in rng.sample([
+            ("child_strengths", f"{favorites[0]}思维强,喜欢{rng.choice(_ACTIVITIES)}"),
+            ("preference", f"喜欢{rng.choice(_PLACES)},最近迷上了{rng.choice(_ACTIVITIES)}"),
+            ("parent_info", f"{rng.choice(_FAMILY)}负责日常陪伴,重视阅读习惯"),
+        ], k=rng.randint(1, 3)):
+            ids["user_memory"] += 1
+            out["user_memory"].append((ids["user_memory"], child_id, info_type, content, "[]", joined_at, joined_at))
+        for category, description in rng.sample([
+            ("核心特质", "好奇心强,喜欢追问为什么"),
+            ("学习风格", "动手实践型,喜欢做实验"),
+            ("社交风格", "乐于分享,愿意帮助同学"),
+            ("情绪特点", "遇到挫折会难过,但恢复得快"),
+        ], k=rng.randint(1, 3)):
+            ids["personality_traits"] += 1
+            out["personality_traits"].append((
+                ids["personality_traits"], child_id, category, description,
+                json.dumps([rng.choice(_ACTIVITIES)], ensure_ascii=False), joined_at, joined_at
+            ))
+        for _ in range(rng.randint(0, 2)):
+            ids["value_insights"] += 1
+            out["value_insights"].append((
+                ids["value_insights"], child_id, rng.choice(["公平", "诚实", "友谊", "责任", "分享"]),
+                f"{rng.choice(_ACTIVITIES)}时的选择", rng.choice(["优先照顾朋友", "坚持规则", "先完成任务"]),
+                None, joined_at
+            ))
+        for topic, (count, last_at) in sorted(interests.items(), key=lambda item: -item[1][0])[:8]:
+            ids["interest_intensity"] += 1
+            out["interest_intensity"].append((
+                ids["interest_intensity"], child_id, topic, count, last_at, 1 if count >= 5 else 0, "[]"
+            ))
+
+
+def _apply_migrations(conn: sqlite3.Connection):
+    """
+    执行迁移脚本(都可重复执行)
+
+    001 里的示例数据所在的表没有唯一键,重复执行会重复插入,库已经初始化过时跳过它
+    """
+    initialized = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'children'"
+    ).fetchone() is not None
+    for script in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if initialized and script.name.startswith("001_"):
+            continue
+        conn.executescript(script.read_text(encoding="utf-8"))
+
+
+def _drop_triggers(conn: sqlite3.Connection, indexes: bool = False) -> List[str]:
+    """去掉触发器(和索引),返回它们的定义,用于之后原样恢复"""
+    kinds = ("trigger", "index") if indexes else ("trigger",)
+    rows = conn.execute(
+        f"SELECT type, name, sql FROM sqlite_master WHERE type IN ({','.join('?' * len(kinds))}) AND sql IS NOT NULL",
+        kinds
+    ).fetchall()
+    for kind, name, _ in rows:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    return [sql for _, _, sql in rows]
+
+
+def _insert_sql(table: str) -> str:
+    columns = TABLES[table]
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def generate_shard(path: str, child_ids: Sequence[int], budgets: Sequence[int], seed: int,
+                   days: int, now: str, batch_rows: int) -> Dict[str, int]:
+    """
+    生成一个分片(一段连续的孩子)写入独立的临时库
+
+    分片内的id从1开始,合并时统一加偏移;返回各表行数
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    _apply_migrations(conn)
+    _drop_triggers(conn, indexes=True)
+    for table in TABLES:
+        conn.execute(f"DELETE FROM {table}")  # 迁移脚本里的示例数据
+
+    clock = datetime.strptime(now, _TS)
+    ids = {table: 0 for table in TABLES}
+    out: Dict[str, List[tuple]] = {table: [] for table in TABLES}
+    statements = {table: _insert_sql(table) for table in TABLES}
+
+    def flush():
+        conn.execute("BEGIN")
+        for table, rows in out.items():
+            if rows:
+                conn.executemany(statements[table], rows)
+                rows.clear()
+        conn.execute("COMMIT")
+
+    buffered = 0
+    for child_id, budget in zip(child_ids, budgets):
+        before = sum(ids.values())
+        _ChildGenerator(_child_rng(seed, child_id), clock, days).child(child_id, budget, ids, out)
+        buffered += sum(ids.values()) - before + 1
+        if buffered >= batch_rows:
+            flush()
+            buffered = 0
+    flush()
+    conn.close()
+    counts = dict(ids)
+    counts["children"] = len(child_ids)
+    return counts
+
+
+def _merge_shard(conn: sqlite3.Connection, shard_path: str):
+    """把分片并入主库: 各表id加上主库当前最大id,会话引用加会话id偏移"""
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        conn.execute("BEGIN")
+        offsets = {
+            table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM main.{table}").fetchone()[0]
+            for table in TABLES if table != "children"
+        }
+        for table, columns in TABLES.items():
+            select = []
+            for column in columns:
+                if column == "id" and table != "children":
+                    select.append(f"id + {offsets[table]}")
+                elif column == _CONVERSATION_REF.get(table):
+                    select.append(f"{column} + {offsets['conversations']}")
+                else:
+                    select.append(column)
+            conn.execute(
+                f"INSERT INTO main.{table} ({', '.join(columns)}) "
+                f"SELECT {', '.join(select)} FROM shard.{table} ORDER BY id"
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DETACH DATABASE shard")
+
+
+def generate(
+    db_path: str,
+    children: int,
+    messages: int,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    shards: Optional[int] = None,
+    days: int = 365,
+    zipf: float = 1.1,
+    batch_rows: int = 200_000,
+    now: Optional[datetime] = None,
+    progress: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    """
+    生成数据写入 db_path(文件不存在时按迁移脚本新建;已有孩子时新孩子的id接在后面)
+
+    Returns:
+        {"first_child_id", "children", "rows": {表: 行数}, "seconds"}
+    """
+    report = progress or (lambda message: None)
+    started = time.perf_counter()
+    workers = max(1, workers or min(os.cpu_count() or 1, 8))
+    shards = max(1, min(children, shards or workers)) if children else 0
+    clock = (now or datetime.now()).replace(microsecond=0).strftime(_TS)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    _apply_migrations(conn)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    first_child = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM children").fetchone()[0]
+    child_ids = list(range(first_child, first_child + children))
+    budgets = zipf_message_counts(children, messages, zipf, seed)
+
+    # 合并期间去掉触发器和索引(逐行维护太慢),最后重建派生数据,再执行迁移脚本恢复
+    schema = _drop_triggers(conn, indexes=True)
+    rows = {table: 0 for table in TABLES}
+    bounds = [children * i // shards for i in range(shards + 1)] if shards else [0]
+    with tempfile.TemporaryDirectory(prefix="learnsmart-datagen-", dir=os.path.dirname(os.path.abspath(db_path))) as workdir:
+        jobs = [
+            (os.path.join(workdir, f"shard_{i}.db"), child_ids[lo:hi], budgets[lo:hi], seed, days, clock, batch_rows)
+            for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]))
+        ]
+
+        def merge(index: int, shard_rows: Dict[str, int]):
+            _merge_shard(conn, jobs[index][0])
+            os.remove(jobs[index][0])
+            for table, count in shard_rows.items():
+                rows[table] += count
+            report(f"  分片 {index + 1}/{len(jobs)} 完成: 累计 {rows['messages']:,} 条消息")
+
+        if workers == 1 or len(jobs) <= 1:
+            for index, job in enumerate(jobs):
+                merge(index, generate_shard(*job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures: List[Future] = [pool.submit(generate_shard, *job) for job in jobs]
+                for index, future in enumerate(futures):  # 按分片顺序合并,保证id确定
+                    merge(index, future.result())
+
+    report("  重建汇总表和记忆版本号...")
+    conn.executescript(ROLLUP_SCRIPT.read_text(encoding="utf-8"))
+    conn.execute(
+        "INSERT INTO memory_versions (child_id, version) SELECT id, 1 FROM children WHERE id >= ? "
+        "ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime')",
+        (first_child,)
+    )
+    report("  重建全文检索索引...")
+    conn.executescript(SEARCH_SCRIPT.read_text(encoding="utf-8"))
+    report("  重建索引和触发器...")
+    for sql in schema:
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {
+        "first_child_id": first_child,
+        "children": children,
+        "rows": rows,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成成长数据生成器(规模测试)")
+    parser.add_argument("--db", default=str(BACKEND_DIR / "data" / "learning_ai_scale.db"), help="目标数据库文件")
+    parser.add_argument("--children", type=int, default=1000, help="孩子数")
+    parser.add_argument("--messages", type=int, default=200_000, help="消息总数(近似)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="孩子活跃度的Zipf指数(0=均匀)")
+    parser.add_argument("--days", type=int, default=365, help="数据覆盖的天数")
+    parser.add_argument("--workers", type=int, help="并行进程数(默认CPU核数,最多8)")
+    parser.add_argument("--shards", type=int, help="分片数(默认等于进程数)")
+    parser.add_argument("--batch-rows", type=int, default=200_000, help="每个事务写入的行数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--now", type=datetime.fromisoformat, help="数据的截止时刻(默认当前时间;固定它和种子即可复现同一份数据)")
+    parser.add_argument("--force", action="store_true", help="目标库已存在时先删除")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f"❌ {args.db} 已存在,使用 --force 覆盖")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    print(f"🏭 生成 {args.children:,} 个孩子 / 约 {args.messages:,} 条消息 -> {args.db}")
+    summary = generate(
+        args.db, args.children, args.messages, seed=args.seed, workers=args.workers, shards=args.shards,
+        days=args.days, zipf=args.zipf, batch_rows=args.batch_rows, now=args.now, progress=print
+    )
+    for table, count in summary["rows"].items():
+        print(f"  {table:<20}{count:>14,}")
+    print(f"✅ 完成,用时 {summary['seconds']}s ({summary['rows']['messages'] / max(summary['seconds'], 1e-9):,.0f} 条消息/秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ set -e
 DB_PATH="data/learning_ai.db"
 MIGRATIONS_DIR="database/migrations"
 SEEDS_DIR="database/seeds"
+MAINTENANCE_DIR="database/maintenance"
+SCALE_DB_PATH="data/learning_ai_scale.db"
 
 # 颜色定义
 GREEN='\033[0;32m'
@@ -28,8 +30,11 @@ init_database() {
         cp "$DB_PATH" "$backup_file"
     fi
     
-    # 执行初始化脚本
-    sqlite3 "$DB_PATH" < "$MIGRATIONS_DIR/001_init_database.sql"
+    # 按编号顺序执行迁移脚本
+    for migration in "$MIGRATIONS_DIR"/*.sql; do
+        echo "  执行: $(basename $migration)"
+        sqlite3 "$DB_PATH" < "$migration"
+    done
     
     echo -e "${GREEN}✅ 数据库结构创建完成${NC}"
 }
@@ -72,6 +77,32 @@ verify_database() {
     echo -e "${GREEN}✅ 数据库验证完成${NC}"
 }
 
+# 重建按天汇总表(已有数据的库升级到005迁移后执行一次)
+rebuild_rollups() {
+    echo -e "${YELLOW}重建记忆汇总表...${NC}"
+    sqlite3 "$DB_PATH" < "$MAINTENANCE_DIR/rebuild_rollups.sql"
+    rollup_count=$(sqlite3 "$DB_PATH" "SELECT COUNT(*) FROM memory_daily_rollups;")
+    echo "  汇总行数: $rollup_count"
+    echo -e "${GREEN}✅ 汇总表重建完成${NC}"
+}
+
+# 重建全文检索索引(FTS5,触发器维护;批量导入或怀疑索引不一致时执行)
+rebuild_search() {
+    echo -e "${YELLOW}重建全文检索索引...${NC}"
+    sqlite3 "$DB_PATH" < "$MAINTENANCE_DIR/rebuild_search.sql"
+    indexed=$(sqlite3 "$DB_PATH" "SELECT (SELECT COUNT(*) FROM messages_fts_docsize) + (SELECT COUNT(*) FROM knowledge_fts_docsize) + (SELECT COUNT(*) FROM writing_fts_docsize);")
+    echo "  索引行数: $indexed"
+    echo -e "${GREEN}✅ 全文检索索引重建完成${NC}"
+}
+
+# 生成规模测试数据(写入单独的库,不影响开发库;参数原样传给生成器)
+generate_data() {
+    echo -e "${YELLOW}生成规模测试数据...${NC}"
+    python -m benchmarks.datagen --db "$SCALE_DB_PATH" "$@"
+    echo "  使用: DATABASE_URL=$SCALE_DB_PATH uvicorn app.main:app"
+    echo -e "${GREEN}✅ 规模测试数据生成完成${NC}"
+}
+
 # 主菜单
 case "${1:-all}" in
     init)
@@ -83,16 +114,30 @@ case "${1:-all}" in
     verify)
         verify_database
         ;;
+    rollup)
+        rebuild_rollups
+        ;;
+    search)
+        rebuild_search
+        ;;
+    generate)
+        shift
+        generate_data "$@"
+        ;;
     all)
         init_database
         seed_database
         verify_database
         ;;
     *)
-        echo "用法: $0 {init|seed|verify|all}"
+        echo "用法: $0 {init|seed|verify|rollup|search|generate|all}"
         echo "  init   - 初始化数据库结构"
         echo "  seed   - 插入测试数据"
         echo "  verify - 验证数据库"
+        echo "  rollup - 重建记忆汇总表"
+        echo "  search - 重建全文检索索引"
+        echo "  generate [--children N --messages N --seed N --workers N --force]"
+        echo "           - 生成规模测试数据到 $SCALE_DB_PATH"
         echo "  all    - 执行全部(默认)"
         exit 1
         ;;
@@ -0,0 +1,34 @@
+-- ===========================================
+-- 🔁 从维度表全量重建 memory_daily_rollups
+-- 在005迁移之前已有数据的库上执行一次(./database/db_manager.sh rollup),
+-- 之后由触发器增量维护;可重复执行
+-- ===========================================
+
+BEGIN IMMEDIATE;
+
+DELETE FROM memory_daily_rollups;
+
+INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count, value_sum, value_count)
+SELECT child_id, 'knowledge', substr(created_at, 1, 10), source, subject,
+       COUNT(*), COALESCE(SUM(confidence_score), 0), COUNT(confidence_score)
+FROM knowledge_points
+GROUP BY child_id, substr(created_at, 1, 10), source, subject;
+
+INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count)
+SELECT child_id, 'writing', substr(created_at, 1, 10), location, COUNT(*)
+FROM writing_materials
+WHERE location IS NOT NULL
+GROUP BY child_id, substr(created_at, 1, 10), location;
+
+INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count)
+SELECT child_id, 'social', substr(created_at, 1, 10), relationship_type, COALESCE(behavior_pattern, ''), COUNT(*)
+FROM social_events
+GROUP BY child_id, substr(created_at, 1, 10), relationship_type, COALESCE(behavior_pattern, '');
+
+INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count, value_sum, value_count)
+SELECT child_id, 'emotion', substr(created_at, 1, 10), emotion_type,
+       COUNT(*), COALESCE(SUM(intensity), 0), COUNT(intensity)
+FROM emotions
+GROUP BY child_id, substr(created_at, 1, 10), emotion_type;
+
+COMMIT;
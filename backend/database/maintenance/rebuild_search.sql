@@ -0,0 +1,13 @@
+-- ===========================================
+-- 🔁 从内容表全量重建全文索引(010_search_fts.sql)
+-- 批量导入时去掉了触发器的库(如 benchmarks.datagen 生成的数据)导入后执行一次
+-- (./database/db_manager.sh search);可重复执行
+-- ===========================================
+
+BEGIN IMMEDIATE;
+
+INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');
+INSERT INTO knowledge_fts (knowledge_fts) VALUES ('rebuild');
+INSERT INTO writing_fts (writing_fts) VALUES ('rebuild');
+
+COMMIT;
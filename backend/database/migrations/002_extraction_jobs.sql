@@ -0,0 +1,24 @@
+-- ===========================================
+-- 📮 5维信息提取任务队列
+-- 对话只负责入队,提取由 python -m app.workers.extraction 异步消费
+-- ===========================================
+
+CREATE TABLE IF NOT EXISTS extraction_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL,
+    child_id INTEGER NOT NULL,
+    user_message TEXT NOT NULL,
+    ai_response TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending/running/done/failed
+    attempts INTEGER NOT NULL DEFAULT 0,     -- 已领取次数
+    available_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),  -- 重试退避后可再次领取的时间
+    locked_by TEXT,                          -- 领取任务的worker
+    locked_at TEXT,                          -- 领取时间(租约过期后可被其他worker回收)
+    last_error TEXT,
+    created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE,
+    FOREIGN KEY (child_id) REFERENCES children(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_extraction_jobs_pending ON extraction_jobs(status, available_at);
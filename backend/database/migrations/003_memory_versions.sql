@@ -0,0 +1,67 @@
+-- ===========================================
+-- 🔖 记忆版本号(记忆缓存失效)
+-- 任一维度表写入孩子的数据时版本号+1,API进程的记忆缓存据此判断是否过期
+-- (提取worker在独立进程中写入,无法直接通知API进程)
+-- ===========================================
+
+CREATE TABLE IF NOT EXISTS memory_versions (
+    child_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_knowledge
+AFTER INSERT ON knowledge_points
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_writing
+AFTER INSERT ON writing_materials
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_social
+AFTER INSERT ON social_events
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_emotions
+AFTER INSERT ON emotions
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_personality
+AFTER INSERT ON personality_traits
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_user_memory
+AFTER INSERT ON user_memory
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_interest
+AFTER INSERT ON interest_intensity
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_interest_update
+AFTER UPDATE ON interest_intensity
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
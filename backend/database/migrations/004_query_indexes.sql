@@ -0,0 +1,36 @@
+-- ===========================================
+-- 📇 记忆查询的复合索引
+-- MemoryService 的查询都是 child_id 等值 + created_at 范围,再按 created_at DESC 取最近N条:
+-- (child_id, created_at DESC) 让范围过滤和排序都走索引,后面的列让分组统计只读索引不回表
+-- ===========================================
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_child_time
+    ON knowledge_points(child_id, created_at DESC, source, subject, confidence_score);
+
+CREATE INDEX IF NOT EXISTS idx_writing_child_time
+    ON writing_materials(child_id, created_at DESC, location);
+
+CREATE INDEX IF NOT EXISTS idx_social_child_time
+    ON social_events(child_id, created_at DESC, relationship_type, behavior_pattern);
+
+CREATE INDEX IF NOT EXISTS idx_emotions_child_time
+    ON emotions(child_id, created_at DESC, emotion_type, intensity);
+
+CREATE INDEX IF NOT EXISTS idx_personality_child_time
+    ON personality_traits(child_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_interest_child_count
+    ON interest_intensity(child_id, inquiry_count DESC);
+
+-- 统计对话轮次(_get_turn_count)
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_role
+    ON messages(conversation_id, role);
+
+-- 被上面的复合索引覆盖的单列索引(前缀相同),删掉以减少写入开销
+DROP INDEX IF EXISTS idx_knowledge_child_id;
+DROP INDEX IF EXISTS idx_writing_child_id;
+DROP INDEX IF EXISTS idx_social_child_id;
+DROP INDEX IF EXISTS idx_emotions_child_id;
+DROP INDEX IF EXISTS idx_personality_child_id;
+DROP INDEX IF EXISTS idx_interest_child_id;
+DROP INDEX IF EXISTS idx_messages_conversation_id;
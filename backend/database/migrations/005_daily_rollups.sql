@@ -0,0 +1,103 @@
+-- ===========================================
+-- 📆 5维数据的按天汇总(记忆摘要的分组统计读这张表)
+-- 维度表每插入一行,触发器在同一事务里累加对应(孩子, 日期, 维度, 分组键)的计数,
+-- 时间窗口统计只需汇总窗口内的天数行,与历史数据量无关
+-- 已有数据用 database/maintenance/rebuild_rollups.sql 重建(./database/db_manager.sh rollup)
+-- ===========================================
+
+CREATE TABLE IF NOT EXISTS memory_daily_rollups (
+    child_id INTEGER NOT NULL,
+    dimension TEXT NOT NULL,                 -- knowledge/writing/social/emotion
+    day TEXT NOT NULL,                       -- YYYY-MM-DD (created_at的日期部分)
+    key1 TEXT NOT NULL,                      -- knowledge:来源 writing:地点 social:关系类型 emotion:情绪类型
+    key2 TEXT NOT NULL DEFAULT '',           -- knowledge:学科 social:行为模式('' = 无)
+    count INTEGER NOT NULL DEFAULT 0,
+    value_sum REAL NOT NULL DEFAULT 0,       -- knowledge:置信度之和 emotion:强度之和
+    value_count INTEGER NOT NULL DEFAULT 0,  -- value_sum中非空值的条数
+    PRIMARY KEY (child_id, dimension, day, key1, key2)
+) WITHOUT ROWID;
+
+-- 知识维度: 来源 x 学科
+CREATE TRIGGER IF NOT EXISTS rollup_knowledge_insert
+AFTER INSERT ON knowledge_points
+BEGIN
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count, value_sum, value_count)
+    VALUES (NEW.child_id, 'knowledge', substr(NEW.created_at, 1, 10), NEW.source, NEW.subject,
+            1, COALESCE(NEW.confidence_score, 0), NEW.confidence_score IS NOT NULL)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET
+        count = count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_count = value_count + excluded.value_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_knowledge_delete
+AFTER DELETE ON knowledge_points
+BEGIN
+    UPDATE memory_daily_rollups SET
+        count = count - 1,
+        value_sum = value_sum - COALESCE(OLD.confidence_score, 0),
+        value_count = value_count - (OLD.confidence_score IS NOT NULL)
+    WHERE child_id = OLD.child_id AND dimension = 'knowledge' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.source AND key2 = OLD.subject;
+END;
+
+-- 表达维度: 地点(没有地点的素材不计)
+CREATE TRIGGER IF NOT EXISTS rollup_writing_insert
+AFTER INSERT ON writing_materials
+WHEN NEW.location IS NOT NULL
+BEGIN
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count)
+    VALUES (NEW.child_id, 'writing', substr(NEW.created_at, 1, 10), NEW.location, 1)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_writing_delete
+AFTER DELETE ON writing_materials
+WHEN OLD.location IS NOT NULL
+BEGIN
+    UPDATE memory_daily_rollups SET count = count - 1
+    WHERE child_id = OLD.child_id AND dimension = 'writing' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.location AND key2 = '';
+END;
+
+-- 社交维度: 关系类型 x 行为模式
+CREATE TRIGGER IF NOT EXISTS rollup_social_insert
+AFTER INSERT ON social_events
+BEGIN
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count)
+    VALUES (NEW.child_id, 'social', substr(NEW.created_at, 1, 10), NEW.relationship_type,
+            COALESCE(NEW.behavior_pattern, ''), 1)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_social_delete
+AFTER DELETE ON social_events
+BEGIN
+    UPDATE memory_daily_rollups SET count = count - 1
+    WHERE child_id = OLD.child_id AND dimension = 'social' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.relationship_type AND key2 = COALESCE(OLD.behavior_pattern, '');
+END;
+
+-- 情绪维度: 情绪类型(含强度)
+CREATE TRIGGER IF NOT EXISTS rollup_emotion_insert
+AFTER INSERT ON emotions
+BEGIN
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count, value_sum, value_count)
+    VALUES (NEW.child_id, 'emotion', substr(NEW.created_at, 1, 10), NEW.emotion_type,
+            1, COALESCE(NEW.intensity, 0), NEW.intensity IS NOT NULL)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET
+        count = count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_count = value_count + excluded.value_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_emotion_delete
+AFTER DELETE ON emotions
+BEGIN
+    UPDATE memory_daily_rollups SET
+        count = count - 1,
+        value_sum = value_sum - COALESCE(OLD.intensity, 0),
+        value_count = value_count - (OLD.intensity IS NOT NULL)
+    WHERE child_id = OLD.child_id AND dimension = 'emotion' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.emotion_type AND key2 = '';
+END;
@@ -0,0 +1,8 @@
+-- ===========================================
+-- 📜 会话最近消息索引
+-- 对话历史按 conversation_id 取最近N条消息(ORDER BY id DESC LIMIT N),
+-- (conversation_id, id) 让过滤和排序都走索引;轮次统计仍用 (conversation_id, role)
+-- ===========================================
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_recent
+    ON messages(conversation_id, id);
@@ -0,0 +1,47 @@
+-- ===========================================
+-- 🗂️ 分层长期记忆(会话 → 天 → 周 → 月)
+-- 会话结束后压缩为简短摘要,再逐级合并为日/周/月摘要;
+-- 由 python -m app.workers.digests 批量生成,System Prompt 每层取固定条数
+-- ===========================================
+
+CREATE TABLE IF NOT EXISTS memory_digests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    child_id INTEGER NOT NULL,
+    level TEXT NOT NULL,                     -- conversation/day/week/month
+    period_key TEXT NOT NULL,                -- conversation:会话ID day:YYYY-MM-DD week:周一日期 month:YYYY-MM
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    source_count INTEGER NOT NULL DEFAULT 1, -- 覆盖的会话数(上层摘要据此判断是否需要重新合并)
+    created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (child_id, level, period_key),
+    FOREIGN KEY (child_id) REFERENCES children(id) ON DELETE CASCADE
+);
+
+-- 读取: 某个孩子每层最近的N条
+CREATE INDEX IF NOT EXISTS idx_digests_child_level_end
+    ON memory_digests(child_id, level, period_end DESC);
+
+-- 合并任务: 按层查找最近一段时间内的摘要
+CREATE INDEX IF NOT EXISTS idx_digests_level_end
+    ON memory_digests(level, period_end);
+
+-- 查找已结束但还没有会话摘要的对话
+CREATE INDEX IF NOT EXISTS idx_conversations_active
+    ON conversations(is_active, end_time);
+
+-- 摘要变化时记忆缓存失效
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_digest_insert
+AFTER INSERT ON memory_digests
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_digest_update
+AFTER UPDATE ON memory_digests
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
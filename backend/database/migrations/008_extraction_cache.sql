@@ -0,0 +1,19 @@
+-- ===========================================
+-- 🧠 提取结果缓存(按内容寻址)
+-- 归一化后的(用户消息, AI回复)取SHA-256作为键,相同/几乎相同的对话不再重复调用豆包提取;
+-- 每条记录写入时的 system_config.prompt_version,提取Prompt升级后旧记录自动失效
+-- ===========================================
+
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    content_hash TEXT PRIMARY KEY,
+    prompt_version TEXT NOT NULL,
+    result TEXT NOT NULL,                    -- 豆包提取结果(JSON)
+    latency_ms INTEGER NOT NULL DEFAULT 0,   -- 生成这条结果的豆包调用耗时,命中时计为节省的时间
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    last_used_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+) WITHOUT ROWID;
+
+-- 清理: 按最近使用时间淘汰
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_used
+    ON extraction_cache(last_used_at);
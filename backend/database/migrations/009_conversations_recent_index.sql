@@ -0,0 +1,8 @@
+-- ===========================================
+-- 🔥 最近活跃孩子索引
+-- 启动预热按 conversations.start_time 倒序找最近活跃的孩子及其最新会话:
+-- 倒序遍历 (start_time, child_id) 覆盖索引,凑够N个孩子即停,不扫全表
+-- ===========================================
+
+CREATE INDEX IF NOT EXISTS idx_conversations_start_time
+    ON conversations(start_time, child_id);
@@ -0,0 +1,136 @@
+-- ===========================================
+-- 🔍 全文检索(FTS5 + trigram分词,中文按3字滑窗切分,不需要分词词典)
+-- 检索对话消息、知识点内容、写作素材的事件描述;外部内容表(不重复存原文),
+-- 内容来自下面的 *_search 视图,由触发器在同一事务里增量维护
+--
+-- 按孩子过滤: child_key 列是把 child_id 编码成的3个私用区字符(U+E000起,每位6400进制),
+-- 正好是一个trigram,倒排表就是这个孩子的全部行;查询 child_key:"..." AND body:"..."
+-- 只在该孩子的行里求交集,与全库数据量基本无关(编码见 app/services/search_service.py 的 child_key)
+--
+-- 已有数据: 索引为空时本脚本自动重建一次;之后全量重建用 database/maintenance/rebuild_search.sql
+-- ===========================================
+
+-- 对话消息(孩子ID在 conversations 上)
+CREATE VIEW IF NOT EXISTS messages_search AS
+SELECT m.id,
+       char(57344 + (c.child_id / 40960000) % 6400, 57344 + (c.child_id / 6400) % 6400, 57344 + c.child_id % 6400) AS child_key,
+       m.content AS body
+FROM messages m
+JOIN conversations c ON c.id = m.conversation_id;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    child_key, body,
+    content = 'messages_search', content_rowid = 'id', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS search_messages_insert
+AFTER INSERT ON messages
+BEGIN
+    INSERT INTO messages_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM messages_search WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_messages_delete
+AFTER DELETE ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, child_key, body)
+    SELECT 'delete', OLD.id,
+           char(57344 + (child_id / 40960000) % 6400, 57344 + (child_id / 6400) % 6400, 57344 + child_id % 6400),
+           OLD.content
+    FROM conversations WHERE id = OLD.conversation_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_messages_update
+AFTER UPDATE OF content, conversation_id ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, child_key, body)
+    SELECT 'delete', OLD.id,
+           char(57344 + (child_id / 40960000) % 6400, 57344 + (child_id / 6400) % 6400, 57344 + child_id % 6400),
+           OLD.content
+    FROM conversations WHERE id = OLD.conversation_id;
+    INSERT INTO messages_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM messages_search WHERE id = NEW.id;
+END;
+
+-- 知识点
+CREATE VIEW IF NOT EXISTS knowledge_search AS
+SELECT id,
+       char(57344 + (child_id / 40960000) % 6400, 57344 + (child_id / 6400) % 6400, 57344 + child_id % 6400) AS child_key,
+       content AS body
+FROM knowledge_points;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+    child_key, body,
+    content = 'knowledge_search', content_rowid = 'id', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS search_knowledge_insert
+AFTER INSERT ON knowledge_points
+BEGIN
+    INSERT INTO knowledge_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM knowledge_search WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_knowledge_delete
+AFTER DELETE ON knowledge_points
+BEGIN
+    INSERT INTO knowledge_fts (knowledge_fts, rowid, child_key, body)
+    VALUES ('delete', OLD.id,
+            char(57344 + (OLD.child_id / 40960000) % 6400, 57344 + (OLD.child_id / 6400) % 6400, 57344 + OLD.child_id % 6400),
+            OLD.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_knowledge_update
+AFTER UPDATE OF content, child_id ON knowledge_points
+BEGIN
+    INSERT INTO knowledge_fts (knowledge_fts, rowid, child_key, body)
+    VALUES ('delete', OLD.id,
+            char(57344 + (OLD.child_id / 40960000) % 6400, 57344 + (OLD.child_id / 6400) % 6400, 57344 + OLD.child_id % 6400),
+            OLD.content);
+    INSERT INTO knowledge_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM knowledge_search WHERE id = NEW.id;
+END;
+
+-- 写作素材
+CREATE VIEW IF NOT EXISTS writing_search AS
+SELECT id,
+       char(57344 + (child_id / 40960000) % 6400, 57344 + (child_id / 6400) % 6400, 57344 + child_id % 6400) AS child_key,
+       event_description AS body
+FROM writing_materials;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS writing_fts USING fts5(
+    child_key, body,
+    content = 'writing_search', content_rowid = 'id', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS search_writing_insert
+AFTER INSERT ON writing_materials
+BEGIN
+    INSERT INTO writing_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM writing_search WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_writing_delete
+AFTER DELETE ON writing_materials
+BEGIN
+    INSERT INTO writing_fts (writing_fts, rowid, child_key, body)
+    VALUES ('delete', OLD.id,
+            char(57344 + (OLD.child_id / 40960000) % 6400, 57344 + (OLD.child_id / 6400) % 6400, 57344 + OLD.child_id % 6400),
+            OLD.event_description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_writing_update
+AFTER UPDATE OF event_description, child_id ON writing_materials
+BEGIN
+    INSERT INTO writing_fts (writing_fts, rowid, child_key, body)
+    VALUES ('delete', OLD.id,
+            char(57344 + (OLD.child_id / 40960000) % 6400, 57344 + (OLD.child_id / 6400) % 6400, 57344 + OLD.child_id % 6400),
+            OLD.event_description);
+    INSERT INTO writing_fts (rowid, child_key, body)
+    SELECT id, child_key, body FROM writing_search WHERE id = NEW.id;
+END;
+
+-- 升级已有数据的库: 索引为空时从内容表构建一次(重复执行本脚本时不会重建)
+INSERT INTO messages_fts (messages_fts) SELECT 'rebuild' WHERE NOT EXISTS (SELECT 1 FROM messages_fts_docsize);
+INSERT INTO knowledge_fts (knowledge_fts) SELECT 'rebuild' WHERE NOT EXISTS (SELECT 1 FROM knowledge_fts_docsize);
+INSERT INTO writing_fts (writing_fts) SELECT 'rebuild' WHERE NOT EXISTS (SELECT 1 FROM writing_fts_docsize);
@@ -0,0 +1,74 @@
+-- ===========================================
+-- 📆 按天汇总: 修改分组键时同步(005_daily_rollups.sql 只处理插入和删除)
+-- 维度表修改孩子、时间、分组键或统计值时,先从旧的(孩子, 日期, 维度, 分组键)扣除,再累加到新的
+-- ===========================================
+
+-- 知识维度: 来源 x 学科
+CREATE TRIGGER IF NOT EXISTS rollup_knowledge_update
+AFTER UPDATE OF child_id, created_at, source, subject, confidence_score ON knowledge_points
+BEGIN
+    UPDATE memory_daily_rollups SET
+        count = count - 1,
+        value_sum = value_sum - COALESCE(OLD.confidence_score, 0),
+        value_count = value_count - (OLD.confidence_score IS NOT NULL)
+    WHERE child_id = OLD.child_id AND dimension = 'knowledge' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.source AND key2 = OLD.subject;
+
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count, value_sum, value_count)
+    VALUES (NEW.child_id, 'knowledge', substr(NEW.created_at, 1, 10), NEW.source, NEW.subject,
+            1, COALESCE(NEW.confidence_score, 0), NEW.confidence_score IS NOT NULL)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET
+        count = count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_count = value_count + excluded.value_count;
+END;
+
+-- 表达维度: 地点(改成或改自无地点时只扣除或只累加)
+CREATE TRIGGER IF NOT EXISTS rollup_writing_update
+AFTER UPDATE OF child_id, created_at, location ON writing_materials
+WHEN OLD.location IS NOT NULL OR NEW.location IS NOT NULL
+BEGIN
+    UPDATE memory_daily_rollups SET count = count - 1
+    WHERE OLD.location IS NOT NULL
+      AND child_id = OLD.child_id AND dimension = 'writing' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.location AND key2 = '';
+
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count)
+    SELECT NEW.child_id, 'writing', substr(NEW.created_at, 1, 10), NEW.location, 1
+    WHERE NEW.location IS NOT NULL
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET count = count + 1;
+END;
+
+-- 社交维度: 关系类型 x 行为模式
+CREATE TRIGGER IF NOT EXISTS rollup_social_update
+AFTER UPDATE OF child_id, created_at, relationship_type, behavior_pattern ON social_events
+BEGIN
+    UPDATE memory_daily_rollups SET count = count - 1
+    WHERE child_id = OLD.child_id AND dimension = 'social' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.relationship_type AND key2 = COALESCE(OLD.behavior_pattern, '');
+
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, key2, count)
+    VALUES (NEW.child_id, 'social', substr(NEW.created_at, 1, 10), NEW.relationship_type,
+            COALESCE(NEW.behavior_pattern, ''), 1)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET count = count + 1;
+END;
+
+-- 情绪维度: 情绪类型(含强度)
+CREATE TRIGGER IF NOT EXISTS rollup_emotion_update
+AFTER UPDATE OF child_id, created_at, emotion_type, intensity ON emotions
+BEGIN
+    UPDATE memory_daily_rollups SET
+        count = count - 1,
+        value_sum = value_sum - COALESCE(OLD.intensity, 0),
+        value_count = value_count - (OLD.intensity IS NOT NULL)
+    WHERE child_id = OLD.child_id AND dimension = 'emotion' AND day = substr(OLD.created_at, 1, 10)
+      AND key1 = OLD.emotion_type AND key2 = '';
+
+    INSERT INTO memory_daily_rollups (child_id, dimension, day, key1, count, value_sum, value_count)
+    VALUES (NEW.child_id, 'emotion', substr(NEW.created_at, 1, 10), NEW.emotion_type,
+            1, COALESCE(NEW.intensity, 0), NEW.intensity IS NOT NULL)
+    ON CONFLICT(child_id, dimension, day, key1, key2) DO UPDATE SET
+        count = count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_count = value_count + excluded.value_count;
+END;
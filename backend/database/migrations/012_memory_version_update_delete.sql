@@ -0,0 +1,115 @@
+-- ===========================================
+-- 🔖 记忆版本号: 修改和删除也使缓存失效(003_memory_versions.sql 只处理插入和兴趣的修改)
+-- 修改时新旧孩子的版本号都+1(改了 child_id 时两个孩子的记忆都变了),删除时旧孩子的版本号+1
+-- ===========================================
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_knowledge_update
+AFTER UPDATE ON knowledge_points
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_knowledge_delete
+AFTER DELETE ON knowledge_points
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_writing_update
+AFTER UPDATE ON writing_materials
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_writing_delete
+AFTER DELETE ON writing_materials
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_social_update
+AFTER UPDATE ON social_events
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_social_delete
+AFTER DELETE ON social_events
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_emotions_update
+AFTER UPDATE ON emotions
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_emotions_delete
+AFTER DELETE ON emotions
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_personality_update
+AFTER UPDATE ON personality_traits
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_personality_delete
+AFTER DELETE ON personality_traits
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_user_memory_update
+AFTER UPDATE ON user_memory
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (NEW.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_user_memory_delete
+AFTER DELETE ON user_memory
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+-- 兴趣修改已由 bump_memory_version_interest_update 处理新孩子,这里补上改了 child_id 时的旧孩子
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_interest_update_old
+AFTER UPDATE OF child_id ON interest_intensity
+BEGIN
+    INSERT INTO memory_versions (child_id, version) SELECT OLD.child_id, 1 WHERE OLD.child_id IS NOT NEW.child_id
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
+
+CREATE TRIGGER IF NOT EXISTS bump_memory_version_interest_delete
+AFTER DELETE ON interest_intensity
+BEGIN
+    INSERT INTO memory_versions (child_id, version) VALUES (OLD.child_id, 1)
+    ON CONFLICT(child_id) DO UPDATE SET version = version + 1, updated_at = datetime('now', 'localtime');
+END;
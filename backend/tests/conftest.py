@@ -0,0 +1,36 @@
+"""测试公共fixture"""
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.database import close_pools
+from app.services.extraction_cache import extraction_cache
+from app.services.history_service import conversation_history
+from app.services.memory_service import memory_service
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "database" / "migrations"
+
+
+@pytest.fixture(autouse=True)
+def no_warmup(monkeypatch):
+    """测试默认不做启动预热(会连接真实的豆包地址);预热测试里单独打开"""
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", False)
+
+
+@pytest.fixture
+def test_db(tmp_path, monkeypatch):
+    """按迁移脚本建一个临时数据库,并让应用指向它"""
+    db_path = tmp_path / "learning_ai.db"
+    conn = sqlite3.connect(db_path)
+    for script in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        conn.executescript(script.read_text(encoding="utf-8"))
+    conn.close()
+
+    monkeypatch.setattr(settings, "DATABASE_URL", str(db_path))
+    memory_service.cache.clear()
+    conversation_history.clear()
+    extraction_cache.clear()
+    yield db_path
+    close_pools()
@@ -0,0 +1,238 @@
+"""
+本地豆包API桩服务(OpenAI兼容的 chat/completions,标准库 ThreadingHTTPServer)
+
+测试里按顺序回放预设的响应,用于测试重试、对冲和熔断:
+
+    with DoubaoStub([(503, 0), (200, 0)]) as stub:
+        client = DouBaoClient(api_url=stub.url, ...)
+
+基准测试不传预设响应: 每个请求按延迟分布随机等待,可按比例注入429/5xx错误,
+stream=true 时按SSE逐块返回。不依赖网络和API Key:
+
+    with DoubaoStub(latency=LatencyModel.parse("lognormal:0.3,0.4"), error_rate=0.02) as stub:
+        DOUBAO_API_URL=stub.url ...
+
+也可以单独启动,给手动压测用:
+
+    cd backend && python -m tests.doubao_stub --port 18080 --latency uniform:0.1,0.5
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# (状态码, 延迟秒数);回放完后重复最后一条
+Reply = Tuple[int, float]
+
+# 基准测试用的对话答复
+CHAT_REPLY = "哇,你观察得真仔细!你觉得这是为什么呢?我们一起想一想,下次还可以做个小实验验证一下。"
+
+# 基准测试里提取请求(Prompt要求返回JSON)的固定答复: 五个维度都没有新信息
+EXTRACTION_REPLY = json.dumps(
+    {"knowledge": None, "writing": None, "social": None, "emotion": None},
+    ensure_ascii=False
+)
+
+
+class LatencyModel:
+    """
+    上游延迟分布(秒)
+
+    - fixed:0.2         固定200ms
+    - uniform:0.1,0.4   100~400ms均匀分布
+    - lognormal:0.3,0.5 中位数300ms、sigma=0.5的对数正态分布(长尾,接近真实大模型)
+    """
+
+    KINDS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, kind: str, params: Sequence[float]):
+        if kind not in self.KINDS:
+            raise ValueError(f"未知的延迟分布: {kind}")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}[kind]
+        if len(params) != expected:
+            raise ValueError(f"{kind} 需要{expected}个参数")
+        self.kind = kind
+        self.params = tuple(params)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, args = spec.partition(":")
+        params = [float(x) for x in args.split(",")] if args else []
+        return cls(kind.strip(), params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+class DoubaoStub:
+    """
+    chat/completions 服务: 给了 replies 时按顺序返回预设状态码和延迟,
+    否则按延迟分布和错误率抽取;extraction_content 非空时提取请求返回它
+    """
+
+    def __init__(
+        self,
+        replies: Optional[List[Reply]] = None,
+        content: str = "好的",
+        retry_after: Optional[str] = None,
+        extraction_content: Optional[str] = None,
+        latency: Optional[LatencyModel] = None,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (429, 500, 503),
+        chunk_chars: int = 4,
+        chunk_interval: float = 0.01,
+        port: int = 0,
+        seed: int = 0
+    ):
+        self.replies = list(replies or [])
+        self.content = content
+        self.retry_after = retry_after
+        self.extraction_content = extraction_content
+        self.latency = latency or LatencyModel("fixed", (0.05,))
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunk_interval = chunk_interval
+        self.statuses: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive,和真实上游一样复用连接
+            disable_nagle_algorithm = True  # 响应头和正文分两次写,不关Nagle会叠加40ms的延迟确认
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, delay = stub._next_reply()
+                time.sleep(delay)
+                try:
+                    if status != 200:
+                        self._send_json(status, {"error": {"code": status, "message": "injected"}})
+                    elif body.get("stream"):
+                        self._send_stream()
+                    else:
+                        self._send_json(200, {"choices": [{"message": {"role": "assistant",
+                                                                       "content": stub._content(body)}}]})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已取消(超时或对冲请求的输家)
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status in (429, 503) and stub.retry_after:
+                    self.send_header("Retry-After", stub.retry_after)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                content = stub.content
+                chunks = [{"choices": [{"delta": {"role": "assistant"}}]}]
+                chunks += [
+                    {"choices": [{"delta": {"content": content[i:i + stub.chunk_chars]}}]}
+                    for i in range(0, len(content), stub.chunk_chars)
+                ]
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(stub.chunk_interval)
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3/chat/completions"
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+    def reset(self):
+        with self._lock:
+            self.statuses.clear()
+
+    def _next_reply(self) -> Reply:
+        """本次请求的(状态码, 延迟秒数)"""
+        with self._lock:
+            if self.replies:
+                status, delay = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+            else:
+                status = 200
+                if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                    status = self._rng.choice(self.error_statuses)
+                delay = self.latency.sample(self._rng)
+            self.statuses[status] += 1
+        return status, delay
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages") or []
+        if self.extraction_content is not None and messages and "JSON" in str(messages[-1].get("content", "")):
+            return self.extraction_content
+        return self.content
+
+    def __enter__(self) -> "DoubaoStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def bench_stub(**kwargs) -> DoubaoStub:
+    """基准测试用的桩服务: 对话和提取请求返回接近真实的答复,429/503带 Retry-After"""
+    return DoubaoStub(content=CHAT_REPLY, extraction_content=EXTRACTION_REPLY, retry_after="1", **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地豆包API桩服务")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="延迟分布,如 fixed:0.2 / uniform:0.1,0.4 / lognormal:0.3,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入429/5xx错误的比例(0~1)")
+    parser.add_argument("--chunk-interval", type=float, default=0.01, help="流式返回时每块之间的间隔秒数")
+    args = parser.parse_args()
+
+    stub = bench_stub(
+        latency=LatencyModel.parse(args.latency),
+        error_rate=args.error_rate,
+        chunk_interval=args.chunk_interval,
+        port=args.port
+    )
+    with stub:
+        print(f"豆包桩服务: {stub.url} (延迟 {stub.latency}, 错误率 {args.error_rate:.0%})")
+        try:
+            stub._thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
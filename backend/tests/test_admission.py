@@ -0,0 +1,88 @@
+"""对话准入控制与出站限速测试"""
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.main import app
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.utils.resilience import TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_one_turn_per_child_and_global_cap():
+    """测试同一个孩子的请求排队串行,不同孩子在全局上限内并发"""
+    controller = AdmissionController(max_in_flight=2, max_queue=10, queue_timeout=5)
+    running = {1: 0, 2: 0}
+    peak = {1: 0, 2: 0, "total": 0}
+
+    async def turn(child_id):
+        async with controller.admit(child_id):
+            running[child_id] += 1
+            peak[child_id] = max(peak[child_id], running[child_id])
+            peak["total"] = max(peak["total"], sum(running.values()))
+            await asyncio.sleep(0.02)
+            running[child_id] -= 1
+
+    await asyncio.gather(*[turn(child_id) for child_id in (1, 1, 1, 2, 2, 2)])
+    assert peak == {1: 1, 2: 1, "total": 2}
+    assert controller.stats()["admitted"] == 6
+    assert controller._children == {}  # 锁用完即删除
+
+
+@pytest.mark.asyncio
+async def test_sheds_load_when_queue_full_or_deadline_missed():
+    """测试排队满了立即拒绝,预计等待超过期限也立即拒绝,而不是排到超时"""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.5)
+    holder = await controller.acquire(1)
+    queued = asyncio.ensure_future(controller.acquire(2))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire(3)
+    assert rejected.value.retry_after >= 1
+    holder.release()
+    (await queued).release()
+
+    # 最近一轮耗时1秒,排队预计要等1秒 > 0.5秒期限
+    controller._turn_seconds = 1.0
+    holder = await controller.acquire(1)
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected, match="预计等待超时"):
+        await controller.acquire(2)
+    assert time.monotonic() - started < 0.1
+    holder.release()
+    assert controller.stats()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_free_slot_is_granted_after_the_deadline():
+    """测试排队期限已用完时,空闲的名额仍直接放行;没有空闲名额才拒绝"""
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=0)
+    holder = await controller.acquire(1)
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected, match="排队超时"):
+        await controller.acquire(2)
+    assert time.monotonic() - started < 0.1
+    holder.release()
+    (await controller.acquire(2)).release()
+    assert controller.stats()["admitted"] == 2
+
+
+def test_send_returns_503_with_retry_after(test_db, monkeypatch):
+    """测试过载时 /api/chat/send 返回503和Retry-After"""
+    monkeypatch.setattr(chat, "admission_controller", AdmissionController(max_in_flight=0, max_queue=0))
+    with TestClient(app) as http:
+        response = http.post("/api/chat/send", json={"child_id": 1, "message": "你好"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """测试令牌桶: 突发额度用完后按速率放行"""
+    bucket = TokenBucket(rate=50, burst=2)
+    started = time.monotonic()
+    await asyncio.gather(*[bucket.acquire() for _ in range(7)])
+    assert 0.09 <= time.monotonic() - started < 0.3
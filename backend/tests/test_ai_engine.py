@@ -1,7 +1,111 @@
 """AI引擎测试"""
+import json
+import sqlite3
+import threading
+
+import httpx
 import pytest
 
+from app.config import settings
+from app.core.ai_engine import AIEngine
+from app.database import WriteActor
+from app.services.history_service import conversation_history
+from app.utils.api_client import DouBaoClient
+
 @pytest.mark.asyncio
 async def test_chat():
     """测试对话功能"""
     pass
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_stages_and_turn_counter(test_db, monkeypatch):
+    """测试对话各阶段计时,同步提取与消息保存并发,轮次来自内存计数"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)["messages"]
+        if "提取" in messages[0]["content"]:
+            content = json.dumps({"emotion": {"emotion_type": "positive", "intensity": 8}})
+        else:
+            content = "真不错!"
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    monkeypatch.setattr(settings, "EXTRACTION_ASYNC", False)
+    monkeypatch.setattr(settings, "EXTRACTION_LOCAL_GATE", False)
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    engine = AIEngine(client=client)
+
+    first = await engine.chat(child_id=1, message="我今天去了科技馆")
+    assert first["success"] and first["turn_count"] == 1
+    assert {"memory", "prompt", "llm", "persist", "extract", "total"} <= set(first["timings"])
+
+    def count_from_db(*args, **kwargs):
+        pytest.fail("轮次应来自对话历史缓冲的计数")
+
+    monkeypatch.setattr(engine, "_get_turn_count", count_from_db)
+    second = await engine.chat(child_id=1, message="还看了机器人表演", conversation_id=first["conversation_id"])
+    await client.aclose()
+    assert second["turn_count"] == 2
+    assert "history" in second["timings"]
+
+    conn = sqlite3.connect(test_db)
+    emotions = conn.execute("SELECT COUNT(*) FROM emotions").fetchone()[0]
+    conn.close()
+    assert emotions == 2
+
+
+@pytest.mark.asyncio
+async def test_async_paths_do_not_block_on_write_actor(test_db, monkeypatch):
+    """测试流式新建会话、轮次收尾和豆包提取失败的降级保存都 await 写线程,不在事件循环里同步等待"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)["messages"]
+        if "提取" in messages[0]["content"]:
+            return httpx.Response(200, json={"choices": [{"message": {"content": "不是JSON"}}]})
+        body = 'data: {"choices": [{"delta": {"content": "真棒"}}]}\n\ndata: [DONE]\n\n'
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    def blocking_execute(self, fn):
+        pytest.fail("异步代码不应调用 WriteActor.execute")
+
+    monkeypatch.setattr(settings, "EXTRACTION_ASYNC", False)
+    monkeypatch.setattr(settings, "EXTRACTION_LOCAL_GATE", False)
+    monkeypatch.setattr(WriteActor, "execute", blocking_execute)
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    engine = AIEngine(client=client)
+
+    events = [event async for event in engine.chat_stream(child_id=1, message="我今天很开心")]
+    conversation_id = events[-1]["conversation_id"]
+    turn = await engine.complete_turn(conversation_id, 1, "我今天很开心", events[-1]["response"])
+    await client.aclose()
+
+    assert turn["conversation_id"] == conversation_id
+    assert turn["extracted_info"]["emotion"]["type"] == "positive"
+
+
+@pytest.mark.asyncio
+async def test_turn_count_falls_back_off_the_event_loop(test_db, monkeypatch):
+    """测试对话历史缓冲被淘汰后,轮次数在线程池里查库"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"choices": [{"message": {"content": "真不错!"}}]})
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    engine = AIEngine(client=client)
+    first = await engine.chat(child_id=1, message="你好")
+    conversation_history.invalidate(first["conversation_id"])
+
+    loop_thread = threading.get_ident()
+    threads = []
+    count_from_db = engine._get_turn_count
+
+    def recording_count(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return count_from_db(*args, **kwargs)
+
+    monkeypatch.setattr(engine, "_get_turn_count", recording_count)
+    second = await engine.complete_turn(first["conversation_id"], 1, "再见", "拜拜")
+    await client.aclose()
+
+    assert second["turn_count"] == 2
+    assert threads and loop_thread not in threads
@@ -0,0 +1,70 @@
+"""豆包API客户端测试"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.utils.api_client import DouBaoClient
+
+
+def _completion(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_returns_content():
+    """测试返回回复文本,并携带认证头和模型"""
+    seen = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen["auth"] = request.headers["Authorization"]
+        seen["body"] = json.loads(request.content)
+        return httpx.Response(200, json=_completion("你好呀😊"))
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    try:
+        reply = await client.chat_completion([{"role": "user", "content": "你好"}])
+    finally:
+        await client.aclose()
+
+    assert reply == "你好呀😊"
+    assert seen["auth"] == "Bearer k"
+    assert seen["body"]["model"] == "m"
+    assert seen["body"]["messages"][0]["content"] == "你好"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_do_not_serialize():
+    """测试并发请求不会互相阻塞"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=_completion("ok"))
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    try:
+        start = time.perf_counter()
+        replies = await asyncio.gather(*[
+            client.chat_completion([{"role": "user", "content": str(i)}]) for i in range(10)
+        ])
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.aclose()
+
+    assert replies == ["ok"] * 10
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_http_error_is_raised():
+    """测试上游错误向上抛出"""
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(lambda request: httpx.Response(500, text="boom")))
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.chat_completion([{"role": "user", "content": "hi"}])
+    finally:
+        await client.aclose()
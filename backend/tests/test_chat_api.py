@@ -0,0 +1,81 @@
+"""对话API测试"""
+import json
+import sqlite3
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.config import settings
+from app.main import app
+from app.utils.api_client import DouBaoClient
+from app.workers.extraction import ExtractionWorker
+
+
+def _doubao_handler(request: httpx.Request) -> httpx.Response:
+    """模拟豆包: stream=true 时返回SSE,否则返回提取用的JSON"""
+    body = json.loads(request.content)
+    if body.get("stream"):
+        chunks = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "哇,"}}]},
+            {"choices": [{"delta": {"content": "太棒了!"}}]},
+        ]
+        lines = [f"data: {json.dumps(c, ensure_ascii=False)}\n\n" for c in chunks]
+        lines.append("data: [DONE]\n\n")
+        return httpx.Response(200, text="".join(lines),
+                              headers={"Content-Type": "text/event-stream"})
+    extracted = {"knowledge": None, "writing": None, "social": None,
+                 "emotion": {"emotion_type": "positive", "intensity": 8,
+                             "trigger_event": "考试考得好", "coping_strategy": None}}
+    return httpx.Response(200, json={"choices": [{"message": {
+        "content": json.dumps(extracted, ensure_ascii=False)}}]})
+
+
+@pytest.mark.asyncio
+async def test_stream_relays_tokens_then_persists(test_db, monkeypatch):
+    """测试SSE逐token推送,流结束后再保存消息并入队提取任务"""
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(_doubao_handler))
+    monkeypatch.setattr(chat.ai_engine, "client", client)
+    monkeypatch.setattr(settings, "EXTRACTION_LOCAL_GATE", False)  # 情绪明确,本地规则就能提取;这里测试入队
+
+    with TestClient(app) as http:
+        response = http.post("/api/chat/stream",
+                             json={"child_id": 1, "message": "我今天考试考得很好,特别开心!"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):])
+              for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["start", "delta", "delta", "end"]
+    assert events[-1]["response"] == "哇,太棒了!"
+
+    conn = sqlite3.connect(test_db)
+    messages = conn.execute("SELECT role, content FROM messages ORDER BY id").fetchall()
+    jobs = conn.execute("SELECT status, ai_response FROM extraction_jobs").fetchall()
+    conn.close()
+    assert messages == [("user", "我今天考试考得很好,特别开心!"), ("assistant", "哇,太棒了!")]
+    assert jobs == [("pending", "哇,太棒了!")]
+
+    # worker消费队列后写入维度表
+    assert await ExtractionWorker(engine=chat.ai_engine).run_once() == 1
+    conn = sqlite3.connect(test_db)
+    emotions = conn.execute("SELECT emotion_type, intensity FROM emotions").fetchall()
+    conn.close()
+    assert emotions == [("positive", 8)]
+
+
+def test_stream_text_format_is_plain_chunks(test_db, monkeypatch):
+    """测试format=text时直接推送回复文本"""
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(_doubao_handler))
+    monkeypatch.setattr(chat.ai_engine, "client", client)
+
+    with TestClient(app) as http:
+        response = http.post("/api/chat/stream?format=text",
+                             json={"child_id": 1, "message": "你好"})
+
+    assert response.status_code == 200
+    assert response.text == "哇,太棒了!"
@@ -0,0 +1,92 @@
+"""数据库连接池测试"""
+import sqlite3
+import threading
+
+import pytest
+
+from app.database import get_pool, get_write_actor
+
+
+def test_connections_are_tuned(test_db):
+    """测试连接池开启WAL并设置PRAGMA"""
+    pool = get_pool()
+    with pool.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+    assert get_pool() is pool
+
+
+def test_reader_is_read_only(test_db):
+    """测试只读连接不能写入"""
+    with get_pool().reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM children")
+
+
+def test_reads_do_not_block_on_open_write(test_db):
+    """测试写事务未提交时读不被阻塞,且只看到已提交的数据"""
+    pool = get_pool()
+    in_transaction = threading.Event()
+    release = threading.Event()
+
+    def slow_writer():
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO children (name, birth_date) VALUES ('小明', '2016-01-01')")
+            in_transaction.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=slow_writer)
+    thread.start()
+    try:
+        assert in_transaction.wait(5)
+        with pool.reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 1
+    finally:
+        release.set()
+        thread.join()
+
+    with pool.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 2
+
+
+def test_writer_rolls_back_on_error(test_db):
+    """测试写事务出错时整体回滚"""
+    with pytest.raises(RuntimeError):
+        with get_pool().writer() as conn:
+            conn.execute("INSERT INTO children (name, birth_date) VALUES ('小明', '2016-01-01')")
+            raise RuntimeError("boom")
+
+    with get_pool().reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 1
+
+
+
+def test_write_actor_group_commits(test_db):
+    """测试并发写批次合并到同一个事务提交,出错的批次只回滚自己"""
+    actor = get_write_actor()
+    pool = get_pool()
+    insert = "INSERT INTO children (name, birth_date) VALUES (?, '2016-01-01')"
+
+    def failing(conn):
+        conn.execute(insert, ("坏数据",))
+        raise ValueError("boom")
+
+    # 占住写连接,让后续批次在队列里排队
+    with pool.writer():
+        futures = [actor.submit(lambda conn, i=i: conn.execute(insert, (f"孩子{i}",)).lastrowid)
+                   for i in range(5)]
+        futures.insert(2, actor.submit(failing))
+        commits_before = actor.commits
+
+    for future in futures[:2] + futures[3:]:
+        assert future.result(5) > 0
+    with pytest.raises(ValueError):
+        futures[2].result(5)
+
+    # 第一个批次可能在占住写连接前已被取走,其余批次应合并提交
+    assert actor.commits - commits_before <= 2
+    with pool.reader() as conn:
+        names = [row[0] for row in conn.execute("SELECT name FROM children WHERE name != '芋圆'")]
+    assert sorted(names) == [f"孩子{i}" for i in range(5)]
@@ -0,0 +1,62 @@
+"""合成数据生成器测试"""
+import sqlite3
+from datetime import datetime
+
+from benchmarks.datagen import ROLLUP_SCRIPT, generate
+
+NOW = datetime(2026, 10, 1, 12, 0, 0)
+
+
+def _dump(path, table):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3, 4").fetchall()
+    conn.close()
+    return rows
+
+
+def test_generation_is_deterministic_across_shards(tmp_path):
+    """测试同一种子在不同分片数下生成相同数据,派生的汇总表、索引和触发器完整"""
+    single, sharded = tmp_path / "single.db", tmp_path / "sharded.db"
+    summary = generate(str(single), 30, 3000, seed=7, workers=1, now=NOW)
+    generate(str(sharded), 30, 3000, seed=7, workers=1, shards=4, now=NOW)
+
+    assert summary["first_child_id"] == 2  # 1是迁移脚本里的示例档案
+    assert 2900 <= summary["rows"]["messages"] <= 3100
+    for table in ("conversations", "messages", "knowledge_points", "emotions", "memory_daily_rollups"):
+        assert _dump(single, table) == _dump(sharded, table)
+
+    conn = sqlite3.connect(single)
+    # 汇总表与逐行触发器维护的结果一致: 重新插入一条知识点,汇总计数+1
+    before = conn.execute("SELECT SUM(count) FROM memory_daily_rollups WHERE dimension = 'knowledge'").fetchone()[0]
+    assert before == conn.execute("SELECT COUNT(*) FROM knowledge_points").fetchone()[0]
+    conn.execute("INSERT INTO knowledge_points (child_id, source, subject, content) VALUES (2, 'active', '数学', '测试')")
+    after = conn.execute("SELECT SUM(count) FROM memory_daily_rollups WHERE dimension = 'knowledge'").fetchone()[0]
+    assert after == before + 1
+    # 消息都挂在存在的会话上
+    orphans = conn.execute(
+        "SELECT COUNT(*) FROM messages m LEFT JOIN conversations c ON c.id = m.conversation_id WHERE c.id IS NULL"
+    ).fetchone()[0]
+    conn.close()
+    assert orphans == 0
+
+
+def test_appending_keeps_seed_rows_and_derived_tables(tmp_path):
+    """测试往已有的库里追加生成: 示例数据不重复,汇总表与全量重建一致,索引和触发器都在"""
+    db = tmp_path / "scale.db"
+    generate(str(db), 5, 500, seed=1, workers=1, now=NOW)
+    conn = sqlite3.connect(db)
+    schema = conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY 1, 2").fetchall()
+    conn.close()
+    summary = generate(str(db), 5, 500, seed=2, workers=1, now=NOW)
+    assert summary["first_child_id"] == 7
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM user_memory WHERE child_id = 1").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM personality_traits WHERE child_id = 1").fetchone()[0] == 2
+    assert conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY 1, 2"
+    ).fetchall() == schema
+    rollups = conn.execute("SELECT * FROM memory_daily_rollups ORDER BY 1, 2, 3, 4, 5").fetchall()
+    conn.executescript(ROLLUP_SCRIPT.read_text(encoding="utf-8"))
+    assert conn.execute("SELECT * FROM memory_daily_rollups ORDER BY 1, 2, 3, 4, 5").fetchall() == rollups
+    conn.close()
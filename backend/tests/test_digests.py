@@ -0,0 +1,103 @@
+"""分层长期记忆测试"""
+import json
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+from app.database import SQLitePool, WriteActor
+from app.services.digest_service import DigestService
+from app.services.memory_service import memory_service
+from app.utils.api_client import DouBaoClient
+from app.workers.digests import DigestWorker
+
+
+def _insert_conversation(conn, conversation_id, days_ago, messages):
+    timestamp = f"datetime('now', 'localtime', '-{days_ago} days')"
+    conn.execute(f"""
+        INSERT INTO conversations (id, child_id, conversation_mode, start_time)
+        VALUES (?, 1, 'knowledge', {timestamp})
+    """, (conversation_id,))
+    for role, content in messages:
+        conn.execute(f"""
+            INSERT INTO messages (conversation_id, role, content, timestamp)
+            VALUES (?, ?, ?, {timestamp})
+        """, (conversation_id, role, content))
+
+
+@pytest.mark.asyncio
+async def test_conversations_roll_up_to_day_week_month(test_db):
+    """测试空闲会话被结束并压缩,再逐级合并为日/周/月摘要,且重复执行不重复生成"""
+    conn = sqlite3.connect(test_db)
+    _insert_conversation(conn, 1, 40, [("user", "我今天自己研究了勾股定理"), ("assistant", "太厉害了!")])
+    _insert_conversation(conn, 2, 40, [("user", "下午和小明打篮球"), ("assistant", "开心吗?")])
+    _insert_conversation(conn, 3, 0, [("user", "刚刚在聊天"), ("assistant", "好呀")])
+    conn.execute("UPDATE conversations SET start_time = datetime('now', 'localtime') WHERE id = 3")
+    conn.commit()
+
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        calls.append(body["messages"][1]["content"])
+        summary = f"摘要{len(calls)}"
+        return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": summary}}]})
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    worker = DigestWorker(DigestService(client=client), concurrency=2)
+    try:
+        written = await worker.run_once()
+        assert await worker.run_once() == 0
+    finally:
+        await client.aclose()
+
+    # 2条会话摘要 + 1条日摘要(合并) + 周、月摘要(只有一条下层摘要,直接沿用)
+    assert written == 5
+    assert len(calls) == 3
+    rows = conn.execute("SELECT level, source_count FROM memory_digests ORDER BY id").fetchall()
+    assert sorted(rows) == [("conversation", 1), ("conversation", 1), ("day", 2), ("month", 2), ("week", 2)]
+    # 还在进行中的会话不结束
+    assert conn.execute("SELECT is_active FROM conversations WHERE id = 3").fetchone()[0] == 1
+    conn.close()
+
+    _, summary = memory_service.get_memory_with_summary(1, 7)
+    assert "【长期记忆】" in summary
+    assert "[月 " in summary and "[周 " in summary and "[天 " in summary and "[最近对话 " in summary
+
+
+@pytest.mark.asyncio
+async def test_worker_keeps_database_calls_off_the_event_loop(test_db, monkeypatch):
+    """测试worker的查库在线程池里执行,保存摘要 await 写线程,并发生成摘要时事件循环不被阻塞"""
+    conn = sqlite3.connect(test_db)
+    _insert_conversation(conn, 1, 40, [("user", "我今天自己研究了勾股定理"), ("assistant", "太厉害了!")])
+    _insert_conversation(conn, 2, 40, [("user", "下午和小明打篮球"), ("assistant", "开心吗?")])
+    conn.commit()
+    conn.close()
+
+    loop_thread = threading.get_ident()
+    reads = []
+    reader, execute = SQLitePool.reader, WriteActor.execute
+
+    def recording_reader(self):
+        reads.append(threading.get_ident())
+        return reader(self)
+
+    def checked_execute(self, fn):
+        assert threading.get_ident() != loop_thread, "事件循环里不应调用 WriteActor.execute"
+        return execute(self, fn)
+
+    monkeypatch.setattr(SQLitePool, "reader", recording_reader)
+    monkeypatch.setattr(WriteActor, "execute", checked_execute)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": "摘要"}}]})
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    try:
+        assert await DigestWorker(DigestService(client=client), concurrency=2).run_once() == 5
+    finally:
+        await client.aclose()
+    assert reads and loop_thread not in reads
@@ -0,0 +1,82 @@
+"""提取结果缓存测试"""
+import json
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+from app.core.ai_engine import AIEngine
+from app.database import SQLitePool, get_write_actor
+from app.services.extraction_cache import content_hash, extraction_cache
+from app.utils.api_client import DouBaoClient
+
+
+def test_content_hash_ignores_width_spacing_and_repeated_punctuation():
+    """测试几乎相同的消息得到相同的键"""
+    assert content_hash("我今天很开心！！！", "太好了") == content_hash("我今天 很开心!", "太好了")
+    assert content_hash("我今天很开心", "太好了") != content_hash("我今天很难过", "太好了")
+
+
+@pytest.mark.asyncio
+async def test_cache_survives_restart_and_prompt_version_change(test_db):
+    """测试重复对话不再调用豆包;重启后从表命中;prompt_version变化后失效"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        content = json.dumps({"emotion": {"emotion_type": "positive", "intensity": 8}})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    engine = AIEngine(client=client)
+
+    first = await engine._call_doubao_for_extraction("我今天很开心!", "太棒了")
+    first["emotion"]["intensity"] = 1  # 调用方修改结果不影响缓存
+    again = await engine._call_doubao_for_extraction("我今天很开心！！", "太棒了")
+    assert len(requests) == 1
+    assert again["emotion"]["intensity"] == 8
+
+    get_write_actor().execute(lambda conn: None)  # 等待缓存写入落库
+    extraction_cache.clear()  # 模拟进程重启
+    await engine._call_doubao_for_extraction("我今天很开心!", "太棒了")
+    assert len(requests) == 1
+    stats = extraction_cache.stats()
+    assert (stats["db_hits"], stats["misses"], stats["prompt_version"]) == (1, 0, "v2.2")
+
+    conn = sqlite3.connect(test_db)
+    conn.execute("UPDATE system_config SET value = 'v2.3' WHERE key = 'prompt_version'")
+    conn.commit()
+    conn.close()
+    extraction_cache.clear()
+    await engine._call_doubao_for_extraction("我今天很开心!", "太棒了")
+    await client.aclose()
+    assert len(requests) == 2
+    assert extraction_cache.prune() == 0  # 新结果覆盖了旧版本的记录
+
+
+@pytest.mark.asyncio
+async def test_async_lookup_reads_sqlite_off_the_event_loop(test_db, monkeypatch):
+    """测试 aget 进程内命中时不查库,需要查SQLite(表或prompt_version)时在线程池里执行"""
+    loop_thread = threading.get_ident()
+    reads = []
+    reader = SQLitePool.reader
+
+    def recording_reader(self):
+        reads.append(threading.get_ident())
+        return reader(self)
+
+    monkeypatch.setattr(SQLitePool, "reader", recording_reader)
+
+    await extraction_cache.aput("我今天很开心", "太棒了", {"emotion": {"intensity": 8}}, 0.5)
+    get_write_actor().execute(lambda conn: None)
+    assert (await extraction_cache.aget("我今天很开心", "太棒了"))["emotion"]["intensity"] == 8
+    memory_reads = len(reads)
+
+    extraction_cache.clear()  # 模拟重启: 进程内缓存和版本都要重新读
+    assert (await extraction_cache.aget("我今天很开心", "太棒了"))["emotion"]["intensity"] == 8
+    assert await extraction_cache.aget("没见过的对话", "嗯") is None
+    assert reads and loop_thread not in reads
+    assert memory_reads == 1  # 只有第一次读 prompt_version
+    assert extraction_cache.stats()["db_hits"] == 1
@@ -0,0 +1,205 @@
+"""提取任务队列测试"""
+import asyncio
+import json
+import sqlite3
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core.ai_engine import AIEngine
+from app.database import WriteActor
+from app.services.extraction_queue import ExtractionQueue
+from app.utils.api_client import DouBaoClient
+from app.workers.extraction import ExtractionWorker
+
+
+class _FlakyEngine:
+    """前failures次提取失败的假引擎"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = []
+
+    async def _extract_and_save_info(self, conversation_id, child_id, user_message,
+                                     ai_response, fallback=True):
+        self.calls.append(fallback)
+        if len(self.calls) <= self.failures and not fallback:
+            return None
+        return {"emotion": {"emotion_type": "positive"}}
+
+
+def _job_row(db_path, job_id):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        "SELECT status, attempts, locked_by FROM extraction_jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def _make_available(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE extraction_jobs SET available_at = datetime('now', 'localtime', '-1 seconds')")
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_completed(test_db):
+    """测试失败任务退避后重试,成功后标记done"""
+    queue = ExtractionQueue()
+    job_id = queue.enqueue(1, 1, "我今天很开心!", "太好啦!")
+    engine = _FlakyEngine(failures=1)
+    worker = ExtractionWorker(queue=queue, engine=engine, worker_id="w1")
+
+    assert await worker.run_once() == 1
+    assert _job_row(test_db, job_id) == ("pending", 1, None)
+    # 退避期内不会被领取
+    assert await worker.run_once() == 0
+
+    _make_available(test_db)
+    assert await worker.run_once() == 1
+    assert _job_row(test_db, job_id) == ("done", 2, None)
+    assert queue.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_last_attempt_falls_back_to_rules(test_db, monkeypatch):
+    """测试最后一次尝试允许降级到简单规则"""
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_ATTEMPTS", 2)
+    queue = ExtractionQueue()
+    job_id = queue.enqueue(1, 1, "你好", "你好呀")
+    engine = _FlakyEngine(failures=10)
+    worker = ExtractionWorker(queue=queue, engine=engine, worker_id="w1")
+
+    await worker.run_once()
+    _make_available(test_db)
+    await worker.run_once()
+
+    assert engine.calls == [False, True]
+    assert _job_row(test_db, job_id)[0] == "done"
+
+
+def test_expired_lease_is_reclaimed(test_db, monkeypatch):
+    """测试worker崩溃后,租约过期的任务被其他worker回收"""
+    queue = ExtractionQueue()
+    job_id = queue.enqueue(1, 1, "你好", "你好呀")
+
+    assert [job.id for job in queue.claim("crashed", 10)] == [job_id]
+    assert queue.claim("w2", 10) == []
+
+    monkeypatch.setattr(settings, "EXTRACTION_LEASE_SECONDS", 0)
+    reclaimed = queue.claim("w2", 10)
+    assert [job.id for job in reclaimed] == [job_id]
+    assert reclaimed[0].attempts == 2
+    assert _job_row(test_db, job_id) == ("running", 2, "w2")
+
+
+def test_purge_deletes_expired_terminal_jobs(test_db):
+    """测试按保留时长分批删除已完成和已放弃的任务,待处理和重试中的任务不动"""
+    queue = ExtractionQueue()
+    ids = [queue.enqueue(1, 1, f"第{i}轮", "好的") for i in range(6)]
+    for job in queue.claim("w1", 10):
+        if job.id in ids[:3]:
+            queue.complete(job.id)
+        elif job.id == ids[3]:
+            queue._update(job.id, "failed", "放弃", 0)
+        elif job.id == ids[4]:
+            queue.retry(job, "超时")
+    conn = sqlite3.connect(test_db)
+    conn.execute("UPDATE extraction_jobs SET available_at = datetime('now', 'localtime', '-2 days') "
+                 "WHERE id IN (?, ?, ?, ?)", (ids[0], ids[1], ids[3], ids[4]))
+    conn.commit()
+    conn.close()
+
+    assert queue.purge(done_hours=24, failed_hours=24 * 7, batch_size=1) == 2
+    remaining = {job_id: _job_row(test_db, job_id) for job_id in ids}
+    assert remaining[ids[0]] is None and remaining[ids[1]] is None
+    assert remaining[ids[2]][0] == "done"      # 还在保留期内
+    assert remaining[ids[3]][0] == "failed"    # 放弃的任务保留更久
+    assert remaining[ids[4]][0] == "pending"
+    assert remaining[ids[5]][0] == "running"
+    assert queue.purge(done_hours=24, failed_hours=24) == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_block_on_write_actor(test_db, monkeypatch):
+    """测试worker领取、完成和重试都 await 写线程,不在事件循环里同步等待"""
+    queue = ExtractionQueue()
+    first = queue.enqueue(1, 1, "我今天很开心!", "太好啦!")
+    second = queue.enqueue(1, 1, "我也很开心!", "真棒!")
+
+    def blocking_execute(self, fn):
+        pytest.fail("worker不应调用 WriteActor.execute")
+
+    monkeypatch.setattr(WriteActor, "execute", blocking_execute)
+    worker = ExtractionWorker(queue=queue, engine=_FlakyEngine(failures=1), worker_id="w1")
+    assert await worker.run_once() == 2
+    assert _job_row(test_db, first) == ("pending", 1, None)
+    assert _job_row(test_db, second) == ("done", 1, None)
+
+
+@pytest.mark.asyncio
+async def test_worker_purges_on_start(test_db, monkeypatch):
+    """测试worker启动时先清理一次过期任务"""
+    queue = ExtractionQueue()
+    purged = []
+    monkeypatch.setattr(queue, "purge", lambda: purged.append(True) or 0)
+    worker = ExtractionWorker(queue=queue, engine=_FlakyEngine(0))
+    task = asyncio.create_task(worker.run_forever())
+    await asyncio.sleep(0.1)
+    worker.stop()
+    await task
+    assert purged == [True]
+
+
+@pytest.mark.asyncio
+async def test_batch_extraction_fans_out_results(test_db, monkeypatch):
+    """测试多轮对话打包成一次请求,结果分发回各自孩子,缺失条目降级到简单规则"""
+    monkeypatch.setattr(settings, "EXTRACTION_LOCAL_GATE", False)  # 3条都交给豆包
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        items = [
+            {"index": 1, "knowledge": None, "writing": None, "social": None,
+             "emotion": {"emotion_type": "positive", "intensity": 9, "trigger_event": "投篮命中"}},
+            {"index": 3, "knowledge": {"source": "active", "subject": "数学",
+                                       "content": "勾股定理", "confidence_score": 0.8},
+             "writing": None, "social": None, "emotion": None},
+        ]
+        return httpx.Response(200, json={"choices": [{"message": {
+            "content": json.dumps(items, ensure_ascii=False)}}]})
+
+    conn = sqlite3.connect(test_db)
+    conn.execute("INSERT INTO children (id, name, birth_date) VALUES (2, '小明', '2016-01-01')")
+    conn.commit()
+    conn.close()
+
+    queue = ExtractionQueue()
+    queue.enqueue(1, 1, "我投篮命中了,超级开心!", "太厉害了!")
+    queue.enqueue(2, 2, "老师今天讲了惯性", "惯性很有趣呢")
+    queue.enqueue(3, 2, "我自己研究了勾股定理", "你真棒!")
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    worker = ExtractionWorker(queue=queue, engine=AIEngine(client=client), worker_id="w1",
+                              batch_size=8, batch_max_wait=0)
+    assert await worker.run_once() == 3
+    await client.aclose()
+
+    assert len(requests) == 1
+    assert "【3】" in requests[0]["messages"][1]["content"]
+
+    conn = sqlite3.connect(test_db)
+    emotions = conn.execute("SELECT child_id, intensity FROM emotions").fetchall()
+    knowledge = conn.execute(
+        "SELECT child_id, conversation_id, source, subject FROM knowledge_points ORDER BY conversation_id"
+    ).fetchall()
+    statuses = conn.execute("SELECT DISTINCT status FROM extraction_jobs").fetchall()
+    conn.close()
+    assert emotions == [(1, 9)]
+    # 第2条没有返回结果,由简单规则提取(被动学习/物理)
+    assert knowledge == [(2, 2, "passive", "物理"), (2, 3, "active", "数学")]
+    assert statuses == [("done",)]
@@ -0,0 +1,77 @@
+"""本地规则提取测试"""
+import json
+import sqlite3
+
+import pytest
+
+from app.config import settings
+from app.core.ai_engine import AIEngine
+from app.core.extractor import InformationExtractor, KeywordAutomaton
+
+
+def test_automaton_finds_overlapping_keywords():
+    """测试一次扫描找出所有关键词,包括互相重叠和互为后缀的"""
+    automaton = KeywordAutomaton({
+        "化学": [("subject", "化学")],
+        "化学反应": [("subject", "化学")],
+        "学反": [("x", "y")],
+        "反应": [("x", "z")],
+    })
+    found = sorted((end, keyword) for end, _, _, keyword in automaton.find("做了化学反应实验"))
+    assert found == [(3, "化学"), (4, "学反"), (5, "化学反应"), (5, "反应")]
+
+
+def test_extract_with_confidence():
+    """测试各维度的结果和置信度门控"""
+    extractor = InformationExtractor()
+    threshold = settings.EXTRACTION_LOCAL_CONFIDENCE
+
+    passive = extractor.extract("老师今天讲了惯性", "惯性很有趣呢")
+    assert passive.knowledge == {"source": "passive", "subject": "物理"}
+    assert passive.is_confident(threshold)
+
+    happy = extractor.extract("我投篮命中了,超级开心!")
+    assert happy.emotion == {"type": "positive", "intensity": 9}
+    assert happy.can_skip_model(threshold) and not happy.chitchat
+
+    # 正负情绪混杂: 交给模型判断
+    mixed = extractor.extract("考试没考好很难过,但是和同学一起玩又很开心")
+    assert not mixed.is_confident(threshold)
+
+    # 事件叙述需要模型补全时间/地点/感官细节
+    story = extractor.extract("今天下午我和同学在公园放风筝,风筝飞得特别高")
+    assert story.writing["location"] == "公园"
+    assert not story.can_skip_model(threshold)
+
+    assert extractor.extract("你好").chitchat
+    assert extractor.extract("嗯嗯,知道了").chitchat
+
+
+@pytest.mark.asyncio
+async def test_gate_skips_model_and_reloads_dictionaries(test_db, monkeypatch):
+    """测试高置信度的对话不调用豆包;system_config中的词典更新后重新加载"""
+    monkeypatch.setattr(settings, "EXTRACTOR_RELOAD_INTERVAL", 0)
+    engine = AIEngine()
+
+    async def fail(*args, **kwargs):
+        pytest.fail("高置信度的对话不应调用豆包提取")
+
+    monkeypatch.setattr(engine, "_call_doubao_for_extraction", fail)
+    extractor = InformationExtractor()
+    monkeypatch.setattr("app.core.ai_engine.information_extractor", extractor)
+
+    assert engine._local_extraction("我自己研究魔方", "") is None
+
+    conn = sqlite3.connect(test_db)
+    conn.execute(
+        "INSERT INTO system_config (key, value) VALUES ('extractor_dictionaries', ?)",
+        (json.dumps({"subject": {"益智": ["魔方", "数独"]}}, ensure_ascii=False),)
+    )
+    conn.commit()
+    conn.close()
+
+    local = engine._local_extraction("我自己研究魔方", "")
+    assert local.knowledge == {"source": "active", "subject": "益智"}
+
+    result = await engine._extract_and_save_info(None, 1, "我自己研究魔方", "")
+    assert result["knowledge"]["subject"] == "益智"
@@ -0,0 +1,53 @@
+"""对话历史测试"""
+import sqlite3
+
+from app.services.history_service import ConversationHistory
+from app.utils.tokenizer import estimate_message_tokens, estimate_tokens
+
+
+def _insert_turns(db_path, turns):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO conversations (id, child_id, conversation_mode) VALUES (1, 1, 'knowledge')")
+    for user_message, ai_response in turns:
+        conn.execute("INSERT INTO messages (conversation_id, role, content) VALUES (1, 'user', ?)", (user_message,))
+        conn.execute("INSERT INTO messages (conversation_id, role, content) VALUES (1, 'assistant', ?)", (ai_response,))
+    conn.commit()
+    conn.close()
+
+
+def test_estimate_tokens():
+    """测试中文按字、英文按词估算"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("勾股定理") == 4
+    assert estimate_tokens("hello world") == 4
+    assert estimate_tokens("我学了Python编程") == 7
+
+
+def test_load_keeps_recent_turns_within_budget(test_db):
+    """测试按token预算从最新一轮往前取整轮,之后从内存缓冲读取"""
+    turns = [(f"第{i}轮问题" * 5, f"第{i}轮回答" * 5) for i in range(30)]
+    _insert_turns(test_db, turns)
+    history = ConversationHistory(max_messages=20, max_conversations=8, ttl=60)
+    turn_tokens = estimate_message_tokens(turns[0][0]) + estimate_message_tokens(turns[0][1])
+
+    messages = history.load(1, token_budget=turn_tokens * 3 + 1)
+
+    assert [m["content"] for m in messages] == [text for turn in turns[-3:] for text in turn]
+    assert [m["role"] for m in messages] == ["user", "assistant"] * 3
+    # 预算再大也只取缓冲内的最近 max_messages 条
+    assert len(history.load(1, token_budget=10 ** 6)) == 20
+    assert (history.hits, history.misses) == (1, 1)
+
+    history.append_turn(1, "新问题", "新回答")
+    assert history.load(1, token_budget=10 ** 6)[-2:] == [
+        {"role": "user", "content": "新问题"}, {"role": "assistant", "content": "新回答"}
+    ]
+    assert history.misses == 1
+
+
+def test_new_conversation_does_not_query(test_db):
+    """测试新会话登记空缓冲,不查数据库"""
+    history = ConversationHistory(max_messages=20, max_conversations=8, ttl=60)
+    history.start(5)
+    assert history.load(5) == []
+    assert history.misses == 0
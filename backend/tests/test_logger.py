@@ -0,0 +1,76 @@
+"""日志管道测试"""
+import io
+import json
+import logging
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.logger import JsonFormatter, configure_logging, flush_logs, logger, request_id
+
+
+def test_json_lines_with_request_id_and_debug_sampling():
+    """测试后台线程写出JSON行,带请求ID和异常堆栈,DEBUG日志按调用位置采样"""
+    stream = io.StringIO()
+    configure_logging(stream)
+    level = logger.level
+    logger.setLevel(logging.DEBUG)
+    try:
+        token = request_id.set("req-1")
+        payload = {"emotion": "开心"}
+        logger.info("📊 提取信息: %s", payload)
+        payload["emotion"] = "改过了"  # 入队时已转成字符串,之后修改参数不影响
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.error("❌ 失败", exc_info=True)
+        request_id.reset(token)
+        for i in range(250):
+            logger.debug("调试 %s", i)
+        flush_logs()
+    finally:
+        logger.setLevel(level)
+        configure_logging(sys.stdout)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0]["msg"] == "📊 提取信息: {'emotion': '开心'}"
+    assert records[0]["request_id"] == "req-1"
+    assert records[0]["level"] == "INFO"
+    assert "ZeroDivisionError" in records[1]["exc"]
+    assert [r["msg"] for r in records[2:]] == ["调试 0", "调试 100", "调试 200"]
+    assert records[2]["request_id"] == "-"
+
+
+def test_exception_is_formatted_on_the_listener_thread(monkeypatch):
+    """测试异常堆栈由后台线程展开,调用方线程只入队"""
+    threads = []
+    format_exception = JsonFormatter.formatException
+
+    def recording(self, exc_info):
+        threads.append(threading.get_ident())
+        return format_exception(self, exc_info)
+
+    monkeypatch.setattr(JsonFormatter, "formatException", recording)
+    stream = io.StringIO()
+    configure_logging(stream)
+    try:
+        try:
+            {}["missing"]
+        except KeyError:
+            logger.exception("❌ 失败")
+        flush_logs()
+    finally:
+        configure_logging(sys.stdout)
+
+    record = json.loads(stream.getvalue())
+    assert "KeyError: 'missing'" in record["exc"]
+    assert threads and threading.get_ident() not in threads
+
+
+def test_request_id_header():
+    """测试请求ID沿用客户端传入的值,否则生成一个"""
+    with TestClient(app) as http:
+        assert http.get("/health", headers={"X-Request-ID": "abc"}).headers["X-Request-ID"] == "abc"
+        assert len(http.get("/health").headers["X-Request-ID"]) == 16
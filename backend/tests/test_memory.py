@@ -1,7 +1,209 @@
 """Memory测试"""
+import sqlite3
+from pathlib import Path
+
 import pytest
 
+from app.services.memory_service import MemoryCache, memory_service
+
+REBUILD_ROLLUPS_SQL = Path(__file__).parent.parent / "database" / "maintenance" / "rebuild_rollups.sql"
+
 @pytest.mark.asyncio
 async def test_memory():
     """测试Memory"""
     pass
+
+
+def _insert_emotion(db_path, child_id=1):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO emotions (child_id, emotion_type, intensity, trigger_event)
+        VALUES (?, 'positive', 8, '考试考得好')
+    """, (child_id,))
+    conn.commit()
+    conn.close()
+
+
+def test_memory_summary_is_cached(test_db):
+    """测试摘要和记忆字典一次计算,第二次命中缓存"""
+    stats_before = memory_service.cache.stats()
+    memory, summary = memory_service.get_memory_with_summary(1, 7)
+    memory_again, summary_again = memory_service.get_memory_with_summary(1, 7)
+
+    assert memory_again is memory
+    assert summary_again == summary == memory_service.generate_memory_summary(1, 7)
+    assert "【基础信息】" in summary
+    stats = memory_service.cache.stats()
+    assert stats["misses"] - stats_before["misses"] == 1
+    assert stats["hits"] - stats_before["hits"] == 2
+
+
+def test_insert_from_other_process_invalidates(test_db):
+    """测试其他连接(如提取worker)写入维度数据后缓存失效"""
+    _, summary = memory_service.get_memory_with_summary(1, 7)
+    assert "情绪状态" not in summary
+
+    _insert_emotion(test_db)
+
+    _, summary = memory_service.get_memory_with_summary(1, 7)
+    assert "positive情绪1次(平均强度8.0)" in summary
+
+
+def test_insert_for_other_child_keeps_entry(test_db):
+    """测试其他孩子的写入不影响缓存"""
+    memory, _ = memory_service.get_memory_with_summary(1, 7)
+    _insert_emotion(test_db, child_id=2)
+    assert memory_service.get_memory_with_summary(1, 7)[0] is memory
+
+
+def test_update_and_delete_invalidate(test_db):
+    """测试修改、删除维度数据(含把数据改到别的孩子名下)后两个孩子的缓存都失效"""
+    _insert_emotion(test_db)
+    conn = sqlite3.connect(test_db)
+    conn.execute("INSERT INTO children (id, name, birth_date) VALUES (2, '小明', '2016-03-01')")
+    conn.commit()
+    assert "positive情绪1次(平均强度8.0)" in memory_service.get_memory_with_summary(1, 7)[1]
+    assert "情绪状态" not in memory_service.get_memory_with_summary(2, 7)[1]
+
+    conn.execute("UPDATE emotions SET intensity = 4")
+    conn.commit()
+    assert "positive情绪1次(平均强度4.0)" in memory_service.get_memory_with_summary(1, 7)[1]
+
+    conn.execute("UPDATE emotions SET child_id = 2")
+    conn.commit()
+    assert "情绪状态" not in memory_service.get_memory_with_summary(1, 7)[1]
+    assert "positive情绪1次(平均强度4.0)" in memory_service.get_memory_with_summary(2, 7)[1]
+
+    conn.execute("DELETE FROM emotions")
+    conn.commit()
+    conn.close()
+    assert "情绪状态" not in memory_service.get_memory_with_summary(2, 7)[1]
+
+
+def test_cache_lru_and_ttl_eviction(monkeypatch):
+    """测试容量上限按LRU淘汰、TTL过期"""
+    cache = MemoryCache(max_size=2, ttl=60)
+    cache.put(1, 7, 0, {"id": 1}, "a")
+    cache.put(2, 7, 0, {"id": 2}, "b")
+    assert cache.get(1, 7, 0) is not None
+    cache.put(3, 7, 0, {"id": 3}, "c")
+
+    assert cache.get(2, 7, 0) is None
+    assert cache.get(1, 7, 0) is not None
+    assert cache.stats()["evictions"] == 1
+
+    assert cache.get(1, 7, 1) is None  # 版本号变化
+
+    cache.put(1, 7, 0, {"id": 1}, "a")
+    monkeypatch.setattr("app.services.memory_service.time.monotonic", lambda: 1e12)
+    assert cache.get(1, 7, 0) is None
+
+
+def test_multi_window_matches_single_window(test_db):
+    """测试一次计算多个窗口与逐个窗口查询结果一致"""
+    conn = sqlite3.connect(test_db)
+    for days_ago, subject, location in [(1, "数学", "学校"), (3, "数学", "家里"),
+                                        (20, "物理", "学校"), (60, "语文", None)]:
+        created_at = f"datetime('now', 'localtime', '-{days_ago} days')"
+        conn.execute(f"""
+            INSERT INTO knowledge_points (child_id, source, subject, content, confidence_score, created_at)
+            VALUES (1, 'active', ?, '内容', 0.5, {created_at})
+        """, (subject,))
+        conn.execute(f"""
+            INSERT INTO writing_materials (child_id, event_description, location, created_at)
+            VALUES (1, '和同学打篮球', ?, {created_at})
+        """, (location,))
+    conn.commit()
+    conn.close()
+
+    windows = memory_service.get_child_memory_windows(1, (7, 30, None))
+
+    for days in (7, 30, None):
+        assert windows[days] == memory_service.get_child_memory(1, days)
+    assert windows[7]["knowledge"]["learning_stats"] == {"active": 2}
+    assert windows[30]["knowledge"]["subjects"][0] == {"subject": "数学", "count": 2, "avg_confidence": 0.5}
+    assert len(windows[None]["writing"]["recent_materials"]) == 4
+    assert windows[None]["writing"]["frequent_locations"] == [
+        {"location": "学校", "count": 2}, {"location": "家里", "count": 1}
+    ]
+
+
+def test_rollups_match_full_rebuild(test_db):
+    """测试触发器增量维护的汇总表与全量重建结果一致(含删除)"""
+    conn = sqlite3.connect(test_db)
+    for days_ago, confidence, behavior, intensity in [(0, 0.9, "主动分享", 8), (0, None, None, None),
+                                                      (2, 0.4, "主动分享", 3), (40, 0.7, None, 6)]:
+        created_at = f"datetime('now', 'localtime', '-{days_ago} days')"
+        conn.execute(f"""
+            INSERT INTO knowledge_points (child_id, source, subject, content, confidence_score, created_at)
+            VALUES (1, 'active', '数学', '内容', ?, {created_at})
+        """, (confidence,))
+        conn.execute(f"""
+            INSERT INTO social_events (child_id, relationship_type, event_context, behavior_pattern, created_at)
+            VALUES (1, 'peer', '一起玩', ?, {created_at})
+        """, (behavior,))
+        conn.execute(f"""
+            INSERT INTO emotions (child_id, emotion_type, intensity, created_at)
+            VALUES (1, 'positive', ?, {created_at})
+        """, (intensity,))
+    conn.execute("DELETE FROM emotions WHERE intensity = 3")
+    conn.commit()
+
+    def snapshot():
+        return conn.execute("""
+            SELECT dimension, day, key1, key2, count, round(value_sum, 6), value_count
+            FROM memory_daily_rollups WHERE count > 0 ORDER BY 1, 2, 3, 4
+        """).fetchall()
+
+    incremental = snapshot()
+    conn.executescript(REBUILD_ROLLUPS_SQL.read_text(encoding="utf-8"))
+    assert snapshot() == incremental
+    conn.close()
+
+    memory = memory_service.get_child_memory(1, 7)
+    assert memory["knowledge"]["subjects"] == [{"subject": "数学", "count": 3, "avg_confidence": 0.65}]
+    assert memory["social"]["behaviors"] == [{"pattern": "主动分享", "count": 2}]
+    assert memory["emotion"]["emotion_stats"] == [{"type": "positive", "count": 2, "avg_intensity": 8.0}]
+
+
+def test_rollups_follow_updates_of_group_keys(test_db):
+    """测试修改孩子、日期、分组键和统计值后,汇总表仍与全量重建结果一致"""
+    conn = sqlite3.connect(test_db)
+    conn.execute("INSERT INTO children (id, name, birth_date) VALUES (2, '小明', '2016-03-01')")
+    for location, confidence, intensity in [("学校", 0.9, 8), ("家里", 0.4, 3), (None, None, None)]:
+        conn.execute("""
+            INSERT INTO knowledge_points (child_id, source, subject, content, confidence_score)
+            VALUES (1, 'active', '数学', '内容', ?)
+        """, (confidence,))
+        conn.execute("INSERT INTO writing_materials (child_id, event_description, location) VALUES (1, '事件', ?)",
+                     (location,))
+        conn.execute("""
+            INSERT INTO social_events (child_id, relationship_type, event_context, behavior_pattern)
+            VALUES (1, 'peer', '一起玩', '主动分享')
+        """)
+        conn.execute("INSERT INTO emotions (child_id, emotion_type, intensity) VALUES (1, 'positive', ?)",
+                     (intensity,))
+    conn.execute("UPDATE knowledge_points SET subject = '语文', confidence_score = 0.5 WHERE id = 1")
+    conn.execute("UPDATE knowledge_points SET child_id = 2, created_at = datetime('now', 'localtime', '-3 days') "
+                 "WHERE id = 2")
+    conn.execute("UPDATE knowledge_points SET content = '新内容' WHERE id = 3")
+    conn.execute("UPDATE writing_materials SET location = NULL WHERE location = '学校'")
+    conn.execute("UPDATE writing_materials SET location = '公园' WHERE location IS NULL AND id = 3")
+    conn.execute("UPDATE writing_materials SET location = '学校' WHERE location = '家里'")
+    conn.execute("UPDATE social_events SET behavior_pattern = NULL WHERE id = 1")
+    conn.execute("UPDATE social_events SET relationship_type = 'family' WHERE id = 2")
+    conn.execute("UPDATE emotions SET emotion_type = 'negative', intensity = NULL WHERE id = 1")
+    conn.execute("UPDATE emotions SET intensity = 6 WHERE id = 3")
+    conn.commit()
+
+    def snapshot():
+        return conn.execute("""
+            SELECT child_id, dimension, day, key1, key2, count, round(value_sum, 6), value_count
+            FROM memory_daily_rollups WHERE count > 0 ORDER BY 1, 2, 3, 4, 5
+        """).fetchall()
+
+    incremental = snapshot()
+    conn.executescript(REBUILD_ROLLUPS_SQL.read_text(encoding="utf-8"))
+    assert snapshot() == incremental
+    assert (2, "knowledge") in {row[:2] for row in incremental}
+    conn.close()
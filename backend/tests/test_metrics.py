@@ -0,0 +1,74 @@
+"""指标与耗时追踪测试"""
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.main import app
+from app.utils.api_client import DouBaoClient
+from app.utils.metrics import Registry, counter, gauge, span
+
+
+def _stream_handler(request: httpx.Request) -> httpx.Response:
+    chunks = [{"choices": [{"delta": {"content": "你好呀"}}]}]
+    lines = [f"data: {json.dumps(c, ensure_ascii=False)}\n\n" for c in chunks] + ["data: [DONE]\n\n"]
+    return httpx.Response(200, text="".join(lines), headers={"Content-Type": "text/event-stream"})
+
+
+def test_render_prometheus_text():
+    """测试文本格式: 直方图累计桶、同名采集结果合并、采集失败不影响其他指标"""
+    registry = Registry()
+    latency = registry.histogram("demo_seconds", "示例", ("op",), buckets=(0.1, 1.0))
+    latency.observe(0.05, "read")
+    latency.observe(0.5, "read")
+    latency.observe(5.0, "read")
+    registry.register_collector(lambda: [counter("demo_requests", "请求", [({"cache": "a"}, 3)])])
+    registry.register_collector(lambda: 1 / 0)
+    registry.register_collector(lambda: [counter("demo_requests", "请求", [({"cache": "b"}, 4)]),
+                                         gauge("demo_depth", "深度", 2)])
+
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{op="read",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{op="read",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{op="read"} 3' in lines
+    assert lines.count("# TYPE demo_requests_total counter") == 1
+    assert 'demo_requests_total{cache="a"} 3' in lines
+    assert 'demo_requests_total{cache="b"} 4' in lines
+    assert "demo_depth 2" in lines
+
+
+def test_metrics_endpoint_after_chat_turn(test_db, monkeypatch):
+    """测试一轮对话后 /metrics 里有各阶段、SQL、出站HTTP和缓存的指标"""
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(_stream_handler))
+    monkeypatch.setattr(chat.ai_engine, "client", client)
+
+    with TestClient(app) as http:
+        assert http.post("/api/chat/stream", json={"child_id": 1, "message": "你好"}).status_code == 200
+        response = http.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'learnsmart_turn_stage_seconds_count{stage="memory"}' in body
+    assert 'learnsmart_turn_seconds_count{mode="knowledge",outcome="success"}' in body
+    assert 'learnsmart_db_query_seconds_count{op="SELECT"}' in body
+    assert 'learnsmart_http_request_seconds_count{target="doubao_stream",status="200"}' in body
+    assert 'learnsmart_span_seconds_count{span="memory.windows"}' in body
+    assert 'learnsmart_cache_requests_total{cache="memory",result="miss"}' in body
+    assert "# TYPE learnsmart_extraction_jobs_pending gauge" in body
+
+
+def test_span_overhead_is_microseconds():
+    """测试一个span的开销在微秒级"""
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        with span("test.overhead"):
+            pass
+    per_span = (time.perf_counter() - started) / n
+    assert per_span < 20e-6
@@ -0,0 +1,37 @@
+"""Prompt管理器测试"""
+import json
+
+from app.utils.prompt_manager import PromptManager
+
+
+def test_children_share_static_prefix():
+    """测试不同孩子、不同轮次的System Prompt共享逐字节相同的静态前缀"""
+    manager = PromptManager()
+    prefix = manager.get_system_prompt("knowledge")
+    first = manager.build_system_prompt("knowledge", "芋圆", "【学习情况】数学2次")
+    second = manager.build_system_prompt("knowledge", "小明", "暂无记忆")
+
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert "芋圆" not in prefix and "{" not in prefix
+    assert "芋圆" in first[len(prefix):] and "【学习情况】数学2次" in first[len(prefix):]
+    assert manager.get_system_prompt("unknown") == prefix
+
+
+def test_encode_request_matches_json():
+    """测试复用JSON片段序列化的请求体与直接序列化等价(含需转义的字符)"""
+    manager = PromptManager()
+    extraction = manager.register_prefix('提取规则:\n返回 {"knowledge": null}\t\\结束')
+    payload = {
+        "model": "m",
+        "messages": [
+            {"role": "system", "content": manager.build_system_prompt("free", '小"明"', "第一行\n第二行")},
+            {"role": "system", "content": extraction + '\n【批量模式】"index"'},
+            {"role": "user", "content": "今天😊"},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 2000,
+        "stream": True,
+    }
+
+    for _ in range(2):  # 第二次走缓存
+        assert json.loads(manager.encode_request(payload)) == payload
@@ -0,0 +1,61 @@
+"""查询计划回归测试: 记忆查询和对话统计都必须走索引"""
+import re
+import sqlite3
+
+import pytest
+
+import app.database as database
+from app.core.ai_engine import ai_engine
+from app.services.memory_service import memory_service
+
+# 全表扫描(含全索引扫描)和为ORDER BY/DISTINCT额外排序都算退化;
+# 窗口内的GROUP BY分组仍需要临时B树,但行数受 child_id + created_at 范围限制,不算退化
+BAD_PLAN = re.compile(r"^SCAN (?!CONSTANT ROW)|USE TEMP B-TREE FOR (ORDER BY|DISTINCT|RIGHT PART OF ORDER BY)")
+
+
+@pytest.fixture
+def traced_queries(test_db, monkeypatch):
+    """记录应用连接执行的所有SQL(参数已展开)"""
+    statements = []
+    configure = database._configure_connection
+
+    def configure_and_trace(conn):
+        configure(conn)
+        conn.set_trace_callback(statements.append)
+
+    monkeypatch.setattr(database, "_configure_connection", configure_and_trace)
+    return statements
+
+
+def _query_plans(db_path, statements):
+    conn = sqlite3.connect(db_path)
+    try:
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            if "'main'." in sql:  # FTS5模块读写自己影子表的内部语句
+                continue
+            details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            yield " ".join(sql.split()), details
+    finally:
+        conn.close()
+
+
+def test_memory_and_turn_queries_use_indexes(test_db, traced_queries):
+    """测试 memory_service 和 ai_engine 的每条查询都没有全表扫描或额外排序"""
+    ai_engine._extract_and_save_info_simple(None, 1, "今天老师教了勾股定理,我和同学在操场玩得很开心", "真棒!")
+    memory_service.get_memory_with_summary(child_id=1, days=7)
+    memory_service.get_child_memory_windows(child_id=1)
+    memory_service.get_child_memory(child_id=2, days=None)  # 无画像的孩子会回查children表
+    ai_engine._get_turn_count(1)
+    ai_engine._load_conversation_history(1)
+
+    plans = list(_query_plans(test_db, traced_queries))
+    tables = {re.search(r"FROM (\w+)", sql).group(1) for sql, _ in plans}
+    assert {"knowledge_points", "writing_materials", "social_events", "emotions",
+            "personality_traits", "user_memory", "children", "interest_intensity",
+            "messages", "memory_versions", "memory_daily_rollups"} <= tables
+
+    for sql, details in plans:
+        bad = [detail for detail in details if BAD_PLAN.search(detail)]
+        assert not bad, f"{sql}\n  -> {bad}"
@@ -0,0 +1,109 @@
+"""豆包调用容错测试(重试、对冲、熔断),对本地桩服务发起真实HTTP请求"""
+import time
+
+import pytest
+
+from app.config import settings
+from app.core.ai_engine import AIEngine
+from app.utils.api_client import DouBaoClient
+from app.utils.resilience import CircuitBreaker, CircuitOpenError
+
+from doubao_stub import DoubaoStub
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "DOUBAO_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "DOUBAO_RETRY_MAX_DELAY", 0.05)
+
+
+def _client(stub: DoubaoStub) -> DouBaoClient:
+    return DouBaoClient(api_url=stub.url, api_key="k", model="m")
+
+
+@pytest.mark.asyncio
+async def test_retries_429_and_5xx_then_succeeds(fast_retries):
+    """测试429和5xx按退避重试,不可重试的4xx直接失败"""
+    with DoubaoStub([(429, 0), (503, 0), (200, 0)], content="你好呀", retry_after="0") as stub:
+        client = _client(stub)
+        assert await client.chat_completion(MESSAGES) == "你好呀"
+        await client.aclose()
+    assert stub.requests == 3
+
+    with DoubaoStub([(400, 0)]) as stub:
+        client = _client(stub)
+        with pytest.raises(Exception):
+            await client.chat_completion(MESSAGES)
+        await client.aclose()
+    assert stub.requests == 1
+    assert client.breaker.failures == 0  # 请求本身的错误不计入熔断
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_cuts_tail_latency(monkeypatch):
+    """测试主请求超过对冲延迟时发出第二个请求,先返回的生效"""
+    monkeypatch.setattr(settings, "DOUBAO_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "DOUBAO_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "DOUBAO_HEDGE_MIN_DELAY", 0.05)
+
+    with DoubaoStub([(200, 0), (200, 0), (200, 0), (200, 2.0), (200, 0)]) as stub:
+        client = _client(stub)
+        for _ in range(3):  # 积累耗时样本
+            await client.chat_completion(MESSAGES)
+        started = time.monotonic()
+        assert await client.chat_completion(MESSAGES) == "好的"
+        elapsed = time.monotonic() - started
+        await client.aclose()
+    assert stub.requests == 5
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_recovers(test_db, fast_retries, monkeypatch):
+    """测试连续失败后熔断: 对话快速失败、提取改用本地规则;冷却后探测成功即恢复"""
+    monkeypatch.setattr(settings, "DOUBAO_RETRY_ATTEMPTS", 1)
+    monkeypatch.setattr(settings, "DOUBAO_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "DOUBAO_BREAKER_RESET_TIMEOUT", 0.3)
+    monkeypatch.setattr(settings, "EXTRACTION_LOCAL_GATE", False)
+
+    with DoubaoStub([(500, 0), (500, 0), (500, 0), (500, 0), (200, 0)]) as stub:
+        engine = AIEngine(client=_client(stub))
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await engine.client.chat_completion(MESSAGES)
+        assert stub.requests == 4 and engine.client.breaker.is_open
+
+        with pytest.raises(CircuitOpenError):
+            await engine.client.chat_completion(MESSAGES)
+        result = await engine.chat(child_id=1, message="我今天学了勾股定理")
+        assert result["success"] is False and result["retry_after"] > 0
+
+        # 提取队列不再等待重试,直接用本地规则
+        extracted = await engine._extract_and_save_info(None, 1, "老师今天讲了惯性", "", fallback=False)
+        assert extracted["knowledge"] == {"source": "passive", "subject": "物理"}
+        assert stub.requests == 4
+
+        time.sleep(0.35)
+        assert await engine.client.chat_completion(MESSAGES) == "好的"
+        assert engine.client.breaker.state == "closed"
+        await engine.client.aclose()
+
+
+def test_only_the_probe_frees_the_half_open_slot():
+    """测试熔断前放行、晚结束的请求不会释放半开状态的探测名额"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    late = breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.before_call() is True  # 冷却结束,第一个请求成为探测
+    breaker.release(late)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 探测还在进行,不放行第二个
+
+    breaker.release(True)
+    assert breaker.before_call() is True
+    breaker.record_success()
+    breaker.release(True)
+    assert breaker.state == "closed" and breaker.before_call() is False
@@ -0,0 +1,107 @@
+"""全文检索测试"""
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.search_service import child_key, search_service
+
+
+def _seed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO children (id, name, birth_date) VALUES (2, '小明', '2016-03-01'), "
+                 "(6401, '小红', '2017-05-01')")
+    conn.executemany(
+        "INSERT INTO conversations (id, child_id, conversation_mode) VALUES (?, ?, 'knowledge')",
+        [(1, 1), (2, 2), (3, 6401)]
+    )
+    conn.executemany(
+        "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+        [(1, "user", "今天学了勾股定理,直角三角形两条直角边的平方和等于斜边的平方"),
+         (1, "assistant", "勾股定理也叫毕达哥拉斯定理"),
+         (1, "user", "下午去打篮球了"),
+         (2, "user", "我也想学勾股定理"),
+         (3, "user", "勾股定理好难")]
+    )
+    conn.execute("INSERT INTO writing_materials (child_id, event_description) VALUES (1, '运动会上第一次跑完八百米')")
+    conn.commit()
+    return conn
+
+
+def test_child_key_matches_sql_encoding(test_db):
+    """测试Python和迁移脚本里的孩子ID编码一致"""
+    conn = sqlite3.connect(test_db)
+    for child_id in (1, 6399, 6400, 6401, 123456789):
+        sql = conn.execute(
+            "SELECT char(57344 + (?1 / 40960000) % 6400, 57344 + (?1 / 6400) % 6400, 57344 + ?1 % 6400)",
+            (child_id,)
+        ).fetchone()[0]
+        assert sql == child_key(child_id)
+    conn.close()
+
+
+def test_search_is_per_child_ranked_and_follows_writes(test_db):
+    """测试只返回该孩子的结果、按相关度排序带片段,增删改由触发器同步到索引"""
+    conn = _seed(test_db)
+
+    result = search_service.search(1, "勾股定理")
+    assert [item["conversation_id"] for item in result["items"]] == [1, 1]
+    assert result["items"][0]["id"] == 2  # 短消息的BM25更高
+    assert "[勾股定理]" in result["items"][0]["snippet"]
+    assert result["items"][0]["score"] < result["items"][1]["score"]
+    assert [item["id"] for item in search_service.search(6401, "勾股定理")["items"]] == [5]
+    assert search_service.search(1, "勾股定理 斜边")["items"][0]["id"] == 1
+    assert search_service.search(1, "八百米", type="writing")["items"][0]["snippet"] == "运动会上第一次跑完[八百米]"
+
+    conn.execute("UPDATE messages SET content = '今天学了分数' WHERE id = 1")
+    conn.execute("DELETE FROM messages WHERE id = 2")
+    conn.execute("INSERT INTO messages (conversation_id, role, content) VALUES (1, 'user', '复习勾股定理')")
+    conn.commit()
+    conn.close()
+    assert [item["id"] for item in search_service.search(1, "勾股定理")["items"]] == [6]
+    assert [item["id"] for item in search_service.search(1, "学了分数")["items"]] == [1]
+
+
+def test_search_pagination_and_short_queries(test_db, monkeypatch):
+    """测试游标翻页不重复不遗漏;不足3个字的词改为逐行匹配,按时间倒序,每页扫描行数有上限"""
+    monkeypatch.setattr(settings, "SEARCH_SCAN_ROWS", 7)
+    conn = _seed(test_db)
+    conn.executemany(
+        "INSERT INTO messages (conversation_id, role, content) VALUES (1, 'user', ?)",
+        [(f"第{i}次练习篮球运球" + "。" * i,) for i in range(25)]
+    )
+    conn.commit()
+    conn.close()
+
+    for query, expected in (("练习篮球", 25), ("篮球", 26)):
+        seen, cursor = [], None
+        while True:
+            page = search_service.search(1, query, limit=10, cursor=cursor)
+            seen += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == expected
+
+    short = search_service.search(1, "篮球", limit=2)["items"]
+    assert [item["id"] for item in short] == [30, 29]
+    assert short[0]["score"] is None
+    assert "[篮球]" in short[0]["snippet"]
+    page = search_service.search(1, "数学", limit=2)  # 扫满7行没有命中,仍可继续往前
+    assert page["items"] == [] and page["next_cursor"] is not None
+
+
+def test_search_endpoint(test_db):
+    """测试 /api/search 的返回格式和参数错误"""
+    _seed(test_db).close()
+    with TestClient(app) as http:
+        response = http.get("/api/search", params={"child_id": 1, "q": "毕达哥拉斯"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["items"][0]["id"] == 2
+        assert body["items"][0]["role"] == "assistant"
+        assert "next_cursor" not in body
+        assert http.get("/api/search", params={"child_id": 1, "q": "勾股", "type": "photos"}).status_code == 400
+        assert http.get("/api/search", params={"child_id": 1, "q": "   "}).status_code == 400
+        assert http.get("/api/search", params={"child_id": 1, "q": "勾股定理", "cursor": "xx"}).status_code == 400
@@ -0,0 +1,61 @@
+"""启动耗时测试: 导入剖析(-X importtime)和lifespan管理的单例"""
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import database
+from app.api import chat
+from app.core import ai_engine
+from app.main import app
+from app.utils.api_client import doubao_client
+
+BACKEND_DIR = Path(__file__).parent.parent
+# 本项目模块(app.*)自身的导入耗时合计;第三方库(FastAPI、httpx)另有一个宽松的总预算
+APP_IMPORT_BUDGET_SECONDS = 0.25
+TOTAL_IMPORT_BUDGET_SECONDS = 3.0
+# 冷启动时不应导入的模块(用到时再导入)
+LAZY_MODULES = ("sqlalchemy", "aiosqlite", "app.models")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| +(\S+)")
+
+
+def _import_profile():
+    """新进程里导入 app.main,返回 {模块: (自身微秒, 累计微秒)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return {m.group(3): (int(m.group(1)), int(m.group(2)))
+            for m in map(_LINE.match, result.stderr.splitlines()) if m}
+
+
+def test_cold_import_within_budget():
+    """测试导入 app.main 不加载SQLAlchemy等冷门模块,耗时在预算内"""
+    profile = _import_profile()
+    # 第一次运行可能在编译pyc,以第二次为准
+    profile = _import_profile()
+
+    lazy = [name for name in profile
+            if any(name == module or name.startswith(module + ".") for module in LAZY_MODULES)]
+    assert lazy == []
+    own = sum(self_us for name, (self_us, _) in profile.items() if name == "app" or name.startswith("app."))
+    slowest = sorted(profile.items(), key=lambda item: -item[1][0])[:5]
+    assert own / 1e6 < APP_IMPORT_BUDGET_SECONDS, f"app.* 导入耗时 {own / 1000:.0f}ms, 最慢: {slowest}"
+    assert profile["app.main"][1] / 1e6 < TOTAL_IMPORT_BUDGET_SECONDS
+
+
+def test_lifespan_owns_shared_resources(test_db):
+    """测试各API共用同一个引擎,连接池在lifespan中创建、退出时关闭"""
+    assert chat.ai_engine is ai_engine.ai_engine
+    assert chat.ai_engine.client is doubao_client
+
+    with TestClient(app) as http:
+        assert http.get("/health").status_code == 200
+        assert doubao_client._client is not None and not doubao_client._client.is_closed
+        assert list(database._pools) == [str(test_db)]
+
+    assert doubao_client._client is None
+    assert database._pools == {}
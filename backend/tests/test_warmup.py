@@ -0,0 +1,77 @@
+"""启动预热和打开App时的记忆预取测试"""
+import sqlite3
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.history_service import conversation_history
+from app.services.memory_service import memory_service
+from app.services.warmup import Warmup, recent_children
+from app.utils.api_client import DouBaoClient
+
+
+def _seed_conversations(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO children (id, name, birth_date) VALUES (2, '小明', '2016-03-01'), (3, '小红', '2017-05-01')")
+    conn.executemany(
+        "INSERT INTO conversations (id, child_id, conversation_mode, start_time) VALUES (?, ?, 'knowledge', ?)",
+        [(1, 1, "2026-09-01 10:00:00"), (2, 2, "2026-09-03 10:00:00"),
+         (3, 1, "2026-09-05 10:00:00"), (4, 3, "2026-08-01 10:00:00")]
+    )
+    conn.execute("INSERT INTO messages (conversation_id, role, content) VALUES (3, 'user', '你好')")
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_connections_and_fills_caches(test_db, monkeypatch):
+    """测试预热建立豆包连接,并为最近活跃的孩子缓存记忆和最新会话的历史"""
+    _seed_conversations(test_db)
+    monkeypatch.setattr(settings, "WARMUP_CHILDREN", 2)
+    methods = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        methods.append(request.method)
+        return httpx.Response(405)
+
+    client = DouBaoClient(api_url="http://doubao.test/chat", api_key="k", model="m",
+                          transport=httpx.MockTransport(handler))
+    assert recent_children(10) == [(1, 3), (2, 2), (3, 4)]
+
+    result = await Warmup(client).run()
+    await client.aclose()
+
+    assert result == {"connections": settings.WARMUP_HTTP_CONNECTIONS, "readers": settings.WARMUP_DB_READERS,
+                      "children": 2}
+    assert set(methods) == {"HEAD"}
+    assert memory_service.cache.stats()["size"] == 2
+    memory_hits, history_hits = memory_service.cache.hits, conversation_history.hits
+    memory_service.get_memory_with_summary(1)
+    conversation_history.load(3)
+    assert memory_service.cache.hits == memory_hits + 1
+    assert conversation_history.hits == history_hits + 1
+
+
+def test_recent_children_walks_start_time_index(test_db):
+    """测试找最近活跃孩子的查询倒序遍历索引,不扫全表也不额外排序"""
+    conn = sqlite3.connect(test_db)
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT child_id, id FROM conversations ORDER BY start_time DESC LIMIT 100"
+    ))
+    conn.close()
+    assert "idx_conversations_start_time" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_opening_app_prefetches_memory(test_db):
+    """测试打开App(获取孩子信息)后,后台已算好该孩子的记忆,首条消息命中缓存"""
+    with TestClient(app) as http:
+        assert http.get("/api/users/children/1").status_code == 200
+    assert memory_service.cache.stats()["size"] == 1
+
+    hits = memory_service.cache.hits
+    memory_service.get_memory_with_summary(1)
+    assert memory_service.cache.hits == hits + 1